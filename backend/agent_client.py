@@ -0,0 +1,134 @@
+"""App-lifetime pooled HTTP client for calls from the backend to the agent service (gmail_agent)."""
+import json
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+
+AGENT_SERVICE_URL = os.getenv("AGENT_SERVICE_URL", "http://localhost:8001").rstrip("/")
+# Connection pool: total connections, idle keep-alive connections, and how long idle ones live
+AGENT_HTTP_MAX_CONNECTIONS = int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "32"))
+AGENT_HTTP_MAX_KEEPALIVE = int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "16"))
+AGENT_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AGENT_HTTP_KEEPALIVE_EXPIRY", "60"))
+# HTTP/2 needs the optional h2 package and an https:// agent URL (plain http stays on HTTP/1.1)
+AGENT_HTTP2 = os.getenv("AGENT_HTTP2", "false").lower() == "true"
+# Per-phase timeouts (seconds); read covers the LLM work, so it is much longer than the rest
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "5"))
+AGENT_READ_TIMEOUT = float(os.getenv("AGENT_READ_TIMEOUT", "60"))
+AGENT_WRITE_TIMEOUT = float(os.getenv("AGENT_WRITE_TIMEOUT", "10"))
+AGENT_POOL_TIMEOUT = float(os.getenv("AGENT_POOL_TIMEOUT", "10"))
+# Use /analyze/stream so dashboards see the draft while it is being written
+AGENT_STREAM_DRAFTS = os.getenv("AGENT_STREAM_DRAFTS", "true").lower() == "true"
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AgentClient:
+    """Keeps one connection pool to the agent service for the lifetime of the app"""
+
+    def __init__(self, base_url: str = AGENT_SERVICE_URL, http2: bool = AGENT_HTTP2):
+        self.base_url = base_url
+        self.http2 = http2
+        if http2 and not http2_available():
+            print("⚠️ AGENT_HTTP2=true but the h2 package is not installed - using HTTP/1.1")
+            self.http2 = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.errors = 0
+        # (ms to first draft token, ms to full draft) for recent streamed drafts
+        self.draft_timings = deque(maxlen=500)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the first call (or startup) builds it inside the running loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=AGENT_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=AGENT_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=AGENT_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    connect=AGENT_CONNECT_TIMEOUT,
+                    read=AGENT_READ_TIMEOUT,
+                    write=AGENT_WRITE_TIMEOUT,
+                    pool=AGENT_POOL_TIMEOUT
+                )
+            )
+        return self._client
+
+    async def post(self, path: str, payload: dict, **kwargs) -> httpx.Response:
+        self.requests += 1
+        try:
+            return await self.client.post(path, json=payload, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+
+    async def analyze(self, payload: dict) -> httpx.Response:
+        return await self.post("/analyze", payload)
+
+    async def stream_analyze(self, payload: dict):
+        """Yield /analyze/stream events as they arrive, timing the first draft token against the full draft"""
+        self.requests += 1
+        start = time.perf_counter()
+        first_token = None
+        try:
+            async with self.client.stream("POST", "/analyze/stream", json=payload) as response:
+                if response.status_code != 200:
+                    self.errors += 1
+                    detail = (await response.aread()).decode(errors="replace")
+                    yield {"event": "error", "status": response.status_code, "detail": detail}
+                    return
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event.get("event") == "draft_delta" and first_token is None:
+                        first_token = (time.perf_counter() - start) * 1000
+                    elif event.get("event") == "result" and first_token is not None:
+                        self.draft_timings.append((first_token, (time.perf_counter() - start) * 1000))
+                    yield event
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+
+    def draft_stats(self) -> dict:
+        if not self.draft_timings:
+            return {"samples": 0}
+        first, full = (sorted(column) for column in zip(*self.draft_timings))
+        pick = lambda values, q: round(values[min(len(values) - 1, int(len(values) * q))], 1)
+        return {
+            "samples": len(first),
+            "first_token_ms": {"p50": pick(first, 0.5), "p95": pick(first, 0.95)},
+            "full_draft_ms": {"p50": pick(full, 0.5), "p95": pick(full, 0.95)}
+        }
+
+    def start(self):
+        """Open the pool (call from the app's startup hook)"""
+        return self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "requests": self.requests,
+            "errors": self.errors,
+            "stream_drafts": AGENT_STREAM_DRAFTS,
+            "draft_streaming": self.draft_stats()
+        }
@@ -0,0 +1,78 @@
+"""
+Benchmark: backend → agent calls with a new httpx.AsyncClient per email (old behaviour)
+vs. the shared, pooled AgentClient, against fake_agent_server.py.
+
+    python bench_agent_client.py --requests 500 --concurrency 16 --latency 0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from agent_client import AgentClient
+from fake_agent_server import start_fake_agent_server
+
+PAYLOAD = {
+    "email_sender": "Sender <sender@example.com>",
+    "email_subject": "Inquiry",
+    "email_body": "Hi team, we'd like a quote for the project. " * 20,
+    "email_id": "0000000000000001",
+    "thread_id": "0000000000000001"
+}
+
+
+async def per_request_client(url: str, _shared):
+    # What process_email_background did: a new client (and connection) per email
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{url}/analyze", json=PAYLOAD, timeout=60.0)
+        response.raise_for_status()
+
+
+async def shared_client(_url: str, shared: AgentClient):
+    response = await shared.analyze(PAYLOAD)
+    response.raise_for_status()
+
+
+async def run(label: str, call, url: str, count: int, concurrency: int):
+    shared = AgentClient(base_url=url)
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call(url, shared)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await one()  # warm up
+    timings.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(count)])
+    elapsed = time.perf_counter() - start
+    await shared.close()
+
+    timings.sort()
+    print(f"{label:<10} {count / elapsed:8.0f} req/s   mean {statistics.mean(timings):6.2f} ms   "
+          f"p50 {timings[len(timings) // 2]:6.2f} ms   p99 {timings[int(len(timings) * 0.99) - 1]:6.2f} ms")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub agent think time (seconds)")
+    args = parser.parse_args()
+
+    server, url = start_fake_agent_server(latency=args.latency)
+    print(f"🤖 {args.requests} /analyze calls, {args.concurrency} in flight, stub latency {args.latency}s\n")
+    cold = asyncio.run(run("per-email", per_request_client, url, args.requests, args.concurrency))
+    warm = asyncio.run(run("shared", shared_client, url, args.requests, args.concurrency))
+    print(f"\nshared client: {warm / cold:.1f}x throughput")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
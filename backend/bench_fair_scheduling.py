@@ -0,0 +1,98 @@
+"""
+Simulation: time-to-lead for quiet mailboxes while one mailbox floods the processing queue,
+FIFO scheduling vs per-mailbox deficit round-robin with a per-mailbox concurrency cap.
+
+No Gmail or agent calls are made; each job holds an "agent" stage slot for --service-ms.
+
+    python bench_fair_scheduling.py --flood 2000 --quiet 9 --service-ms 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from processing_queue import ProcessingQueue
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)] if values else 0.0
+
+
+async def simulate(scheduler: str, args) -> dict:
+    done = {}
+    queue = None
+
+    async def handler(job):
+        async with queue.stage("agent"):
+            await asyncio.sleep(args.service_ms / 1000)
+        done[job.message_id] = time.monotonic()
+
+    queue = ProcessingQueue(
+        handler,
+        workers=args.workers,
+        max_depth=args.flood + args.quiet * args.per_quiet + 1,
+        stage_limits={"agent": args.agent_concurrency},
+        scheduler=scheduler,
+        mailbox_concurrency=args.mailbox_concurrency
+    )
+    queue.start()
+
+    submitted = {}
+    # The flood: a newsletter blast / unread backlog landing all at once
+    for index in range(args.flood):
+        submitted[f"flood-{index}"] = time.monotonic()
+        queue.submit(f"flood-{index}", "flooded@example.com", None, "s-flood")
+
+    # Quiet mailboxes: a lead now and then
+    rng = random.Random(7)
+    for round_index in range(args.per_quiet):
+        for mailbox in range(args.quiet):
+            message_id = f"quiet{mailbox}-{round_index}"
+            submitted[message_id] = time.monotonic()
+            queue.submit(message_id, f"quiet{mailbox}@example.com", None, f"s-{mailbox}")
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * args.interval_ms / 1000)
+
+    quiet_ids = [m for m in submitted if m.startswith("quiet")]
+    deadline = time.monotonic() + args.timeout
+    while any(m not in done for m in quiet_ids) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    await queue.stop()
+
+    latencies = [(done[m] - submitted[m]) * 1000 for m in quiet_ids if m in done]
+    flood_done = sum(1 for m in done if m.startswith("flood"))
+    return {
+        "quiet_done": len(latencies),
+        "quiet_total": len(quiet_ids),
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p99": percentile(latencies, 0.99),
+        "flood_done": flood_done,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flood", type=int, default=2000, help="jobs queued at once by the flooded mailbox")
+    parser.add_argument("--quiet", type=int, default=9, help="number of quiet mailboxes")
+    parser.add_argument("--per-quiet", type=int, default=10, help="jobs per quiet mailbox")
+    parser.add_argument("--interval-ms", type=float, default=100, help="mean gap between quiet arrivals")
+    parser.add_argument("--service-ms", type=float, default=50, help="simulated agent time per email")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--agent-concurrency", type=int, default=4)
+    parser.add_argument("--mailbox-concurrency", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=120, help="give up waiting for quiet jobs after this many seconds")
+    args = parser.parse_args()
+
+    print(f"📬 1 mailbox floods {args.flood} jobs; {args.quiet} quiet mailboxes send {args.per_quiet} each "
+          f"(agent {args.service_ms:.0f} ms, {args.agent_concurrency} concurrent)\n")
+    print(f"{'scheduler':<10} {'quiet done':>11} {'p50 time-to-lead':>17} {'p99 time-to-lead':>17} {'flood done*':>11}")
+    for scheduler in ("fifo", "fair"):
+        result = asyncio.run(simulate(scheduler, args))
+        print(f"{scheduler:<10} {result['quiet_done']:>5}/{result['quiet_total']:<5} "
+              f"{result['p50']:>14.0f} ms {result['p99']:>14.0f} ms {result['flood_done']:>11}")
+    print("\n* flood jobs finished by the time the last quiet job finished")
+
+
+if __name__ == "__main__":
+    main()
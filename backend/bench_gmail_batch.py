@@ -0,0 +1,63 @@
+"""
+Benchmark: serial messages.get vs batched metadata fetch, against fake_gmail_server.py.
+
+    python bench_gmail_batch.py --latency 0.03 --messages 100
+"""
+import argparse
+import time
+
+import httplib2
+
+from fake_gmail_server import start_fake_gmail_server
+import gmail_service
+from gmail_service import batch_get_messages, METADATA_HEADERS
+
+
+def fetch_serial(service, message_ids):
+    for message_id in message_ids:
+        service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='metadata',
+            metadataHeaders=METADATA_HEADERS
+        ).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_gmail_server(latency=args.latency, message_count=args.messages, fail_rate=args.fail_rate)
+    gmail_service.GMAIL_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}/"
+    service = gmail_service.build_gmail_service(http=httplib2.Http())
+
+    message_ids = [m['id'] for m in service.users().messages().list(userId='me', maxResults=args.messages).execute()['messages']]
+    print(f"📭 {len(message_ids)} messages, {args.latency * 1000:.0f}ms per round trip\n")
+
+    start = time.perf_counter()
+    if not args.fail_rate:
+        fetch_serial(service, message_ids)
+        serial = time.perf_counter() - start
+        print(f"serial messages.get      : {serial * 1000:8.1f} ms")
+    else:
+        serial = None
+
+    for chunk_size in (10, 25, 50, 100):
+        start = time.perf_counter()
+        fetched, failed = batch_get_messages(
+            service, message_ids, chunk_size=chunk_size,
+            format='metadata', metadataHeaders=METADATA_HEADERS
+        )
+        elapsed = time.perf_counter() - start
+        speedup = f"  ({serial / elapsed:5.1f}x)" if serial else ""
+        print(f"batch chunk_size={chunk_size:<4}    : {elapsed * 1000:8.1f} ms  "
+              f"ok={len(fetched)} failed={len(failed)}{speedup}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
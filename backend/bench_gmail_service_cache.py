@@ -0,0 +1,69 @@
+"""
+Microbenchmark: per-request overhead of building a Gmail client every time (cold)
+vs. reusing the per-session cached client and keep-alive transport (warm).
+
+Runs against fake_gmail_server.py with zero added latency so only client-side
+overhead (discovery parsing, connection setup) is measured. The fake server speaks
+plain HTTP; against Google the cold path also pays a TLS handshake per request.
+
+    python bench_gmail_service_cache.py --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from google.oauth2.credentials import Credentials
+
+from fake_gmail_server import start_fake_gmail_server
+import gmail_service
+from gmail_service import GmailClient, GmailServiceCache, build_gmail_service
+
+
+def fake_credentials():
+    return Credentials(token="fake-token", client_id="fake", client_secret="fake",
+                       token_uri="https://oauth2.googleapis.com/token")
+
+
+async def cold_request(_cache):
+    # What every endpoint did before: new Credentials, new service, new connection
+    client = GmailClient(build_gmail_service(fake_credentials()))
+    await client.get_label('INBOX')
+
+
+async def warm_request(cache):
+    client = cache.get("bench-session", fake_credentials())
+    await client.get_label('INBOX')
+
+
+async def run(label, request, cache, count):
+    await request(cache)  # prime
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await request(cache)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{label:<6} mean {statistics.mean(timings):7.2f} ms   "
+          f"p50 {timings[len(timings) // 2]:7.2f} ms   p99 {timings[int(len(timings) * 0.99) - 1]:7.2f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = start_fake_gmail_server(latency=0.0, message_count=10)
+    gmail_service.GMAIL_API_ENDPOINT = f"http://127.0.0.1:{server.server_port}/"
+    cache = GmailServiceCache()
+
+    print(f"📭 {args.requests} labels.get calls per mode\n")
+    cold = asyncio.run(run("cold", cold_request, cache, args.requests))
+    warm = asyncio.run(run("warm", warm_request, cache, args.requests))
+    print(f"\nwarm saves {cold - warm:.2f} ms per request ({cold / warm:.1f}x); cache stats: {cache.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cost of one lead mutation as the store grows, full JSON rewrite vs journal.
+Journal appends run past LEADS_JOURNAL_COMPACT_EVERY, so the tail includes the appends
+that rotate the journal for compaction (the snapshot itself is written in the background).
+
+    python bench_lead_journal.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from lead_store import LEADS_JOURNAL_COMPACT_EVERY, LeadJournal
+
+
+def make_lead(index: int) -> dict:
+    return {
+        "id": f"lead_{index:08x}",
+        "email_id": f"{index:08x}",
+        "thread_id": f"{index:08x}",
+        "session_id": "bench-session",
+        "sender": f"Sender {index} <sender{index}@example.com>",
+        "subject": f"Inquiry #{index}",
+        "snippet": "We'd like a quote for the project",
+        "body": "Hi team,\n\nWe'd like a quote for the project. " * 10,
+        "classification": "Warm",
+        "confidence": 0.8,
+        "draft": {"to": f"sender{index}@example.com", "subject": f"Re: Inquiry #{index}", "body": "<p>Thanks!</p>" * 20},
+        "draft_type": "warm_review",
+        "created_at": "2024-01-01T10:00:00",
+        "status": "pending_review"
+    }
+
+
+def time_json_rewrite(leads: dict, path: Path, iterations: int):
+    timings = []
+    for i in range(iterations):
+        lead = leads[f"lead_{i:08x}"]
+        lead["status"] = "dismissed"
+        start = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as f:  # what save_leads_to_disk does
+            json.dump(leads, f, indent=2, default=str)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_journal(leads: dict, path: Path, iterations: int, compact_every: int):
+    with open(path, "w", encoding="utf-8") as f:  # compaction folds the journal into this snapshot
+        json.dump(leads, f, default=str)
+    journal = LeadJournal(path, compact_every=compact_every)
+    journal.replay()
+    timings = []
+    for i in range(iterations):
+        lead = leads[f"lead_{i % len(leads):08x}"]
+        lead["status"] = "dismissed"
+        start = time.perf_counter()
+        journal.append(lead["id"], lead)
+        timings.append(time.perf_counter() - start)
+    journal.close(compact=True)  # waits for background compactions (outside the timings)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=25000)
+    parser.add_argument("--compact-every", type=int, default=LEADS_JOURNAL_COMPACT_EVERY)
+    args = parser.parse_args()
+
+    print(f"{args.iterations} journal appends, compacting every {args.compact_every} records "
+          f"({args.iterations // args.compact_every} compactions)\n")
+    print(f"{'leads':>8}  {'json rewrite (mean)':>20}  {'journal append (mean)':>22}  {'p99':>9}  {'p99.9':>9}  {'max':>9}")
+    for size in args.sizes:
+        leads = {}
+        for index in range(size):
+            lead = make_lead(index)
+            leads[lead["id"]] = lead
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Full rewrites get slow fast; a handful of samples is enough to see the trend
+            rewrite = time_json_rewrite(leads, Path(tmp) / "rewrite.json", max(3, min(50, 200000 // size)))
+            journal = time_journal(leads, Path(tmp) / "leads.json", args.iterations, args.compact_every)
+        journal.sort()
+
+        def percentile(q: float) -> float:
+            return journal[int(len(journal) * q) - 1] * 1e6
+
+        print(f"{size:>8}  {statistics.mean(rewrite) * 1000:>17.2f} ms  {statistics.mean(journal) * 1e6:>19.1f} us  "
+              f"{percentile(0.99):>6.1f} us  {percentile(0.999):>6.1f} us  {journal[-1] * 1e6:>6.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Exactly-once guard for email processing: in-flight claims plus a persisted set of processed message ids."""
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Processed ids are kept in two generations of this size; the oldest generation is dropped on rotation
+DEDUP_GENERATION_SIZE = int(os.getenv("DEDUP_GENERATION_SIZE", "50000"))
+
+
+class MessageDeduplicator:
+    """
+    Decides whether a Gmail message still needs the agent.
+
+    - claim() succeeds for exactly one caller while a message is being processed.
+    - mark_processed() records the id in a rotating set (two generations, bounded
+      memory) that is appended to a log file, so restarts keep their memory.
+    - release() drops a claim without marking it processed, so failures can retry.
+    """
+
+    def __init__(self, path: Path, generation_size: int = DEDUP_GENERATION_SIZE):
+        self.path = Path(path)
+        self.generation_size = generation_size
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._current = set()
+        self._previous = set()
+        self._file = None
+        self.claims = 0
+        self.inflight_hits = 0
+        self.processed_hits = 0
+        self.released = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    message_id = line.strip()
+                    if message_id:
+                        self._remember(message_id, persist=False)
+            print(f"🧾 Loaded {len(self._current) + len(self._previous)} processed message ids")
+        except Exception as e:
+            print(f"⚠️ Could not load processed message ids: {e}")
+
+    def _remember(self, message_id: str, persist: bool = True):
+        # Called with the lock held (or during load)
+        if len(self._current) >= self.generation_size:
+            self._previous, self._current = self._current, set()
+            if persist:
+                self._rewrite()
+        self._current.add(message_id)
+        if persist:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(message_id + "\n")
+                self._file.flush()
+            except Exception as e:
+                print(f"⚠️ Could not persist processed message id: {e}")
+
+    def _rewrite(self):
+        """Shrink the log to the generation that survived rotation"""
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(message_id + "\n" for message_id in self._previous)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not rotate processed message ids: {e}")
+
+    def is_processed(self, message_id: str) -> bool:
+        with self._lock:
+            return message_id in self._current or message_id in self._previous
+
+    def seen(self, message_id: str) -> bool:
+        """Processed already or being processed right now (cheap pre-check before scheduling)"""
+        with self._lock:
+            return message_id in self._inflight or message_id in self._current or message_id in self._previous
+
+    def claim(self, message_id: str) -> bool:
+        """True if the caller now owns processing of this message"""
+        with self._lock:
+            if message_id in self._inflight:
+                self.inflight_hits += 1
+                return False
+            if message_id in self._current or message_id in self._previous:
+                self.processed_hits += 1
+                return False
+            self._inflight.add(message_id)
+            self.claims += 1
+            return True
+
+    def mark_processed(self, message_id: str):
+        with self._lock:
+            self._remember(message_id)
+
+    def release(self, message_id: str):
+        """Give up a claim; if the message was not marked processed it can be claimed again"""
+        with self._lock:
+            if message_id in self._inflight:
+                self._inflight.discard(message_id)
+                if message_id not in self._current and message_id not in self._previous:
+                    self.released += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "claims": self.claims,
+            "in_flight": len(self._inflight),
+            "inflight_hits": self.inflight_hits,
+            "processed_hits": self.processed_hits,
+            "released_for_retry": self.released,
+            "remembered": len(self._current) + len(self._previous)
+        }
@@ -0,0 +1,79 @@
+"""
+Local stand-in for the agent service (gmail_agent) used by benchmarks and tests.
+
+Answers POST /analyze with a canned Warm-lead result after --latency seconds, without
+calling an LLM. Point the backend at it with AGENT_SERVICE_URL=http://127.0.0.1:<port>.
+
+    python fake_agent_server.py --port 8801 --latency 0.02
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+
+def analysis_for(email: dict) -> dict:
+    """Canned agent response for one email"""
+    return {
+        "success": True,
+        "action": "save_draft",
+        "final_action": "save_draft",
+        "draft_type": "warm_review",
+        "draft": {
+            "to": email.get("email_sender", ""),
+            "subject": f"Re: {email.get('email_subject', '')}",
+            "body": "<p>Thanks for reaching out - happy to help.</p>"
+        },
+        "analysis": {
+            "is_lead": True,
+            "classification": "Warm",
+            "confidence": 0.8,
+            "reasoning": "Stub agent"
+        }
+    }
+
+
+def create_fake_agent_app(latency: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake Agent Service")
+    app.state.requests = 0
+
+    @app.post("/analyze")
+    async def analyze(email: dict):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return analysis_for(email)
+
+    return app
+
+
+def start_fake_agent_server(port: int = 0, latency: float = 0.0):
+    """Run the stub on a daemon thread; returns (uvicorn server, base URL)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    app = create_fake_agent_app(latency)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake agent service")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds spent 'thinking' per email")
+    args = parser.parse_args()
+
+    server, url = start_fake_agent_server(args.port, args.latency)
+    print(f"🤖 Fake agent service on {url} (latency {args.latency}s)")
+    print(f"   Set AGENT_SERVICE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.should_exit = True
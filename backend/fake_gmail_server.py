@@ -0,0 +1,225 @@
+"""
+Local stand-in for the Gmail REST API, used for offline benchmarks and latency tests.
+
+Point the backend at it with GMAIL_API_ENDPOINT=http://127.0.0.1:<port>/ and every
+Gmail call (including /batch) is answered from an in-memory mailbox. Each HTTP round
+trip is delayed by --latency seconds to mimic a real network hop.
+
+    python fake_gmail_server.py --port 8765 --latency 0.05 --messages 500
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+import urllib.parse
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GMAIL_PREFIX = "/gmail/v1/users/me"
+
+
+def make_message(index: int) -> dict:
+    """Build a fake Gmail message resource"""
+    message_id = f"{index:016x}"
+    body = f"Hi team,\n\nWe'd like a quote for project #{index}.\n\nThanks"
+    return {
+        "id": message_id,
+        "threadId": message_id,
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": body[:60],
+        "historyId": str(1000 + index),
+        "internalDate": str(1700000000000 + index * 1000),
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": f"Sender {index} <sender{index}@example.com>"},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Subject", "value": f"Inquiry #{index}"},
+                {"name": "Date", "value": "Mon, 1 Jan 2024 10:00:00 +0000"},
+                {"name": "Message-ID", "value": f"<{message_id}@example.com>"},
+            ],
+            "body": {"data": base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+class FakeMailbox:
+    """In-memory mailbox shared by all handler threads"""
+
+    def __init__(self, message_count: int):
+        self.lock = threading.Lock()
+        self.messages = {}
+        self.order = []
+        self.history = []  # (historyId, message_id)
+        self.history_id = 1000
+        for index in range(message_count):
+            self.add_message()
+
+    def add_message(self) -> dict:
+        with self.lock:
+            message = make_message(len(self.order))
+            self.history_id += 1
+            message["historyId"] = str(self.history_id)
+            self.messages[message["id"]] = message
+            self.order.insert(0, message["id"])
+            self.history.append((self.history_id, message["id"]))
+            return message
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+    server_version = "FakeGmail/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- dispatch -------------------------------------------------------
+
+    def do_GET(self):
+        self._delay()
+        self._send(*self.route("GET", self.path, b""))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._delay()
+        if urllib.parse.urlsplit(self.path).path == "/batch":
+            self._send_batch(body)
+        else:
+            self._send(*self.route("POST", self.path, body))
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def route(self, method: str, path: str, body: bytes):
+        """Answer a single Gmail API call; returns (status, payload)"""
+        mailbox = self.server.mailbox
+        url = urllib.parse.urlsplit(path)
+        query = urllib.parse.parse_qs(url.query)
+        parts = url.path[len(GMAIL_PREFIX):].strip("/").split("/") if url.path.startswith(GMAIL_PREFIX) else []
+
+        if parts == ["messages"] and method == "GET":
+            limit = int(query.get("maxResults", ["100"])[0])
+            labels = query.get("labelIds", [])
+            ids = [i for i in mailbox.order if all(l in mailbox.messages[i]["labelIds"] for l in labels)][:limit]
+            return 200, {"messages": [{"id": i, "threadId": i} for i in ids], "resultSizeEstimate": len(ids)}
+
+        if len(parts) == 2 and parts[0] == "messages" and method == "GET":
+            message = mailbox.messages.get(parts[1])
+            if not message:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if self.server.fail_rate and random.random() < self.server.fail_rate:
+                return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}}
+            return 200, message
+
+        if len(parts) == 3 and parts[0] == "messages" and parts[2] == "modify":
+            message = mailbox.messages.get(parts[1])
+            if not message:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            changes = json.loads(body or b"{}")
+            labels = [l for l in message["labelIds"] if l not in changes.get("removeLabelIds", [])]
+            message["labelIds"] = labels + changes.get("addLabelIds", [])
+            return 200, {"id": message["id"], "labelIds": message["labelIds"]}
+
+        if parts == ["messages", "send"]:
+            return 200, {"id": f"sent{int(time.time() * 1000):x}", "threadId": "t", "labelIds": ["SENT"]}
+
+        if parts == ["labels", "INBOX"]:
+            unread = sum(1 for m in mailbox.messages.values() if "UNREAD" in m["labelIds"])
+            return 200, {"id": "INBOX", "messagesUnread": unread, "messagesTotal": len(mailbox.messages)}
+
+        if parts == ["watch"]:
+            return 200, {"historyId": str(mailbox.history_id), "expiration": str(int(time.time() * 1000) + 604800000)}
+
+        if parts == ["profile"]:
+            return 200, {"emailAddress": "me@example.com", "historyId": str(mailbox.history_id)}
+
+        if parts == ["history"]:
+            start = int(query.get("startHistoryId", ["0"])[0])
+            if start and start < 1000:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            added = [
+                {"id": str(h), "messagesAdded": [{"message": {"id": m, "threadId": m, "labelIds": ["INBOX", "UNREAD"]}}]}
+                for h, m in mailbox.history if h > start
+            ]
+            offset = int(query.get("pageToken", ["0"])[0])
+            limit = int(query.get("maxResults", ["100"])[0])
+            response = {"history": added[offset:offset + limit], "historyId": str(mailbox.history_id)}
+            if offset + limit < len(added):
+                response["nextPageToken"] = str(offset + limit)
+            return 200, response
+
+        return 404, {"error": {"code": 404, "message": f"No fake route for {method} {url.path}"}}
+
+    # ---- responses ------------------------------------------------------
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_batch(self, body: bytes):
+        """Answer a multipart/mixed batch request the way Gmail does"""
+        envelope = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+        )
+        boundary = "batch_fake_gmail"
+        chunks = []
+        for part in envelope.iter_parts():
+            content_id = part["Content-ID"].strip("<>")
+            inner = part.get_payload(decode=True) or part.get_payload().encode()
+            request_line, _, rest = inner.partition(b"\n")
+            method, path = request_line.decode().split(" ")[:2]
+            inner_body = rest.split(b"\r\n\r\n", 1)[1] if b"\r\n\r\n" in rest else b""
+            status, payload = self.route(method, path, inner_body)
+            data = json.dumps(payload)
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n"
+                f"{data}\r\n"
+            )
+        data = ("".join(chunks) + f"--{boundary}--\r\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_gmail_server(port: int = 0, latency: float = 0.0, message_count: int = 200, fail_rate: float = 0.0):
+    """Start the fake server on a daemon thread; returns the server (server.server_port has the port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGmailHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.mailbox = FakeMailbox(message_count)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gmail API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every HTTP round trip")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of message gets that return 429")
+    args = parser.parse_args()
+
+    server = start_fake_gmail_server(args.port, args.latency, args.messages, args.fail_rate)
+    print(f"📭 Fake Gmail API on http://127.0.0.1:{server.server_port}/ (latency {args.latency}s)")
+    print(f"   Set GMAIL_API_ENDPOINT=http://127.0.0.1:{server.server_port}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,254 @@
+"""Gmail API access helpers shared by the backend endpoints."""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+
+# Point the client at a different Gmail API host (e.g. fake_gmail_server.py for offline benchmarks)
+GMAIL_API_ENDPOINT = os.getenv("GMAIL_API_ENDPOINT")
+
+# Gmail accepts up to 100 calls per batch but recommends 50 or fewer to avoid rate limiting
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+GMAIL_BATCH_MAX_RETRIES = int(os.getenv("GMAIL_BATCH_MAX_RETRIES", "2"))
+GMAIL_BATCH_RETRY_DELAY = float(os.getenv("GMAIL_BATCH_RETRY_DELAY", "0.5"))
+
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date', 'List-Unsubscribe', 'Precedence']
+
+# googleapiclient is blocking, so every call runs on this bounded pool instead of the event loop
+GMAIL_MAX_WORKERS = int(os.getenv("GMAIL_MAX_WORKERS", "16"))
+gmail_executor = ThreadPoolExecutor(max_workers=GMAIL_MAX_WORKERS, thread_name_prefix="gmail")
+
+# Per-session cache of built Gmail clients (building one re-parses the discovery document)
+GMAIL_SERVICE_CACHE_SIZE = int(os.getenv("GMAIL_SERVICE_CACHE_SIZE", "256"))
+GMAIL_SERVICE_IDLE_TIMEOUT = float(os.getenv("GMAIL_SERVICE_IDLE_TIMEOUT", "900"))
+GMAIL_HTTP_TIMEOUT = float(os.getenv("GMAIL_HTTP_TIMEOUT", "60"))
+
+# Per-item errors worth retrying in a follow-up batch (rate limits and transient backend errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def build_gmail_service(credentials=None, http=None):
+    """Build a Gmail API client, honouring GMAIL_API_ENDPOINT when set"""
+    if not GMAIL_API_ENDPOINT:
+        return build('gmail', 'v1', credentials=credentials, http=http)
+
+    # The batch URI comes from the discovery document's rootUrl, so client_options
+    # alone would still send batches to Google - patch the document instead.
+    document = json.loads(discovery_cache.get_static_doc('gmail', 'v1'))
+    document['rootUrl'] = GMAIL_API_ENDPOINT.rstrip('/') + '/'
+    return build_from_document(document, credentials=credentials, http=http)
+
+
+def batch_get_messages(
+    service,
+    message_ids: List[str],
+    chunk_size: Optional[int] = None,
+    http=None,
+    **get_kwargs
+) -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Fetch many messages with the Gmail batch endpoint instead of one round trip each.
+    Returns (messages by id, errors by id). Items that fail with a retryable status are
+    re-sent in a smaller follow-up batch; anything else is reported per item.
+    """
+    chunk_size = max(1, min(chunk_size or GMAIL_BATCH_SIZE, 100))
+    get_kwargs.setdefault('userId', 'me')
+
+    messages = {}
+    errors = {}
+    pending = list(dict.fromkeys(message_ids))  # de-duplicate, keep order
+    attempt = 0
+
+    while pending:
+        retry_ids = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                messages[request_id] = response
+                errors.pop(request_id, None)
+                return
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            errors[request_id] = str(exception)
+            if status in RETRYABLE_STATUSES:
+                retry_ids.append(request_id)
+
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in chunk:
+                batch.add(
+                    service.users().messages().get(id=message_id, **get_kwargs),
+                    request_id=message_id
+                )
+            try:
+                batch.execute(http=http)
+            except HttpError as error:
+                # The whole batch request failed - mark every item in this chunk
+                for message_id in chunk:
+                    errors[message_id] = str(error)
+                    if error.resp.status in RETRYABLE_STATUSES:
+                        retry_ids.append(message_id)
+
+        if not retry_ids or attempt >= GMAIL_BATCH_MAX_RETRIES:
+            break
+
+        attempt += 1
+        print(f"🔁 Retrying {len(retry_ids)} message(s) from batch (attempt {attempt})")
+        time.sleep(GMAIL_BATCH_RETRY_DELAY * (2 ** (attempt - 1)))
+        pending = retry_ids
+        chunk_size = max(1, chunk_size // 2)
+
+    return messages, errors
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking Google API call on the Gmail thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(gmail_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_gmail_executor():
+    """Stop the Gmail pool on shutdown; queued calls are cancelled"""
+    gmail_executor.shutdown(wait=False, cancel_futures=True)
+
+
+_thread_local = threading.local()
+
+
+def thread_http():
+    """Keep-alive transport owned by the calling pool thread (httplib2.Http is not thread-safe)"""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = httplib2.Http(timeout=GMAIL_HTTP_TIMEOUT)
+        _thread_local.http = http
+    return http
+
+
+class GmailClient:
+    """Awaitable Gmail API methods; each call executes on the Gmail thread pool"""
+
+    def __init__(self, service, credentials=None):
+        self.service = service
+        self.credentials = credentials
+
+    def _http(self):
+        # Authorize the worker thread's pooled connection for this session
+        if self.credentials is None:
+            return None
+        return AuthorizedHttp(self.credentials, http=thread_http())
+
+    def _execute(self, request):
+        return request.execute(http=self._http())
+
+    async def execute(self, request):
+        return await run_blocking(self._execute, request)
+
+    async def list_messages(self, **kwargs):
+        kwargs.setdefault('userId', 'me')
+        return await self.execute(self.service.users().messages().list(**kwargs))
+
+    async def get_message(self, message_id: str, **kwargs):
+        kwargs.setdefault('userId', 'me')
+        return await self.execute(self.service.users().messages().get(id=message_id, **kwargs))
+
+    async def batch_get_messages(self, message_ids: List[str], chunk_size: Optional[int] = None, **kwargs):
+        def _batch():
+            return batch_get_messages(self.service, message_ids, chunk_size, http=self._http(), **kwargs)
+        return await run_blocking(_batch)
+
+    async def modify_message(self, message_id: str, body: dict):
+        return await self.execute(self.service.users().messages().modify(userId='me', id=message_id, body=body))
+
+    async def mark_as_read(self, message_id: str):
+        return await self.modify_message(message_id, {'removeLabelIds': ['UNREAD']})
+
+    async def send_message(self, body: dict):
+        return await self.execute(self.service.users().messages().send(userId='me', body=body))
+
+    async def get_label(self, label_id: str):
+        return await self.execute(self.service.users().labels().get(userId='me', id=label_id))
+
+    async def watch(self, body: dict):
+        return await self.execute(self.service.users().watch(userId='me', body=body))
+
+    async def list_history(self, **kwargs):
+        kwargs.setdefault('userId', 'me')
+        return await self.execute(self.service.users().history().list(**kwargs))
+
+    async def get_profile(self):
+        return await self.execute(self.service.users().getProfile(userId='me'))
+
+
+class GmailServiceCache:
+    """LRU cache of per-session GmailClients with idle expiry"""
+
+    def __init__(self, max_size: int = GMAIL_SERVICE_CACHE_SIZE, idle_timeout: float = GMAIL_SERVICE_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()  # session_id -> (client, access_token, last_used)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id: str, credentials) -> GmailClient:
+        """Return the cached client for a session, building one on miss or token change"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_idle(now)
+            entry = self._entries.get(session_id)
+            if entry and entry[1] == credentials.token:
+                self._entries[session_id] = (entry[0], entry[1], now)
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock - parsing the discovery document is the slow part.
+        # Requests are executed with a per-thread AuthorizedHttp, so the service's own
+        # transport is only a placeholder.
+        client = GmailClient(build_gmail_service(http=httplib2.Http()), credentials)
+
+        with self._lock:
+            self._entries[session_id] = (client, credentials.token, now)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def invalidate(self, session_id: str):
+        """Drop a session's client (token rotated or session ended)"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _expire_idle(self, now: float):
+        while self._entries:
+            session_id, (_, _, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+gmail_service_cache = GmailServiceCache()
@@ -0,0 +1,151 @@
+"""Incremental Gmail ingestion: process only the messages added since each mailbox's last historyId."""
+import asyncio
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional
+
+from googleapiclient.errors import HttpError
+
+# history.list page size (Gmail allows up to 500)
+INGEST_HISTORY_PAGE_SIZE = int(os.getenv("INGEST_HISTORY_PAGE_SIZE", "500"))
+# Upper bound on messages fetched when a mailbox has no usable checkpoint
+INGEST_RESYNC_MAX_MESSAGES = int(os.getenv("INGEST_RESYNC_MAX_MESSAGES", "25"))
+
+
+class HistoryIngestor:
+    """
+    Drives lead processing from Gmail's history API instead of re-listing the inbox.
+
+    Each mailbox has a checkpoint (the last historyId whose changes were handed off).
+    A notification walks history.list from that checkpoint, dispatches every message
+    added to the INBOX and advances the checkpoint. When Gmail no longer has history
+    that old (404), a bounded resync of the newest unread inbox messages takes its place;
+    it skips anything already processed, since its replies may already have been sent.
+    Runs for the same mailbox are serialized, so bursts of notifications coalesce.
+    """
+
+    def __init__(
+        self,
+        store,
+        get_client: Callable[[str], Awaitable],
+        dispatch: Callable[..., Awaitable],
+        is_processed: Callable[[str], bool] = lambda message_id: False,
+        page_size: int = INGEST_HISTORY_PAGE_SIZE,
+        resync_max: int = INGEST_RESYNC_MAX_MESSAGES
+    ):
+        self._store = store  # LeadStore: load_checkpoints / save_checkpoint
+        self._get_client = get_client  # async: session_id -> GmailClient
+        self._dispatch = dispatch  # async: (message_ids, email_address, history_id, session_id, backlog)
+        self._is_processed = is_processed  # message_id -> already handled (lead stored or claimed)
+        self.page_size = page_size
+        self.resync_max = resync_max
+        self._checkpoints = store.load_checkpoints()
+        self._locks = defaultdict(asyncio.Lock)
+        self.runs = 0
+        self.skipped = 0
+        self.history_pages = 0
+        self.messages_dispatched = 0
+        self.resyncs = 0
+
+    @staticmethod
+    def _mailbox(email_address: str) -> str:
+        return (email_address or "").strip().lower()
+
+    def checkpoint(self, email_address: str) -> Optional[str]:
+        return self._checkpoints.get(self._mailbox(email_address))
+
+    def _advance(self, mailbox: str, history_id):
+        if history_id is None:
+            return
+        current = self._checkpoints.get(mailbox)
+        if current is not None and int(history_id) <= int(current):
+            return
+        self._checkpoints[mailbox] = str(history_id)
+        self._store.save_checkpoint(mailbox, str(history_id))
+
+    def seed(self, email_address: str, history_id):
+        """Start a mailbox's checkpoint at `history_id` (from users.watch) unless it already has one"""
+        mailbox = self._mailbox(email_address)
+        if mailbox and mailbox not in self._checkpoints:
+            self._advance(mailbox, history_id)
+
+    async def ingest(self, email_address: str, session_id: str, notified_history_id=None) -> dict:
+        """Dispatch every message added since the mailbox's checkpoint; returns a summary"""
+        mailbox = self._mailbox(email_address)
+        async with self._locks[mailbox]:
+            checkpoint = self._checkpoints.get(mailbox)
+            # An earlier run (for a later notification) already covered this one
+            if checkpoint and notified_history_id and str(notified_history_id).isdigit() \
+                    and int(notified_history_id) <= int(checkpoint):
+                self.skipped += 1
+                return {"mailbox": mailbox, "dispatched": 0, "history_id": checkpoint, "skipped": True}
+
+            self.runs += 1
+            gmail, _ = await self._get_client(session_id)
+            if checkpoint is None:
+                return await self._resync(gmail, mailbox, email_address, session_id, reason="no checkpoint")
+
+            message_ids = {}  # ordered set
+            latest = checkpoint
+            page_token = None
+            try:
+                while True:
+                    response = await gmail.list_history(
+                        startHistoryId=checkpoint,
+                        historyTypes=['messageAdded'],
+                        labelId='INBOX',
+                        maxResults=self.page_size,
+                        pageToken=page_token
+                    )
+                    self.history_pages += 1
+                    for record in response.get('history', []):
+                        for added in record.get('messagesAdded', []):
+                            message = added.get('message', {})
+                            if 'INBOX' in message.get('labelIds', ['INBOX']) and message.get('id'):
+                                message_ids[message['id']] = None
+                    latest = response.get('historyId', latest)
+                    page_token = response.get('nextPageToken')
+                    if not page_token:
+                        break
+            except HttpError as error:
+                if error.resp.status == 404:
+                    # startHistoryId is older than Gmail keeps (roughly a week)
+                    return await self._resync(gmail, mailbox, email_address, session_id, reason="history expired")
+                raise
+
+            message_ids = list(message_ids)
+            await self._dispatch_all(message_ids, email_address, latest, session_id, backlog=False)
+            self._advance(mailbox, latest)
+            if message_ids:
+                print(f"📜 History {checkpoint} → {latest} for {mailbox}: {len(message_ids)} new message(s)")
+            return {"mailbox": mailbox, "dispatched": len(message_ids), "history_id": latest}
+
+    async def _resync(self, gmail, mailbox: str, email_address: str, session_id: str, reason: str) -> dict:
+        """Fall back to the newest unread inbox messages, then resume incremental sync from now"""
+        self.resyncs += 1
+        # Take the new checkpoint first so mail arriving during the resync is not missed
+        profile = await gmail.get_profile()
+        # Read mail was already handled (or seen by the user); re-running it could re-send replies
+        listing = await gmail.list_messages(labelIds=['INBOX', 'UNREAD'], maxResults=self.resync_max)
+        listed = [m['id'] for m in listing.get('messages', [])]
+        message_ids = [m for m in listed if not self._is_processed(m)]
+        print(f"🔁 Resync for {mailbox} ({reason}): {len(message_ids)} unread message(s)"
+              f" ({len(listed) - len(message_ids)} already processed)")
+        await self._dispatch_all(message_ids, email_address, profile.get('historyId'), session_id, backlog=True)
+        self._advance(mailbox, profile.get('historyId'))
+        return {"mailbox": mailbox, "dispatched": len(message_ids), "history_id": profile.get('historyId'), "resync": reason}
+
+    async def _dispatch_all(self, message_ids, email_address: str, history_id, session_id: str, backlog: bool):
+        if message_ids:
+            self.messages_dispatched += len(message_ids)
+            await self._dispatch(message_ids, email_address, history_id, session_id, backlog)
+
+    def stats(self) -> dict:
+        return {
+            "mailboxes": len(self._checkpoints),
+            "runs": self.runs,
+            "skipped_notifications": self.skipped,
+            "history_pages": self.history_pages,
+            "messages_dispatched": self.messages_dispatched,
+            "resyncs": self.resyncs
+        }
@@ -0,0 +1,726 @@
+"""Storage backends for leads and sessions (JSON files or SQLite)."""
+import base64
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# "json" keeps everything in memory backed by JSON files; "sqlite" serves leads from indexed queries
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", str(Path(__file__).parent / "gmail-pubsub.db"))
+
+# "json" rewrites leads-cache.json on every change; "journal" appends one record per mutation
+LEADS_PERSISTENCE = os.getenv("LEADS_PERSISTENCE", "json").lower()
+# Group commit window: appended records are fsynced together at most this often (seconds)
+LEADS_JOURNAL_FSYNC_INTERVAL = float(os.getenv("LEADS_JOURNAL_FSYNC_INTERVAL", "0.05"))
+# Fold the journal into a fresh snapshot after this many records
+LEADS_JOURNAL_COMPACT_EVERY = int(os.getenv("LEADS_JOURNAL_COMPACT_EVERY", "10000"))
+
+
+_whitespace = re.compile(r"\s*")
+
+
+def iter_json_object(f, chunk_size: int = 1 << 16):
+    """
+    Yields the (key, value) pairs of the JSON object in file `f`, reading it in chunks.
+    Every step is a short read or decode, so a background thread loading a large snapshot
+    lets the request threads run in between instead of holding the GIL for the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer, index, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buffer, index, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer, index = buffer[index:] + chunk, 0
+        return True
+
+    def skip_whitespace():
+        nonlocal index
+        while True:
+            index = _whitespace.match(buffer, index).end()
+            if index < len(buffer) or not fill():
+                return
+
+    def expect(characters: str) -> str:
+        nonlocal index
+        skip_whitespace()
+        character = buffer[index:index + 1]
+        if not character or character not in characters:
+            raise ValueError(f"Snapshot: expected one of {characters!r}, found {character!r}")
+        index += 1
+        return character
+
+    def decode():
+        nonlocal index
+        skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, index)
+                # A number that reaches the end of the buffer (or stops at "1.") may be cut short
+                if eof or (end < len(buffer) and buffer[end] not in "0123456789.eE+-"):
+                    index = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    expect("{")
+    skip_whitespace()
+    if buffer[index:index + 1] == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+
+
+class LeadJournal:
+    """
+    Append-only log of lead mutations on top of a JSON snapshot.
+
+    The snapshot has the same format as leads-cache.json, so switching between
+    persistence modes keeps existing data. Each mutation appends one compact JSON
+    line; a background thread fsyncs appended lines in groups. Every
+    LEADS_JOURNAL_COMPACT_EVERY records the journal is rotated, and a background thread
+    folds the rotated file into the previous snapshot (the write path only renames files).
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        journal_path: Optional[Path] = None,
+        fsync_interval: float = LEADS_JOURNAL_FSYNC_INTERVAL,
+        compact_every: int = LEADS_JOURNAL_COMPACT_EVERY
+    ):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = Path(journal_path or f"{snapshot_path}.journal")
+        self.compacting_path = Path(f"{self.journal_path}.compacting")
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._dirty = False
+        self._records = 0
+        self._compaction = None
+        self.compactions = 0
+        self._stop = threading.Event()
+        self._flusher = None
+
+    # ---- startup ---------------------------------------------------------
+
+    def replay(self) -> dict:
+        """Rebuild the leads dict: snapshot, then any half-finished compaction, then the journal"""
+        if self.compacting_path.exists():
+            # Finish the crashed compaction first: the next rotation would overwrite its file
+            try:
+                self._fold_compacting(time.perf_counter())
+            except Exception as e:
+                print(f"⚠️ Could not fold leftover leads journal into snapshot: {e}")
+        leads = {}
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                leads = json.load(f)
+
+        replayed = 0
+        for path in (self.compacting_path, self.journal_path):
+            if path.exists():
+                replayed += self._apply(path, leads)
+
+        self._records = replayed
+        self._open()
+        return leads
+
+    def _apply(self, path: Path, leads: dict) -> int:
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final write from a crash - everything before it is intact
+                    print(f"⚠️ Skipping damaged journal record in {path.name}")
+                    continue
+                leads[record["id"]] = record["lead"]
+                count += 1
+        return count
+
+    def _open(self):
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="leads-journal-fsync", daemon=True)
+            self._flusher.start()
+
+    # ---- writes ----------------------------------------------------------
+
+    def append(self, lead_id: str, lead: dict):
+        """Record the current state of one lead"""
+        line = json.dumps({"id": lead_id, "lead": lead}, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()  # hand it to the OS now; fsync happens in the group commit
+            self._dirty = True
+            self._records += 1
+            if self._records >= self.compact_every and self._compaction is None:
+                self._start_compaction()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """fsync everything appended so far"""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            fd = self._file.fileno()
+            self._dirty = False
+        os.fsync(fd)
+
+    # ---- compaction ------------------------------------------------------
+
+    def _start_compaction(self):
+        # Called with the lock held (on the request path), so it only rotates the journal:
+        # new appends go to a fresh file, and the old snapshot + rotated file are folded
+        # into the new snapshot in the background, without touching the live leads dict.
+        # If an earlier compaction failed, its rotated file is still pending: fold that one
+        # instead of overwriting it, and rotate on the next trigger.
+        rotated = None
+        if not self.compacting_path.exists():
+            self._file.flush()
+            rotated = self._file
+            os.replace(self.journal_path, self.compacting_path)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+            self._dirty = False
+            self._records = 0
+
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(rotated,), name="leads-compaction", daemon=True)
+        self._compaction.start()
+        return rotated is not None
+
+    def _write_snapshot(self, rotated):
+        start = time.perf_counter()
+        try:
+            if rotated is not None:
+                os.fsync(rotated.fileno())  # its records stay replayable until the snapshot replaces them
+                rotated.close()
+            self._fold_compacting(start)
+            self.compactions += 1
+        except Exception as e:
+            print(f"⚠️ Leads journal compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    def _fold_compacting(self, start: float):
+        """Write snapshot + rotated journal to a new snapshot, then drop the rotated file"""
+        state = {}
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                state = dict(iter_json_object(f))
+        self._apply(self.compacting_path, state)
+        tmp_path = Path(f"{self.snapshot_path}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # One entry per encode, for the same reason as iter_json_object
+            f.write("{")
+            for position, (lead_id, lead) in enumerate(state.items()):
+                f.write(("," if position else "") + json.dumps(lead_id) + ":" + json.dumps(lead, default=str))
+            f.write("}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.compacting_path.unlink(missing_ok=True)
+        print(f"🗜️ Compacted leads journal into snapshot ({len(state)} leads, {time.perf_counter() - start:.2f}s)")
+
+    def compact(self):
+        """Compact synchronously (used on shutdown so the snapshot is complete)"""
+        while True:
+            with self._lock:
+                in_progress = self._compaction
+                if in_progress is None:
+                    rotated = self._start_compaction()
+                    compaction = self._compaction
+            if in_progress is not None:
+                # Let the background compaction finish, then fold in what came after it
+                in_progress.join()
+                continue
+            compaction.join()
+            if rotated or self.compacting_path.exists():
+                return
+            # Only a leftover file was folded; the live journal still needs its turn
+
+    def close(self, compact: bool = False):
+        if compact:
+            self.compact()
+        self._stop.set()
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "journal_records": self._records,
+            "compactions": self.compactions,
+            "compacting": self._compaction is not None
+        }
+
+
+def encode_cursor(lead: dict) -> str:
+    """Opaque pagination cursor: the (created_at, id) position of the last lead on a page"""
+    raw = json.dumps([lead.get("created_at") or "", lead["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Raises ValueError for malformed cursors"""
+    try:
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(created_at), str(lead_id)
+
+
+class LeadStore:
+    """Interface shared by the storage backends"""
+
+    def get(self, lead_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def contains(self, lead_id: str) -> bool:
+        return self.get(lead_id) is not None
+
+    def put(self, lead: dict):
+        """Insert or replace a lead (keyed by lead["id"]) and stamp it with the session's next version"""
+        raise NotImplementedError
+
+    def session_version(self, session_id: str) -> int:
+        """Monotonic counter bumped by every lead mutation in the session"""
+        raise NotImplementedError
+
+    def changes_since(self, session_id: str, since: int, limit: int) -> List[dict]:
+        """Leads whose latest mutation has a version greater than `since`, oldest change first"""
+        raise NotImplementedError
+
+    def list_leads(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+        after: Optional[Tuple[str, str]] = None,
+        status: Optional[str] = None,
+        classification: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[dict]]:
+        """
+        One page of a session's leads, newest first, strictly after the `after`
+        (created_at, id) position. Returns (leads, last lead if more pages follow).
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def load_sessions(self) -> Dict[str, dict]:
+        raise NotImplementedError
+
+    def save_sessions(self, sessions: Dict[str, dict]):
+        raise NotImplementedError
+
+    def load_checkpoints(self) -> Dict[str, str]:
+        """Last ingested Gmail historyId per mailbox address"""
+        raise NotImplementedError
+
+    def save_checkpoint(self, mailbox: str, history_id: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonLeadStore(LeadStore):
+    """Leads held in memory, persisted to leads-cache.json (full rewrite or journal) and sessions-cache.json"""
+
+    def __init__(self, leads_file: Path, sessions_file: Path, persistence: str = LEADS_PERSISTENCE):
+        self.leads_file = Path(leads_file)
+        self.sessions_file = Path(sessions_file)
+        self.checkpoints_file = self.sessions_file.with_name("history-checkpoints.json")
+        self.checkpoints = {}  # mailbox -> historyId
+        self.journal = LeadJournal(self.leads_file) if persistence == "journal" else None
+        self.leads = {}  # lead_id -> lead_data
+        # Sorted (created_at, id) keys per session, and per session + status/classification
+        self._index = defaultdict(list)
+        self._indexed = {}  # lead_id -> (index keys, sort key, version) as last indexed
+        self._versions = defaultdict(int)  # session_id -> latest version
+        self._changes = defaultdict(list)  # session_id -> sorted (version, lead_id)
+        self._load_leads()
+        for lead in self.leads.values():
+            session_id = lead.get("session_id")
+            self._versions[session_id] = max(self._versions[session_id], lead.get("version", 0))
+            self._index_lead(lead)
+
+    def _load_leads(self):
+        if self.journal:
+            try:
+                self.leads = self.journal.replay()
+                print(f"📊 Loaded {len(self.leads)} leads from snapshot + journal")
+            except Exception as e:
+                print(f"⚠️ Could not replay leads journal: {e}")
+            return
+        if self.leads_file.exists():
+            try:
+                with open(self.leads_file, "r", encoding="utf-8") as f:
+                    self.leads = json.load(f)
+                print(f"📊 Loaded {len(self.leads)} leads from disk")
+            except Exception as e:
+                print(f"⚠️ Could not load leads cache: {e}")
+
+    def _save_leads(self):
+        try:
+            with open(self.leads_file, "w", encoding="utf-8") as f:
+                json.dump(self.leads, f, indent=2, default=str)
+        except Exception as e:
+            print(f"⚠️ Could not save leads cache: {e}")
+
+    def get(self, lead_id: str) -> Optional[dict]:
+        return self.leads.get(lead_id)
+
+    def contains(self, lead_id: str) -> bool:
+        return lead_id in self.leads
+
+    @staticmethod
+    def _index_keys(lead: dict):
+        session_id = lead.get("session_id")
+        keys = [(session_id,)]
+        if lead.get("status"):
+            keys.append((session_id, "status", lead["status"]))
+        if lead.get("classification"):
+            keys.append((session_id, "classification", lead["classification"].lower()))
+        return keys
+
+    @staticmethod
+    def _remove_sorted(entries: list, entry):
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def _index_lead(self, lead: dict):
+        # Leads are mutated in place before put(), so drop the entries recorded last time
+        previous = self._indexed.get(lead["id"])
+        if previous:
+            keys, sort_key, version = previous
+            for key in keys:
+                self._remove_sorted(self._index[key], sort_key)
+            self._remove_sorted(self._changes[keys[0][0]], (version, lead["id"]))
+
+        keys = self._index_keys(lead)
+        sort_key = (lead.get("created_at") or "", lead["id"])
+        version = lead.get("version", 0)
+        for key in keys:
+            bisect.insort(self._index[key], sort_key)
+        bisect.insort(self._changes[lead.get("session_id")], (version, lead["id"]))
+        self._indexed[lead["id"]] = (keys, sort_key, version)
+
+    def put(self, lead: dict):
+        session_id = lead.get("session_id")
+        self._versions[session_id] += 1
+        lead["version"] = self._versions[session_id]
+        self.leads[lead["id"]] = lead
+        self._index_lead(lead)
+        if not self.journal:
+            self._save_leads()
+            return
+        try:
+            self.journal.append(lead["id"], lead)
+        except Exception as e:
+            print(f"⚠️ Could not append to leads journal: {e}")
+
+    def list_leads(self, session_id, limit=None, after=None, status=None, classification=None):
+        # Walk the narrowest index backwards from the cursor - cost is O(page), not O(leads)
+        if status:
+            entries = self._index.get((session_id, "status", status), [])
+        elif classification:
+            entries = self._index.get((session_id, "classification", classification.lower()), [])
+        else:
+            entries = self._index.get((session_id,), [])
+
+        position = bisect.bisect_left(entries, tuple(after)) if after else len(entries)
+        page = []
+        while position > 0:
+            position -= 1
+            lead = self.leads[entries[position][1]]
+            if classification and (lead.get("classification") or "").lower() != classification.lower():
+                continue
+            if limit is not None and len(page) == limit:
+                return page, page[-1]
+            page.append(lead)
+        return page, None
+
+    def session_version(self, session_id: str) -> int:
+        return self._versions.get(session_id, 0)
+
+    def changes_since(self, session_id: str, since: int, limit: int) -> List[dict]:
+        entries = self._changes.get(session_id, [])
+        position = bisect.bisect_right(entries, (since, chr(0x10FFFF)))
+        return [self.leads[lead_id] for _, lead_id in entries[position:position + limit]]
+
+    def count(self) -> int:
+        return len(self.leads)
+
+    def load_sessions(self) -> Dict[str, dict]:
+        if not self.sessions_file.exists():
+            return {}
+        try:
+            with open(self.sessions_file, "r", encoding="utf-8") as f:
+                sessions = json.load(f)
+            print(f"💾 Loaded {len(sessions)} sessions from disk")
+            return sessions
+        except Exception as e:
+            print(f"⚠️ Could not load sessions cache: {e}")
+            return {}
+
+    def save_sessions(self, sessions: Dict[str, dict]):
+        try:
+            snapshot = {session_id: dict(session) for session_id, session in list(sessions.items())}
+            with open(self.sessions_file, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+        except Exception as e:
+            print(f"⚠️ Could not save sessions cache: {e}")
+
+    def load_checkpoints(self) -> Dict[str, str]:
+        if self.checkpoints_file.exists():
+            try:
+                with open(self.checkpoints_file, "r", encoding="utf-8") as f:
+                    self.checkpoints = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not load history checkpoints: {e}")
+        return dict(self.checkpoints)
+
+    def save_checkpoint(self, mailbox: str, history_id: str):
+        self.checkpoints[mailbox] = history_id
+        try:
+            # Small file, but a torn write would lose every mailbox's position
+            tmp = self.checkpoints_file.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.checkpoints, f)
+            os.replace(tmp, self.checkpoints_file)
+        except Exception as e:
+            print(f"⚠️ Could not save history checkpoints: {e}")
+
+    def close(self):
+        if self.journal:
+            # Fold the journal into leads-cache.json so the snapshot is complete
+            self.journal.close(compact=True)
+
+
+class SqliteLeadStore(LeadStore):
+    """Leads and sessions in SQLite (WAL mode); lead lists come from indexed queries"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leads (
+            id TEXT PRIMARY KEY,
+            session_id TEXT,
+            email_id TEXT,
+            status TEXT,
+            classification TEXT,
+            created_at TEXT,
+            data TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_leads_session_created ON leads (session_id, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_leads_session_status ON leads (session_id, status, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_leads_session_classification ON leads (session_id, classification, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads (created_at);
+        CREATE INDEX IF NOT EXISTS idx_leads_email_id ON leads (email_id);
+        CREATE INDEX IF NOT EXISTS idx_leads_session_version ON leads (session_id, version);
+
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            email TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_email ON sessions (email);
+
+        CREATE TABLE IF NOT EXISTS history_checkpoints (
+            mailbox TEXT PRIMARY KEY,
+            history_id TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, import_from=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(leads)")]
+        if columns and "version" not in columns:
+            self.conn.execute("ALTER TABLE leads ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.conn.executescript(self.SCHEMA)
+        self._versions = {}  # session_id -> latest version (loaded lazily)
+        if import_from is not None:
+            self._import_json(import_from)
+
+    def _import_json(self, open_source):
+        """One-time migration: seed an empty database from the JSON cache files"""
+        if self.count() or self._session_count():
+            return
+        source = open_source()
+        sessions = source.load_sessions()
+        checkpoints = source.load_checkpoints()
+        source.close()
+        if not source.leads and not sessions:
+            return
+        with self._transaction():
+            self.conn.executemany(self.UPSERT, [self._row(lead) for lead in source.leads.values()])
+        self.save_sessions(sessions)
+        for mailbox, history_id in checkpoints.items():
+            self.save_checkpoint(mailbox, history_id)
+        print(f"🗄️ Imported {len(source.leads)} leads and {len(sessions)} sessions from JSON into SQLite")
+
+    UPSERT = """
+        INSERT OR REPLACE INTO leads (id, session_id, email_id, status, classification, created_at, data, version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    @staticmethod
+    def _row(lead: dict):
+        return (
+            lead["id"],
+            lead.get("session_id"),
+            lead.get("email_id"),
+            lead.get("status"),
+            (lead.get("classification") or "").lower(),
+            lead.get("created_at") or "",
+            json.dumps(lead, separators=(",", ":"), default=str),
+            lead.get("version", 0)
+        )
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get(self, lead_id: str) -> Optional[dict]:
+        rows = self._query("SELECT data FROM leads WHERE id = ?", (lead_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def contains(self, lead_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM leads WHERE id = ?", (lead_id,)))
+
+    def _current_version(self, session_id: str) -> int:
+        # Called with the lock held
+        if session_id not in self._versions:
+            row = self.conn.execute("SELECT MAX(version) FROM leads WHERE session_id = ?", (session_id,)).fetchone()
+            self._versions[session_id] = row[0] or 0
+        return self._versions[session_id]
+
+    def put(self, lead: dict):
+        with self._lock:
+            session_id = lead.get("session_id")
+            lead["version"] = self._current_version(session_id) + 1
+            self.conn.execute(self.UPSERT, self._row(lead))
+            self._versions[session_id] = lead["version"]
+
+    def session_version(self, session_id: str) -> int:
+        with self._lock:
+            return self._current_version(session_id)
+
+    def changes_since(self, session_id: str, since: int, limit: int) -> List[dict]:
+        rows = self._query(
+            "SELECT data FROM leads WHERE session_id = ? AND version > ? ORDER BY version LIMIT ?",
+            (session_id, since, limit)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def list_leads(self, session_id, limit=None, after=None, status=None, classification=None):
+        sql = "SELECT data FROM leads WHERE session_id = ?"
+        params = [session_id]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        if classification:
+            sql += " AND classification = ?"
+            params.append(classification.lower())
+        if after:
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)  # one extra row tells us whether another page exists
+
+        page = [json.loads(row[0]) for row in self._query(sql, params)]
+        if limit is not None and len(page) > limit:
+            page = page[:limit]
+            return page, page[-1]
+        return page, None
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM leads")[0][0]
+
+    def _session_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM sessions")[0][0]
+
+    def load_sessions(self) -> Dict[str, dict]:
+        sessions = {row[0]: json.loads(row[1]) for row in self._query("SELECT session_id, data FROM sessions")}
+        print(f"💾 Loaded {len(sessions)} sessions from SQLite")
+        return sessions
+
+    def save_sessions(self, sessions: Dict[str, dict]):
+        try:
+            # Token refreshes mutate sessions from other threads; serialize a snapshot
+            rows = [
+                (session_id, (session.get("user_info") or {}).get("email"), json.dumps(dict(session), default=str))
+                for session_id, session in list(sessions.items())
+            ]
+            with self._transaction():
+                self.conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", rows)
+                placeholders = ",".join("?" * len(rows))
+                self.conn.execute(
+                    f"DELETE FROM sessions WHERE session_id NOT IN ({placeholders})",
+                    [row[0] for row in rows]
+                )
+        except Exception as e:
+            print(f"⚠️ Could not save sessions to SQLite: {e}")
+
+    def load_checkpoints(self) -> Dict[str, str]:
+        return dict(self._query("SELECT mailbox, history_id FROM history_checkpoints"))
+
+    def save_checkpoint(self, mailbox: str, history_id: str):
+        self._query("INSERT OR REPLACE INTO history_checkpoints VALUES (?, ?)", (mailbox, str(history_id)))
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN/COMMIT under the connection lock; a failure rolls back so the shared connection is never left mid-transaction"""
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def create_store(leads_file: Path, sessions_file: Path) -> LeadStore:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteLeadStore(SQLITE_PATH, import_from=lambda: JsonLeadStore(leads_file, sessions_file))
+    return JsonLeadStore(leads_file, sessions_file)
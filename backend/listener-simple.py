@@ -7,6 +7,13 @@ project_id = "jaano-gmail"
 subscription_id = "gmail-pull-sub"
 BACKEND_API = "http://localhost:8000"
 
+# One keep-alive connection pool for every notification instead of a new connection per httpx.post
+backend_client = httpx.Client(
+    base_url=BACKEND_API,
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    timeout=httpx.Timeout(5.0, connect=2.0)
+)
+
 subscriber = pubsub_v1.SubscriberClient()
 subscription_path = subscriber.subscription_path(project_id, subscription_id)
 
@@ -45,15 +52,14 @@ def process_messages():
             # Notify backend
             try:
                 print(f"🔄 Notifying backend...")
-                response = httpx.post(
-                    f"{BACKEND_API}/notify-new-email",
+                response = backend_client.post(
+                    "/notify-new-email",
                     json={
                         "email_address": email_address,
                         "history_id": history_id,
                         "message_id": message.message_id,
                         "publish_time": str(message.publish_time)
-                    },
-                    timeout=5.0
+                    }
                 )
                 print(f"✅ Backend response: {response.status_code}")
                 if response.status_code == 200:
@@ -82,3 +88,5 @@ try:
         
 except KeyboardInterrupt:
     print("\n\n⏹️  Stopping listener...")
+finally:
+    backend_client.close()
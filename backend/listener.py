@@ -11,6 +11,13 @@ subscription_id = "gmail-pull-sub"
 # Backend API to notify
 BACKEND_API = "http://localhost:8000"
 
+# One keep-alive connection pool for every notification instead of a new connection per httpx.post
+backend_client = httpx.Client(
+    base_url=BACKEND_API,
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+    timeout=httpx.Timeout(5.0, connect=2.0)
+)
+
 subscriber = pubsub_v1.SubscriberClient()
 subscription_path = subscriber.subscription_path(project_id, subscription_id)
 
@@ -36,15 +43,14 @@ def callback(message):
         # Notify all connected SSE clients via backend
         try:
             print(f"🔄 Notifying backend at {BACKEND_API}/notify-new-email...")
-            response = httpx.post(
-                f"{BACKEND_API}/notify-new-email",
+            response = backend_client.post(
+                "/notify-new-email",
                 json={
                     "email_address": email_address,
                     "history_id": history_id,
                     "message_id": message.message_id,
                     "publish_time": str(message.publish_time)
-                },
-                timeout=5.0
+                }
             )
             print(f"✅ Backend response: {response.status_code} - {response.text}")
         except Exception as e:
@@ -74,3 +80,5 @@ with subscriber:
     except TimeoutError:
         streaming_pull_future.cancel()
         streaming_pull_future.result()
+    finally:
+        backend_client.close()
@@ -20,6 +20,18 @@ from google.cloud import pubsub_v1
 from dotenv import load_dotenv
 from pathlib import Path
 import logging
+from gmail_service import (
+    gmail_service_cache,
+    run_blocking,
+    shutdown_gmail_executor,
+    METADATA_HEADERS,
+)
+from token_manager import RefreshRevoked, TokenManager
+from lead_store import create_store, encode_cursor, decode_cursor
+from ingestion import HistoryIngestor
+from dedup import MessageDeduplicator
+from processing_queue import ProcessingQueue
+from agent_client import AGENT_STREAM_DRAFTS, AgentClient
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -41,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # lets the dashboard send If-None-Match
 )
 
 # Mount static files (frontend)
@@ -88,63 +101,80 @@ SCOPES = [
     'openid'
 ]
 
-# In-memory storage (use database in production)
-sessions = {}
+# Storage backend for leads and sessions (STORAGE_BACKEND=json|sqlite)
 SESSIONS_FILE = Path(__file__).parent / "sessions-cache.json"
+LEADS_FILE = Path(__file__).parent / "leads-cache.json"
+lead_store = create_store(LEADS_FILE, SESSIONS_FILE)
 
+# One pooled, keep-alive HTTP client to the agent service for the app's lifetime
+agent_client = AgentClient()
 
-def load_sessions_from_disk():
-    """Load sessions from disk if cache file exists"""
-    global sessions
-    if SESSIONS_FILE.exists():
-        try:
-            with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
-                sessions = json.load(f)
-            print(f"💾 Loaded {len(sessions)} sessions from disk")
-        except Exception as e:
-            print(f"⚠️ Could not load sessions cache: {e}")
+# Ensures each Gmail message reaches the agent once (sync, notifications and tabs all race)
+message_dedup = MessageDeduplicator(Path(__file__).parent / "processed-ids.log")
 
+# Active sessions are kept in memory; the store persists them
+sessions = {}
 
-def save_sessions_to_disk():
-    """Persist sessions to disk (best-effort)"""
-    try:
-        with open(SESSIONS_FILE, "w", encoding="utf-8") as f:
-            json.dump(sessions, f)
-    except Exception as e:
-        print(f"⚠️ Could not save sessions cache: {e}")
 
+# Reverse index: mailbox address -> active session ids, oldest first (dict keeps order)
+sessions_by_email = defaultdict(dict)
+sessions_by_email_lock = threading.Lock()
 
-# Load any cached sessions at startup (module import time)
-load_sessions_from_disk()
 
-# Leads storage (processed emails)
-leads = {}  # lead_id -> lead_data
-LEADS_FILE = Path(__file__).parent / "leads-cache.json"
+def normalize_email(address: Optional[str]) -> str:
+    return (address or "").strip().lower()
 
 
-def load_leads_from_disk():
-    """Load leads from disk if cache file exists"""
-    global leads
-    if LEADS_FILE.exists():
-        try:
-            with open(LEADS_FILE, "r", encoding="utf-8") as f:
-                leads = json.load(f)
-            print(f"📊 Loaded {len(leads)} leads from disk")
-        except Exception as e:
-            print(f"⚠️ Could not load leads cache: {e}")
+def index_session(session_id: str):
+    """Register (or re-register as most recent) a session under its mailbox address"""
+    session = sessions.get(session_id)
+    address = normalize_email(session.get("user_info", {}).get("email")) if session else ""
+    if not address:
+        return
+    with sessions_by_email_lock:
+        owners = sessions_by_email[address]
+        owners.pop(session_id, None)
+        owners[session_id] = None
+
+
+def unindex_session(session_id: str, session: Optional[dict]):
+    """Remove a session from the mailbox index (logout)"""
+    address = normalize_email((session or {}).get("user_info", {}).get("email"))
+    with sessions_by_email_lock:
+        owners = sessions_by_email.get(address)
+        if owners is None:
+            return
+        owners.pop(session_id, None)
+        if not owners:
+            del sessions_by_email[address]
 
 
-def save_leads_to_disk():
-    """Persist leads to disk (best-effort)"""
-    try:
-        with open(LEADS_FILE, "w", encoding="utf-8") as f:
-            json.dump(leads, f, indent=2, default=str)
-    except Exception as e:
-        print(f"⚠️ Could not save leads cache: {e}")
+def find_session_for_email(address: Optional[str]) -> Optional[str]:
+    """Most recently active session for a mailbox address, or None"""
+    with sessions_by_email_lock:
+        owners = sessions_by_email.get(normalize_email(address))
+        if not owners:
+            return None
+        return next(reversed(owners))
 
 
-# Load any cached leads at startup
-load_leads_from_disk()
+def load_sessions_from_disk():
+    """Load sessions from the storage backend"""
+    global sessions
+    sessions = lead_store.load_sessions()
+    with sessions_by_email_lock:
+        sessions_by_email.clear()
+    for session_id in sessions:
+        index_session(session_id)
+
+
+def save_sessions_to_disk():
+    """Persist sessions to the storage backend (best-effort)"""
+    lead_store.save_sessions(sessions)
+
+
+# Load any cached sessions at startup (module import time)
+load_sessions_from_disk()
 
 # SSE connections for real-time notifications
 sse_connections = defaultdict(list)  # session_id -> list of queues
@@ -173,16 +203,30 @@ def refresh_session_credentials(session_id: str):
         
         # Update session with new token
         sessions[session_id]["access_token"] = credentials.token
+        sessions[session_id]["expiry"] = credentials.expiry.isoformat() if credentials.expiry else None
+        if credentials.refresh_token:
+            sessions[session_id]["refresh_token"] = credentials.refresh_token
         sessions[session_id]["token_refreshed"] = True  # Flag for frontend
         save_sessions_to_disk()
+        gmail_service_cache.invalidate(session_id)
+        index_session(session_id)  # refreshed session becomes the mailbox's preferred one
         
         print(f"✅ Refreshed token for session: {session_id[:20]}...")
         return credentials
         
     except Exception as e:
         print(f"❌ Token refresh failed: {e}")
+        if "invalid_grant" in str(e):
+            raise RefreshRevoked(str(e))  # the user revoked access or the grant expired
         return None
 
+# Refreshes tokens ahead of expiry in the background; concurrent refreshes are coalesced
+token_manager = TokenManager(
+    get_session=lambda session_id: sessions.get(session_id),
+    list_session_ids=lambda: list(sessions.keys()),
+    refresh_func=refresh_session_credentials
+)
+
 # Helper function to get valid credentials
 def get_valid_credentials(session_id: str):
     """Get credentials, refreshing if necessary"""
@@ -190,26 +234,21 @@ def get_valid_credentials(session_id: str):
     if not session:
         raise HTTPException(status_code=401, detail="Invalid session. Please login again.")
     
-    credentials = Credentials(
-        token=session["access_token"],
-        refresh_token=session["refresh_token"],
-        token_uri=session["token_uri"],
-        client_id=session["client_id"],
-        client_secret=session["client_secret"],
-        scopes=session["scopes"]
-    )
-    
-    # Check if token is expired and refresh if needed
-    if credentials.expired and credentials.refresh_token:
-        print(f"🔄 Token expired, refreshing...")
-        refreshed = refresh_session_credentials(session_id)
-        if refreshed:
-            credentials = refreshed
-        else:
-            raise HTTPException(status_code=401, detail="Failed to refresh token. Please login again.")
+    credentials = token_manager.get_credentials(session_id)
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Failed to refresh token. Please login again.")
     
     return credentials, session.get("token_refreshed", False)  # Return refresh flag
 
+
+async def get_gmail_client(session_id: str):
+    """Get an awaitable Gmail client for a session (credential refresh and build run off the event loop)"""
+    def _build():
+        credentials, token_refreshed = get_valid_credentials(session_id)
+        return gmail_service_cache.get(session_id, credentials), token_refreshed
+    
+    return await run_blocking(_build)
+
 # Pydantic models
 class TokenRequest(BaseModel):
     code: str
@@ -253,7 +292,13 @@ async def health():
         "status": "healthy",
         "frontend_url": FRONTEND_URL,
         "backend_url": REDIRECT_URI.replace("/auth/callback", ""),
-        "active_sessions": len(sessions)
+        "active_sessions": len(sessions),
+        "gmail_service_cache": gmail_service_cache.stats(),
+        "token_manager": token_manager.stats(),
+        "ingestion": ingestor.stats(),
+        "dedup": message_dedup.stats(),
+        "processing_queue": processing_queue.stats(),
+        "agent_client": agent_client.stats()
     }
 
 @app.get("/auth/login")
@@ -313,11 +358,11 @@ async def auth_callback(code: str, state: str):
             state=state
         )
         
-        flow.fetch_token(code=code)
+        await run_blocking(flow.fetch_token, code=code)
         credentials = flow.credentials
         
         # Get user info
-        user_info = get_user_info(credentials)
+        user_info = await run_blocking(get_user_info, credentials)
         
         # Create session
         session_id = secrets.token_urlsafe(32)
@@ -328,8 +373,10 @@ async def auth_callback(code: str, state: str):
             "client_id": credentials.client_id,
             "client_secret": credentials.client_secret,
             "scopes": credentials.scopes,
+            "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
             "user_info": user_info
         }
+        index_session(session_id)
         save_sessions_to_disk()
         
         # Redirect back to frontend with session data
@@ -364,11 +411,11 @@ async def exchange_token(token_request: TokenRequest):
             redirect_uri=REDIRECT_URI
         )
         
-        flow.fetch_token(code=token_request.code)
+        await run_blocking(flow.fetch_token, code=token_request.code)
         credentials = flow.credentials
         
         # Get user info
-        user_info = get_user_info(credentials)
+        user_info = await run_blocking(get_user_info, credentials)
         
         # Create session
         session_id = secrets.token_urlsafe(32)
@@ -379,8 +426,10 @@ async def exchange_token(token_request: TokenRequest):
             "client_id": credentials.client_id,
             "client_secret": credentials.client_secret,
             "scopes": credentials.scopes,
+            "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
             "user_info": user_info
         }
+        index_session(session_id)
         
         return TokenResponse(
             access_token=credentials.token,
@@ -398,49 +447,48 @@ async def sync_gmail(
     max_results: int = 10, 
     unread_only: bool = True,
     process_leads: bool = False, 
-    background_tasks: BackgroundTasks = None
+    batch_size: Optional[int] = None
 ):
     """
     Sync Gmail messages for authenticated user.
-    If process_leads=True, triggers background agent analysis for fetched messages.
+    If process_leads=True, queues agent analysis for fetched messages.
     """
     try:
-        # Get valid credentials (auto-refreshes if expired)
-        credentials, token_refreshed = get_valid_credentials(session_id)
+        # Get Gmail client with valid credentials (auto-refreshes if expired)
+        gmail, token_refreshed = await get_gmail_client(session_id)
         session = sessions.get(session_id)
         
-        # Build Gmail service
-        service = build('gmail', 'v1', credentials=credentials)
-        
         # Fetch messages (unread only if requested)
         query_params = {
-            'userId': 'me',
             'maxResults': max_results
         }
         
         if unread_only:
             query_params['q'] = 'is:unread'
         
-        results = service.users().messages().list(**query_params).execute()
+        results = await gmail.list_messages(**query_params)
         
         messages = results.get('messages', [])
         
-        # Get full message details
+        # Get message metadata in batches instead of one round trip per message
+        message_ids = [msg['id'] for msg in messages[:max_results]]
+        fetched, failed = await gmail.batch_get_messages(
+            message_ids,
+            chunk_size=batch_size,
+            format='metadata',
+            metadataHeaders=METADATA_HEADERS
+        )
+        if failed:
+            print(f"⚠️ Could not fetch {len(failed)} of {len(message_ids)} message(s) in batch")
+        
         detailed_messages = []
         for msg in messages[:max_results]:
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['From', 'To', 'Subject', 'Date']
-            ).execute()
+            message = fetched.get(msg['id'])
+            if not message:
+                continue
             
             # Extract headers
-            headers = {}
-            for header in message.get('payload', {}).get('headers', []):
-                name = header['name']
-                if name in ['From', 'To', 'Subject', 'Date']:
-                    headers[name] = header['value']
+            headers = message_headers(message)
             
             # Convert internalDate to ISO format
             internal_date_ms = int(message.get('internalDate', 0))
@@ -460,23 +508,15 @@ async def sync_gmail(
                 "isUnread": 'UNREAD' in message.get('labelIds', [])
             })
             
-            # Trigger background processing if requested and not already a lead
-            if process_leads and background_tasks:
+            # Queue agent processing if requested and not already a lead
+            if process_leads:
                 # Check if lead already exists
                 lead_id = f"lead_{msg['id']}"
-                if lead_id not in leads:
-                    print(f"🔄 Triggering background analysis for synced email {msg['id']}")
-                    
-                    # Extract email address for session lookup (hacky fallback since we have session_id)
-                    # Ideally pass session_id to process_email_background directly
+                if not lead_store.contains(lead_id) and not message_dedup.seen(msg['id']):
                     email_addr = session.get("user_info", {}).get("email")
-                    
-                    background_tasks.add_task(
-                        process_email_background, 
-                        msg['id'], 
-                        email_addr, 
-                        message.get('historyId')
-                    )
+                    lane = choose_lane(session_id, headers, realtime=False)
+                    if processing_queue.submit(msg['id'], email_addr, message.get('historyId'), session_id, lane):
+                        print(f"🔄 Queued synced email {msg['id']} for analysis ({lane})")
         
         result = {
             "success": True,
@@ -485,6 +525,9 @@ async def sync_gmail(
             "user_email": session["user_info"]["email"]
         }
         
+        if failed:
+            result["failed_message_ids"] = list(failed.keys())
+        
         # Include new access token if it was refreshed
         if token_refreshed:
             result["new_access_token"] = session["access_token"]
@@ -507,21 +550,10 @@ async def refresh_token(session_id: str):
         if not session:
             raise HTTPException(status_code=401, detail="Invalid session")
         
-        credentials = Credentials(
-            token=session["access_token"],
-            refresh_token=session["refresh_token"],
-            token_uri=session["token_uri"],
-            client_id=session["client_id"],
-            client_secret=session["client_secret"],
-            scopes=session["scopes"]
-        )
-        
-        # Refresh token
-        credentials.refresh(Request())
-        
-        # Update session
-        sessions[session_id]["access_token"] = credentials.token
-        save_sessions_to_disk()
+        # Refresh token (joins any refresh already in flight for this session)
+        credentials = await run_blocking(token_manager.refresh, session_id)
+        if credentials is None:
+            raise HTTPException(status_code=500, detail="Token refresh failed")
         
         return {
             "success": True,
@@ -535,8 +567,11 @@ async def refresh_token(session_id: str):
 async def logout(session_id: str):
     """Logout user and clear session"""
     if session_id in sessions:
-        del sessions[session_id]
+        unindex_session(session_id, sessions.pop(session_id))
         save_sessions_to_disk()
+    known_correspondents.pop(session_id, None)
+    gmail_service_cache.invalidate(session_id)
+    token_manager.forget(session_id)
     return {"success": True, "message": "Logged out successfully"}
 
 @app.get("/user/info")
@@ -556,10 +591,8 @@ async def watch_gmail(watch_request: WatchRequest):
     try:
         print(f"📡 Watch request received: {watch_request}")
         
-        # Get valid credentials (auto-refreshes if expired)
-        credentials, token_refreshed = get_valid_credentials(watch_request.session_id)
-        
-        service = build('gmail', 'v1', credentials=credentials)
+        # Get Gmail client with valid credentials (auto-refreshes if expired)
+        gmail, token_refreshed = await get_gmail_client(watch_request.session_id)
         
         # Set up watch request
         request_body = {
@@ -569,10 +602,7 @@ async def watch_gmail(watch_request: WatchRequest):
         
         print(f"🔔 Setting up Gmail watch with topic: {watch_request.topic_name}")
         
-        watch_response = service.users().watch(
-            userId='me',
-            body=request_body
-        ).execute()
+        watch_response = await gmail.watch(request_body)
         
         print(f"✅ Gmail watch activated: historyId={watch_response.get('historyId')}")
         
@@ -583,6 +613,9 @@ async def watch_gmail(watch_request: WatchRequest):
         }
         save_sessions_to_disk()
         
+        # Incremental ingestion starts from here for a mailbox seen for the first time
+        ingestor.seed(sessions[watch_request.session_id]["user_info"]["email"], watch_response['historyId'])
+        
         return {
             "success": True,
             "historyId": watch_response['historyId'],
@@ -601,7 +634,7 @@ async def watch_gmail(watch_request: WatchRequest):
         raise HTTPException(status_code=500, detail=f"Watch setup failed: {str(e)}")
 
 @app.post("/gmail/webhook")
-async def gmail_webhook(request: Request):
+async def gmail_webhook(request: Request, background_tasks: BackgroundTasks):
     """Webhook to receive Gmail push notifications"""
     try:
         # Get the notification data
@@ -625,6 +658,9 @@ async def gmail_webhook(request: Request):
                 for queue in queues:
                     await queue.put({"type": "new_email", "data": email_data})
             
+            if email_data.get("emailAddress"):
+                background_tasks.add_task(ingest_mailbox, email_data["emailAddress"], email_data.get("historyId"))
+            
             return {"success": True, "message": "Notification received"}
         
         return {"success": True, "message": "Empty notification"}
@@ -660,51 +696,32 @@ async def sse_endpoint(session_id: str):
 
 
 
-async def process_email_background(message_id: str, email_address: str, history_id: str):
+async def process_email_background(message_id: str, email_address: str, history_id: str, session_id: Optional[str] = None):
     """Background task to fetch email, call agent, and store as lead if applicable"""
-    import httpx
     from datetime import datetime
     print(f"🤖 Processing email {message_id} in background...")
     
-    # 1. Find a valid session for this email address
-    target_session_id = None
-    for session_id, session in sessions.items():
-        if session.get("user_info", {}).get("email") == email_address:
-            target_session_id = session_id
-            break
-            
-    if not target_session_id and sessions:
-        target_session_id = list(sessions.keys())[0]
-        print(f"⚠️ Exact session match not found for {email_address}, using first available session.")
+    # 1. Find the session that owns this mailbox (sync passes it directly)
+    target_session_id = session_id if session_id in sessions else find_session_for_email(email_address)
         
     if not target_session_id:
         print(f"❌ No active session found to process email {email_address}")
         return
+    
+    if not message_dedup.claim(message_id):
+        print(f"⏭️ Email {message_id} already processed or in progress - skipping")
+        return
 
+    announced_lead_id = None  # a dashboard card shown as "drafting" until new_lead replaces it
     try:
         # 2. Fetch full email content
-        credentials, _ = get_valid_credentials(target_session_id)
-        service = build('gmail', 'v1', credentials=credentials)
+        gmail, _ = await get_gmail_client(target_session_id)
         
-        msg = service.users().messages().get(
-            userId='me', 
-            id=message_id, 
-            format='full'
-        ).execute()
+        async with processing_queue.stage("gmail"):
+            msg = await gmail.get_message(message_id, format='full')
         
-        # Extract Body
-        import base64
-        body = ""
-        if 'parts' in msg['payload']:
-            for part in msg['payload']['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body'].get('data')
-                    if data:
-                        body += base64.urlsafe_b64decode(data).decode()
-        elif 'body' in msg['payload']:
-            data = msg['payload']['body'].get('data')
-            if data:
-                body = base64.urlsafe_b64decode(data).decode()
+        # Extract Body (the agent normalizes it: HTML, quotes, signatures)
+        body = extract_body(msg['payload'])
                 
         # Extract Headers
         headers = {h['name']: h['value'] for h in msg['payload']['headers']}
@@ -715,25 +732,45 @@ async def process_email_background(message_id: str, email_address: str, history_
         print(f"📨 Content fetched: {subject[:30]}...")
         
         # 3. Call Agent Service
-        AGENT_URL = "http://localhost:8001/analyze"
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                AGENT_URL, 
-                json={
-                    "email_sender": sender,
-                    "email_subject": subject,
-                    "email_body": body,
+        agent_payload = {
+            "email_sender": sender,
+            "email_subject": subject,
+            "email_body": body,
+            "email_id": message_id,
+            "thread_id": msg['threadId'],
+            "email_headers": agent_headers(headers),
+            "lead_prior": lead_prior(target_session_id, sender)
+        }
+        async with processing_queue.stage("agent"):
+            if AGENT_STREAM_DRAFTS:
+                # Dashboards get the lead as soon as it is classified and the draft as it is written
+                agent_result = await stream_agent_result(agent_payload, target_session_id, {
+                    "id": f"lead_{message_id}",
                     "email_id": message_id,
-                    "thread_id": msg['threadId']
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code != 200:
-                print(f"❌ Agent service failed: {response.text}")
-                return
+                    "thread_id": msg['threadId'],
+                    "session_id": target_session_id,
+                    "sender": sender,
+                    "subject": subject,
+                    "snippet": msg.get('snippet', ''),
+                    "date": date,
+                    "created_at": datetime.now().isoformat(),
+                    "status": "drafting"
+                })
+                if agent_result is None:
+                    return
+                if agent_result.get("announced"):
+                    announced_lead_id = f"lead_{message_id}"
+            else:
+                response = await agent_client.analyze(agent_payload)
                 
-            agent_result = response.json()
+                if response.status_code != 200:
+                    print(f"❌ Agent service failed: {response.text}")
+                    return
+                    
+                agent_result = response.json()
+        
+        # The agent has spoken for this message; never analyze (or auto-send) it again
+        message_dedup.mark_processed(message_id)
             
         classification = agent_result.get('analysis', {}).get('classification', 'Unknown')
         is_lead = agent_result.get('analysis', {}).get('is_lead', False)
@@ -744,12 +781,12 @@ async def process_email_background(message_id: str, email_address: str, history_
         # 4. If not a lead (spam/junk), skip storing
         if not is_lead or classification.lower() == 'spam':
             print(f"🗑️ Not a lead ({classification}) - skipping storage")
+            if announced_lead_id:
+                # Announced from an early analysis the final one overturned
+                push_to_session(target_session_id, {"type": "draft_failed", "lead_id": announced_lead_id})
+                announced_lead_id = None
             # Just mark as read
-            service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            await gmail.mark_as_read(message_id)
             return
         
         # 5. Create lead record
@@ -781,6 +818,7 @@ async def process_email_background(message_id: str, email_address: str, history_
             # HOT LEAD: Auto-send immediately
             print(f"🔥 HOT LEAD - Auto-sending reply to {draft['to']}")
             
+            import base64
             from email.mime.text import MIMEText
             message = MIMEText(draft['body'], 'html')
             message['to'] = draft['to']
@@ -798,15 +836,11 @@ async def process_email_background(message_id: str, email_address: str, history_
                 'threadId': msg['threadId']
             }
             
-            sent_msg = service.users().messages().send(userId='me', body=send_body).execute()
+            sent_msg = await gmail.send_message(send_body)
             print(f"✅ Auto-reply sent successfully! Message ID: {sent_msg['id']}")
             
             # Mark original as read
-            service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            await gmail.mark_as_read(message_id)
             
             # Update lead status to sent
             lead_data["status"] = "sent"
@@ -819,8 +853,8 @@ async def process_email_background(message_id: str, email_address: str, history_
             lead_data["status"] = "pending_review"
         
         # 7. Store the lead
-        leads[lead_id] = lead_data
-        save_leads_to_disk()
+        lead_store.put(lead_data)
+        remember_correspondent(target_session_id, sender)
         print(f"📊 Lead stored: {lead_id}")
         
         # 8. Broadcast to SSE clients
@@ -831,11 +865,196 @@ async def process_email_background(message_id: str, email_address: str, history_
                 except:
                     pass
         print(f"📢 Broadcasted new_lead to SSE clients")
+        announced_lead_id = None
             
     except Exception as e:
         print(f"❌ Background processing failed: {e}")
         import traceback
         traceback.print_exc()
+        if announced_lead_id:
+            push_to_session(target_session_id, {"type": "draft_failed", "lead_id": announced_lead_id})
+    finally:
+        message_dedup.release(message_id)
+
+
+def push_to_session(session_id: str, event: dict):
+    """Send an SSE event to the dashboards of one session only"""
+    for queue in sse_connections.get(session_id, []):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+async def stream_agent_result(payload: dict, session_id: str, lead_stub: dict) -> Optional[dict]:
+    """
+    Run the agent through /analyze/stream. A lead is announced to the session (lead_drafting)
+    once classified and its draft body follows as draft_delta events; returns the final
+    agent result, shaped like the /analyze response plus whether the lead was announced,
+    or None if the agent failed.
+    """
+    announced = False
+    result = None
+    try:
+        async for event in agent_client.stream_analyze(payload):
+            kind = event.get("event")
+            if kind == "analysis":
+                analysis = event.get("analysis", {})
+                if analysis.get("is_lead") and (analysis.get("classification") or "").lower() != "spam":
+                    announced = True
+                    push_to_session(session_id, {"type": "lead_drafting", "data": {
+                        **lead_stub,
+                        "classification": analysis.get("classification"),
+                        "confidence": analysis.get("confidence"),
+                        "reasoning": analysis.get("reasoning"),
+                        "draft": {"to": payload["email_sender"], "subject": "", "body": ""}
+                    }})
+            elif kind == "draft_delta" and announced:
+                push_to_session(session_id, {
+                    "type": "draft_delta",
+                    "lead_id": lead_stub["id"],
+                    "subject": event.get("subject"),
+                    "delta": event.get("delta", "")
+                })
+            elif kind == "draft_reset" and announced:
+                # The single-pass draft was rejected; the two-stage path is writing a new one
+                push_to_session(session_id, {"type": "draft_reset", "lead_id": lead_stub["id"]})
+            elif kind == "result":
+                result = {**event, "announced": announced}
+                return result
+            elif kind == "error":
+                print(f"❌ Agent service failed: {event.get('detail')}")
+                break
+    except Exception as e:
+        # Timeouts, dropped connections or a truncated NDJSON line mid-stream: same as an agent failure
+        print(f"❌ Agent stream failed: {type(e).__name__}: {e}")
+    finally:
+        if announced and result is None:
+            # Otherwise the dashboard's placeholder would stay in "drafting" for good
+            push_to_session(session_id, {"type": "draft_failed", "lead_id": lead_stub["id"]})
+    return None
+
+
+def extract_body(payload: dict) -> str:
+    """text/plain parts of a message, searching nested multiparts; text/html if there is no plain text"""
+    import base64
+    texts = {"text/plain": [], "text/html": []}
+    
+    def walk(part):
+        mime_type = part.get('mimeType', '')
+        data = part.get('body', {}).get('data')
+        if data and mime_type in texts and part.get('filename', '') == '':
+            texts[mime_type].append(base64.urlsafe_b64decode(data).decode('utf-8', errors='replace'))
+        for child in part.get('parts', []):
+            walk(child)
+    
+    walk(payload)
+    if not texts["text/plain"] and not texts["text/html"] and payload.get('body', {}).get('data'):
+        return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='replace')
+    return "".join(texts["text/plain"]) or "".join(texts["text/html"])
+
+
+def message_headers(message: Optional[dict]) -> dict:
+    return {h['name']: h['value'] for h in (message or {}).get('payload', {}).get('headers', [])}
+
+
+# Headers the agent's prefilter uses to recognise bulk and automated mail without an LLM call
+AGENT_HEADERS = ("list-unsubscribe", "list-id", "precedence", "auto-submitted", "x-autoreply", "x-autorespond")
+
+
+def agent_headers(headers: dict) -> dict:
+    return {name: value for name, value in headers.items() if name.lower() in AGENT_HEADERS}
+
+
+# Senders a session already has leads from; their mail jumps the processing queue
+known_correspondents = {}  # session_id -> set of lowercased addresses
+
+
+def correspondents_for(session_id: str) -> set:
+    known = known_correspondents.get(session_id)
+    if known is None:
+        from email.utils import parseaddr
+        session_leads, _ = lead_store.list_leads(session_id)
+        known = {parseaddr(lead.get("sender", ""))[1].lower() for lead in session_leads} - {""}
+        known_correspondents[session_id] = known
+    return known
+
+
+def remember_correspondent(session_id: str, sender: str):
+    from email.utils import parseaddr
+    address = parseaddr(sender or "")[1].lower()
+    if address:
+        correspondents_for(session_id).add(address)
+
+
+# Prior that mail from someone we already have a lead from is another lead; at or above the
+# agent's SPECULATIVE_MIN_PRIOR it drafts the reply while still classifying
+KNOWN_SENDER_LEAD_PRIOR = float(os.getenv("KNOWN_SENDER_LEAD_PRIOR", "0.8"))
+
+
+def lead_prior(session_id: str, sender: str) -> Optional[float]:
+    from email.utils import parseaddr
+    address = parseaddr(sender or "")[1].lower()
+    if address and address in correspondents_for(session_id):
+        return KNOWN_SENDER_LEAD_PRIOR
+    return None
+
+
+def choose_lane(session_id: str, headers: dict, realtime: bool) -> str:
+    """Known correspondents first, then fresh mail, then backlog and mailing-list traffic"""
+    from email.utils import parseaddr
+    sender = parseaddr(headers.get('From', ''))[1].lower()
+    if sender and sender in correspondents_for(session_id):
+        return "high"
+    if headers.get('List-Unsubscribe') or headers.get('Precedence', '').lower() in ('bulk', 'list', 'junk'):
+        return "bulk"
+    return "normal" if realtime else "bulk"
+
+
+async def run_processing_job(job):
+    await process_email_background(job.message_id, job.email_address, job.history_id, job.session_id)
+
+
+# Bounded worker pool for the fetch + agent pipeline (replaces one BackgroundTask per email)
+processing_queue = ProcessingQueue(run_processing_job)
+
+
+def already_processed(message_id: str) -> bool:
+    return lead_store.contains(f"lead_{message_id}") or message_dedup.seen(message_id)
+
+
+async def ingest_messages(message_ids: list, email_address: str, history_id: str, session_id: str, backlog: bool):
+    """Queue messages found by incremental ingestion, prioritized from their headers"""
+    pending = [m for m in message_ids if not already_processed(m)]
+    if not pending:
+        return
+    gmail, _ = await get_gmail_client(session_id)
+    async with processing_queue.stage("gmail"):
+        fetched, _ = await gmail.batch_get_messages(pending, format='metadata', metadataHeaders=METADATA_HEADERS)
+    if backlog:
+        # Resync backlog: anything read since it was listed has been handled elsewhere
+        pending = [m for m in pending if 'UNREAD' in (fetched.get(m) or {}).get('labelIds', [])]
+    for message_id in pending:
+        lane = choose_lane(session_id, message_headers(fetched.get(message_id)), realtime=not backlog)
+        processing_queue.submit(message_id, email_address, history_id, session_id, lane)
+
+
+# Walks users.history.list from each mailbox's persisted checkpoint
+ingestor = HistoryIngestor(lead_store, get_gmail_client, dispatch=ingest_messages, is_processed=already_processed)
+
+
+async def ingest_mailbox(email_address: str, history_id: Optional[str] = None):
+    """Process whatever arrived in a mailbox since its last checkpoint (Pub/Sub notification)"""
+    session_id = find_session_for_email(email_address)
+    if not session_id:
+        print(f"❌ No active session found to process email {email_address}")
+        return
+    try:
+        await ingestor.ingest(email_address, session_id, history_id)
+    except Exception as e:
+        print(f"❌ Incremental ingestion failed for {email_address}: {e}")
+        import traceback
+        traceback.print_exc()
 
 @app.post("/notify-new-email")
 async def notify_new_email(request: Request, background_tasks: BackgroundTasks):
@@ -852,14 +1071,9 @@ async def notify_new_email(request: Request, background_tasks: BackgroundTasks):
                 notification_count += 1
         
         # Trigger Intelligent Agent (Background)
-        # Check if we have enough info to fetch the email
-        if "message_id" in data and "email_address" in data:
-            background_tasks.add_task(
-                process_email_background, 
-                data["message_id"], 
-                data["email_address"], 
-                data.get("history_id")
-            )
+        # message_id here is the Pub/Sub message id; the history API tells us which emails arrived
+        if "email_address" in data:
+            background_tasks.add_task(ingest_mailbox, data["email_address"], data.get("history_id"))
         
         print(f"✅ Broadcasted to {notification_count} SSE clients & triggered agent")
         return {"success": True, "notified_clients": notification_count}
@@ -871,41 +1085,125 @@ async def notify_new_email(request: Request, background_tasks: BackgroundTasks):
 
 # ============= LEADS API ENDPOINTS =============
 
+# Maximum page size for GET /leads (omit limit to get every lead)
+LEADS_MAX_PAGE_SIZE = int(os.getenv("LEADS_MAX_PAGE_SIZE", "500"))
+
+
+def project_lead(lead: dict, fields: Optional[list]):
+    """Keep only the requested fields of a lead (id is always included)"""
+    if not fields:
+        return lead
+    return {key: lead[key] for key in ["id", *fields] if key in lead}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already has this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
 @app.get("/leads")
-async def get_leads(session_id: str):
-    """Get all leads for the current session"""
+async def get_leads(
+    request: Request,
+    response: Response,
+    session_id: str,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    classification: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get leads for the current session, newest first.
+    Paginate with limit/after (pass back next_cursor), filter by status/classification,
+    and use fields=id,subject,... to omit large fields such as body and draft.
+    Responds 304 when If-None-Match carries the current ETag.
+    """
     if session_id not in sessions:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    # Filter leads for this session
-    session_leads = [
-        lead for lead in leads.values() 
-        if lead.get("session_id") == session_id
-    ]
+    # The ETag covers the session's lead version plus the query shape
+    import hashlib
+    query_key = f"{limit}|{after}|{status}|{classification}|{fields}"
+    etag = f'W/"{lead_store.session_version(session_id)}-{hashlib.md5(query_key.encode()).hexdigest()[:8]}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     
-    # Sort by created_at descending (newest first)
-    session_leads.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+    if limit is not None and not 1 <= limit <= LEADS_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {LEADS_MAX_PAGE_SIZE}")
+    
+    try:
+        position = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Leads for this session, newest first
+    session_leads, last_lead = lead_store.list_leads(
+        session_id,
+        limit=limit,
+        after=position,
+        status=status,
+        classification=classification
+    )
+    
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
     
     return {
         "success": True,
-        "leads": session_leads,
-        "count": len(session_leads)
+        "leads": [project_lead(lead, field_list) for lead in session_leads],
+        "count": len(session_leads),
+        "next_cursor": encode_cursor(last_lead) if last_lead else None,
+        "version": lead_store.session_version(session_id)
+    }
+
+
+# Maximum leads returned by one /leads/changes call
+LEADS_MAX_CHANGES = int(os.getenv("LEADS_MAX_CHANGES", "500"))
+
+
+@app.get("/leads/changes")
+async def get_lead_changes(session_id: str, since: int = 0, limit: int = LEADS_MAX_CHANGES):
+    """
+    Leads created or modified after the given version, oldest change first.
+    Pass the returned version as `since` on the next call; has_more means call again.
+    """
+    if session_id not in sessions:
+        raise HTTPException(status_code=401, detail="Invalid session")
+    
+    limit = max(1, min(limit, LEADS_MAX_CHANGES))
+    changed = lead_store.changes_since(session_id, since, limit + 1)
+    has_more = len(changed) > limit
+    changed = changed[:limit]
+    
+    return {
+        "success": True,
+        "leads": changed,
+        "version": changed[-1]["version"] if has_more else max(since, lead_store.session_version(session_id)),
+        "has_more": has_more
     }
 
 
 @app.get("/leads/{lead_id}")
-async def get_lead(lead_id: str, session_id: str):
+async def get_lead(lead_id: str, session_id: str, request: Request, response: Response):
     """Get a single lead by ID"""
     if session_id not in sessions:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    lead = leads.get(lead_id)
+    lead = lead_store.get(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
     if lead.get("session_id") != session_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this lead")
     
+    etag = f'W/"{lead.get("version", 0)}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
     return {"success": True, "lead": lead}
 
 
@@ -921,7 +1219,7 @@ async def update_lead_draft(lead_id: str, update_request: UpdateDraftRequest):
     if update_request.session_id not in sessions:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    lead = leads.get(lead_id)
+    lead = lead_store.get(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
@@ -935,8 +1233,7 @@ async def update_lead_draft(lead_id: str, update_request: UpdateDraftRequest):
         if update_request.body:
             lead["draft"]["body"] = update_request.body
         
-        leads[lead_id] = lead
-        save_leads_to_disk()
+        lead_store.put(lead)
     
     return {"success": True, "lead": lead}
 
@@ -955,7 +1252,7 @@ async def send_lead(lead_id: str, send_request: SendLeadRequest):
     if send_request.session_id not in sessions:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    lead = leads.get(lead_id)
+    lead = lead_store.get(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
@@ -970,8 +1267,7 @@ async def send_lead(lead_id: str, send_request: SendLeadRequest):
         raise HTTPException(status_code=400, detail="No draft available")
     
     try:
-        credentials, _ = get_valid_credentials(send_request.session_id)
-        service = build('gmail', 'v1', credentials=credentials)
+        gmail, _ = await get_gmail_client(send_request.session_id)
         
         # Build email message
         message = MIMEText(draft['body'], 'html')
@@ -985,16 +1281,12 @@ async def send_lead(lead_id: str, send_request: SendLeadRequest):
             send_body['threadId'] = lead["thread_id"]
         
         # Send the email
-        sent_msg = service.users().messages().send(userId='me', body=send_body).execute()
+        sent_msg = await gmail.send_message(send_body)
         
         # Mark original email as read
         if lead.get("email_id"):
             try:
-                service.users().messages().modify(
-                    userId='me',
-                    id=lead["email_id"],
-                    body={'removeLabelIds': ['UNREAD']}
-                ).execute()
+                await gmail.mark_as_read(lead["email_id"])
             except:
                 pass  # Ignore if already read
         
@@ -1002,8 +1294,7 @@ async def send_lead(lead_id: str, send_request: SendLeadRequest):
         lead["status"] = "sent"
         lead["sent_at"] = datetime.now().isoformat()
         lead["sent_message_id"] = sent_msg['id']
-        leads[lead_id] = lead
-        save_leads_to_disk()
+        lead_store.put(lead)
         
         print(f"✅ Lead {lead_id} sent successfully")
         
@@ -1027,7 +1318,7 @@ async def dismiss_lead(lead_id: str, session_id: str):
     if session_id not in sessions:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    lead = leads.get(lead_id)
+    lead = lead_store.get(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
@@ -1036,8 +1327,7 @@ async def dismiss_lead(lead_id: str, session_id: str):
     
     lead["status"] = "dismissed"
     lead["dismissed_at"] = datetime.now().isoformat()
-    leads[lead_id] = lead
-    save_leads_to_disk()
+    lead_store.put(lead)
     
     return {"success": True, "lead": lead}
 
@@ -1074,17 +1364,11 @@ class MarkReadRequest(BaseModel):
 async def mark_as_read(mark_request: MarkReadRequest):
     """Mark a Gmail message as read"""
     try:
-        # Get valid credentials (auto-refreshes if expired)
-        credentials, token_refreshed = get_valid_credentials(mark_request.session_id)
-        
-        service = build('gmail', 'v1', credentials=credentials)
+        # Get Gmail client with valid credentials (auto-refreshes if expired)
+        gmail, token_refreshed = await get_gmail_client(mark_request.session_id)
         
         # Remove UNREAD label
-        service.users().messages().modify(
-            userId='me',
-            id=mark_request.message_id,
-            body={'removeLabelIds': ['UNREAD']}
-        ).execute()
+        await gmail.mark_as_read(mark_request.message_id)
         
         print(f"✅ Message {mark_request.message_id} marked as read")
         
@@ -1102,16 +1386,11 @@ async def mark_as_read(mark_request: MarkReadRequest):
 async def get_unread_count(session_id: str):
     """Get count of unread emails"""
     try:
-        # Get valid credentials (auto-refreshes if expired)
-        credentials, token_refreshed = get_valid_credentials(session_id)
-        
-        service = build('gmail', 'v1', credentials=credentials)
+        # Get Gmail client with valid credentials (auto-refreshes if expired)
+        gmail, token_refreshed = await get_gmail_client(session_id)
         
         # Get label info which includes message counts
-        label = service.users().labels().get(
-            userId='me',
-            id='INBOX'
-        ).execute()
+        label = await gmail.get_label('INBOX')
         
         return {
             "success": True,
@@ -1137,10 +1416,8 @@ class SendReplyRequest(BaseModel):
 async def send_reply(reply_request: SendReplyRequest):
     """Send a reply to an email"""
     try:
-        # Get valid credentials (auto-refreshes if expired)
-        credentials, token_refreshed = get_valid_credentials(reply_request.session_id)
-        
-        service = build('gmail', 'v1', credentials=credentials)
+        # Get Gmail client with valid credentials (auto-refreshes if expired)
+        gmail, token_refreshed = await get_gmail_client(reply_request.session_id)
         
         # Extract email address from "Name <email@domain.com>" format
         import re
@@ -1161,12 +1438,11 @@ async def send_reply(reply_request: SendReplyRequest):
         if reply_request.in_reply_to_message_id:
             # Get the original message to extract Message-ID header
             try:
-                original_msg = service.users().messages().get(
-                    userId='me',
-                    id=reply_request.in_reply_to_message_id,
+                original_msg = await gmail.get_message(
+                    reply_request.in_reply_to_message_id,
                     format='metadata',
                     metadataHeaders=['Message-ID']
-                ).execute()
+                )
                 
                 for header in original_msg.get('payload', {}).get('headers', []):
                     if header['name'] == 'Message-ID':
@@ -1184,19 +1460,12 @@ async def send_reply(reply_request: SendReplyRequest):
         if reply_request.thread_id:
             send_body['threadId'] = reply_request.thread_id
         
-        sent_message = service.users().messages().send(
-            userId='me',
-            body=send_body
-        ).execute()
+        sent_message = await gmail.send_message(send_body)
 
         marked_as_read = False
         if reply_request.in_reply_to_message_id:
             try:
-                service.users().messages().modify(
-                    userId='me',
-                    id=reply_request.in_reply_to_message_id,
-                    body={'removeLabelIds': ['UNREAD']}
-                ).execute()
+                await gmail.mark_as_read(reply_request.in_reply_to_message_id)
                 marked_as_read = True
                 print(f"📝 Marked original message as read: {reply_request.in_reply_to_message_id}")
             except Exception as mark_error:
@@ -1282,6 +1551,10 @@ def pubsub_listener():
                 
                 if notification_count > 0:
                     print(f"   ✅ Broadcasted to {notification_count} SSE client(s)")
+                
+                # Ingest on the app's event loop (this callback runs on a Pub/Sub thread)
+                if main_loop is not None:
+                    asyncio.run_coroutine_threadsafe(ingest_mailbox(email_address, history_id), main_loop)
             
             # Acknowledge the message
             message.ack()
@@ -1307,9 +1580,23 @@ def pubsub_listener():
         streaming_pull_future.cancel()
 
 
+# Event loop the app runs on, so listener threads can schedule ingestion onto it
+main_loop = None
+
+
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks on app startup"""
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    
+    # Keep OAuth tokens fresh ahead of expiry
+    token_manager.start()
+    
+    # Email processing workers and their connection pool to the agent service
+    agent_client.start()
+    processing_queue.start()
+    
     # Check if service account credentials are set
     if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
         # Start Pub/Sub listener in background thread
@@ -1320,6 +1607,17 @@ async def startup_event():
         print("⚠️  GOOGLE_APPLICATION_CREDENTIALS not set - Pub/Sub listener disabled")
         print("   Set: $env:GOOGLE_APPLICATION_CREDENTIALS='path/to/service-account-key.json'")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background resources on app shutdown"""
+    await token_manager.stop()
+    await processing_queue.stop()
+    await agent_client.close()
+    shutdown_gmail_executor()
+    lead_store.close()
+    message_dedup.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
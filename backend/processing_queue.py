@@ -0,0 +1,256 @@
+"""Bounded, prioritized worker queue for email processing (replaces one BackgroundTask per email)."""
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Optional
+
+# Workers pulling jobs off the queue
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "8"))
+# Jobs allowed to wait; beyond this the lowest-priority work is shed
+PROCESSING_MAX_QUEUE = int(os.getenv("PROCESSING_MAX_QUEUE", "1000"))
+# Concurrent calls per pipeline stage, independent of the worker count
+PROCESSING_GMAIL_CONCURRENCY = int(os.getenv("PROCESSING_GMAIL_CONCURRENCY", "8"))
+PROCESSING_AGENT_CONCURRENCY = int(os.getenv("PROCESSING_AGENT_CONCURRENCY", "4"))
+# "fair": deficit round-robin across mailboxes within each lane; "fifo": arrival order
+PROCESSING_SCHEDULER = os.getenv("PROCESSING_SCHEDULER", "fair").lower()
+# Jobs one mailbox may have running at once (fair mode)
+PROCESSING_MAILBOX_CONCURRENCY = int(os.getenv("PROCESSING_MAILBOX_CONCURRENCY", "2"))
+# Jobs a mailbox may start per round-robin turn
+PROCESSING_MAILBOX_QUANTUM = int(os.getenv("PROCESSING_MAILBOX_QUANTUM", "1"))
+
+# Highest priority first
+LANES = ("high", "normal", "bulk")
+
+
+class ProcessingJob:
+    __slots__ = ("message_id", "email_address", "history_id", "session_id", "lane", "enqueued_at", "mailbox")
+
+    def __init__(self, message_id: str, email_address: str, history_id, session_id: str, lane: str):
+        self.message_id = message_id
+        self.email_address = email_address
+        self.history_id = history_id
+        self.session_id = session_id
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.mailbox = (email_address or session_id or "").lower()
+
+
+class Stage:
+    """Concurrency limit for one pipeline stage (async context manager)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting}
+
+
+class ProcessingQueue:
+    """
+    Priority lanes drained by a fixed pool of workers.
+
+    - Higher lanes are always served first.
+    - Within a lane, mailboxes take turns (deficit round-robin, `quantum` jobs per
+      turn) and no mailbox runs more than `mailbox_concurrency` jobs at once, so one
+      flooded inbox cannot starve the others. "fifo" mode serves arrival order instead.
+    - A message id is queued at most once at a time.
+    - When the queue is full, the newest job of the longest mailbox queue in the lowest
+      non-empty lane below the incoming job is shed. In fair mode a mailbox with a much
+      longer queue in the same lane is shed before a quieter one; otherwise the incoming
+      job is shed.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[ProcessingJob], Awaitable],
+        workers: int = PROCESSING_WORKERS,
+        max_depth: int = PROCESSING_MAX_QUEUE,
+        stage_limits: Optional[dict] = None,
+        scheduler: str = PROCESSING_SCHEDULER,
+        mailbox_concurrency: int = PROCESSING_MAILBOX_CONCURRENCY,
+        quantum: int = PROCESSING_MAILBOX_QUANTUM
+    ):
+        self._handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.fair = scheduler == "fair"
+        self.mailbox_concurrency = mailbox_concurrency
+        self.quantum = quantum
+        if stage_limits is None:
+            stage_limits = {"gmail": PROCESSING_GMAIL_CONCURRENCY, "agent": PROCESSING_AGENT_CONCURRENCY}
+        self.stages = {name: Stage(limit) for name, limit in stage_limits.items()}
+        # lane -> mailbox -> waiting jobs; in fifo mode every job shares one mailbox key
+        self._lanes = {lane: {} for lane in LANES}
+        self._rings = {lane: deque() for lane in LANES}  # mailboxes with waiting jobs, in turn order
+        self._deficit = defaultdict(int)  # (lane, mailbox) -> jobs left in the current turn
+        self._running = defaultdict(int)  # mailbox -> jobs in progress
+        self._depth = 0
+        self._queued = set()  # message ids waiting in a lane
+        self._ready = asyncio.Event()
+        self._tasks = []
+        self._waits = deque(maxlen=1000)  # recent queue wait times (seconds)
+        self.enqueued = {lane: 0 for lane in LANES}
+        self.shed = {lane: 0 for lane in LANES}
+        self.duplicates = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0
+
+    def stage(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def depth(self) -> int:
+        return self._depth
+
+    def _key(self, job: ProcessingJob) -> str:
+        return job.mailbox if self.fair else "*"
+
+    def submit(self, message_id: str, email_address: str, history_id, session_id: str, lane: str = "normal") -> bool:
+        """Queue a message for processing; False if it was a duplicate or shed"""
+        if message_id in self._queued:
+            self.duplicates += 1
+            return False
+        if self.depth() >= self.max_depth and not self._make_room(lane, (email_address or session_id or "").lower()):
+            self.shed[lane] += 1
+            print(f"🚧 Processing queue full ({self.max_depth}) - shed {lane} email {message_id}")
+            return False
+
+        job = ProcessingJob(message_id, email_address, history_id, session_id, lane)
+        key = self._key(job)
+        jobs = self._lanes[lane].get(key)
+        if jobs is None:
+            jobs = self._lanes[lane][key] = deque()
+            self._rings[lane].append(key)
+        jobs.append(job)
+        self._depth += 1
+        self._queued.add(message_id)
+        self.enqueued[lane] += 1
+        self._ready.set()
+        return True
+
+    def _make_room(self, lane: str, mailbox: str) -> bool:
+        for victim_lane in reversed(LANES[LANES.index(lane):]):
+            if self._lanes[victim_lane]:
+                # The mailbox with the most waiting work pays for the overload
+                key = max(self._lanes[victim_lane], key=lambda k: len(self._lanes[victim_lane][k]))
+                if victim_lane == lane:
+                    # Same lane: only displace a mailbox with a longer queue than the newcomer's
+                    own = self._lanes[lane].get(mailbox)
+                    if not self.fair or key == mailbox or len(self._lanes[lane][key]) <= len(own or ()) + 1:
+                        return False
+                victim = self._lanes[victim_lane][key].pop()
+                self._drop_if_empty(victim_lane, key)
+                self._depth -= 1
+                self._queued.discard(victim.message_id)
+                self.shed[victim_lane] += 1
+                print(f"🚧 Processing queue full - shed {victim_lane} email {victim.message_id} for {lane} work")
+                return True
+        return False
+
+    def _drop_if_empty(self, lane: str, key: str):
+        if not self._lanes[lane][key]:
+            del self._lanes[lane][key]
+            self._rings[lane].remove(key)
+            self._deficit.pop((lane, key), None)
+
+    def _next(self) -> Optional[ProcessingJob]:
+        """Next job to start: highest lane, then deficit round-robin over mailboxes under their cap"""
+        for lane in LANES:
+            ring = self._rings[lane]
+            for _ in range(len(ring)):
+                key = ring[0]
+                if self.fair and self._running.get(key, 0) >= self.mailbox_concurrency:
+                    ring.rotate(-1)
+                    continue
+                if self._deficit[(lane, key)] <= 0:
+                    self._deficit[(lane, key)] += self.quantum  # start of this mailbox's turn
+                job = self._lanes[lane][key].popleft()
+                self._deficit[(lane, key)] -= 1
+                self._depth -= 1
+                self._queued.discard(job.message_id)
+                if not self._lanes[lane][key]:
+                    self._drop_if_empty(lane, key)
+                elif self._deficit[(lane, key)] <= 0:
+                    ring.rotate(-1)  # turn used up
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next()
+            if job is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            self._waits.append(time.monotonic() - job.enqueued_at)
+            self.busy += 1
+            self._running[job.mailbox] += 1
+            try:
+                await self._handler(job)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Processing job for {job.message_id} failed: {e}")
+            finally:
+                self.busy -= 1
+                self._running[job.mailbox] -= 1
+                if not self._running[job.mailbox]:
+                    del self._running[job.mailbox]
+                if self._depth:
+                    self._ready.set()  # a mailbox below its cap again may have waiting work
+
+    def start(self):
+        """Start the workers (call from the app's startup hook)"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        waiting = defaultdict(int)
+        for mailboxes in self._lanes.values():
+            for key, jobs in mailboxes.items():
+                waiting[key] += len(jobs)
+        return {
+            "scheduler": "fair" if self.fair else "fifo",
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "depth_by_lane": {lane: sum(len(jobs) for jobs in mailboxes.values()) for lane, mailboxes in self._lanes.items()},
+            "mailboxes_waiting": len(waiting),
+            "busiest_mailboxes": dict(sorted(waiting.items(), key=lambda item: -item[1])[:5]),
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "enqueued": self.enqueued,
+            "shed": self.shed,
+            "duplicates": self.duplicates,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0,
+                "p95": round(waits[int(len(waits) * 0.95) - 1] * 1000, 1) if waits else 0,
+                "max": round(waits[-1] * 1000, 1) if waits else 0,
+            },
+            "stages": {name: stage.stats() for name, stage in self.stages.items()}
+        }
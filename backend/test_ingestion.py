@@ -0,0 +1,86 @@
+"""
+Resync check: when a mailbox has no checkpoint or its history expired, HistoryIngestor
+falls back to listing the inbox. That backlog must only contain unread messages that were
+not processed yet - re-running handled mail could auto-reply to old Hot leads again.
+
+    python test_ingestion.py      (or: python -m pytest test_ingestion.py)
+"""
+import asyncio
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from ingestion import HistoryIngestor
+
+
+class FakeStore:
+    def __init__(self, checkpoints=None):
+        self.checkpoints = dict(checkpoints or {})
+
+    def load_checkpoints(self):
+        return dict(self.checkpoints)
+
+    def save_checkpoint(self, mailbox, history_id):
+        self.checkpoints[mailbox] = history_id
+
+
+class FakeGmail:
+    """Inbox of (id, labels), newest first; history is always expired"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.list_calls = []
+
+    async def get_profile(self):
+        return {"historyId": "5000"}
+
+    async def list_messages(self, labelIds=(), maxResults=100, **kwargs):
+        self.list_calls.append(list(labelIds))
+        ids = [message_id for message_id, labels in self.messages if all(label in labels for label in labelIds)]
+        return {"messages": [{"id": message_id} for message_id in ids[:maxResults]]}
+
+    async def list_history(self, **kwargs):
+        raise HttpError(httplib2.Response({"status": 404}), b"Requested entity was not found.")
+
+
+def run_resync(checkpoints):
+    gmail = FakeGmail([
+        ("new1", ["INBOX", "UNREAD"]),
+        ("handled", ["INBOX", "UNREAD"]),  # lead already stored, not yet marked read
+        ("read1", ["INBOX"]),
+        ("new2", ["INBOX", "UNREAD"]),
+        ("read2", ["INBOX"]),
+    ])
+    dispatched = []
+
+    async def get_client(session_id):
+        return gmail, None
+
+    async def dispatch(message_ids, email_address, history_id, session_id, backlog):
+        dispatched.append((list(message_ids), history_id, backlog))
+
+    store = FakeStore(checkpoints)
+    ingestor = HistoryIngestor(store, get_client, dispatch, is_processed=lambda message_id: message_id == "handled")
+    summary = asyncio.run(ingestor.ingest("me@example.com", "session"))
+    return gmail, dispatched, summary, store
+
+
+def test_resync_without_checkpoint_skips_read_and_processed():
+    gmail, dispatched, summary, store = run_resync({})
+    assert gmail.list_calls == [["INBOX", "UNREAD"]]
+    assert dispatched == [(["new1", "new2"], "5000", True)]
+    assert summary["resync"] == "no checkpoint"
+    assert store.checkpoints["me@example.com"] == "5000"
+
+
+def test_resync_after_expired_history_skips_read_and_processed():
+    gmail, dispatched, summary, store = run_resync({"me@example.com": "10"})
+    assert dispatched == [(["new1", "new2"], "5000", True)]
+    assert summary["resync"] == "history expired"
+    assert store.checkpoints["me@example.com"] == "5000"
+
+
+if __name__ == "__main__":
+    test_resync_without_checkpoint_skips_read_and_processed()
+    test_resync_after_expired_history_skips_read_and_processed()
+    print("✅ Resync only dispatches unread, unprocessed messages")
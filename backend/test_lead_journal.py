@@ -0,0 +1,77 @@
+"""
+Crash-recovery check for the leads journal: a compaction that rotated the journal but never
+wrote its snapshot (crash or failure) leaves a .compacting file behind. Its records must
+survive the next rotation instead of being overwritten by it.
+
+    python test_lead_journal.py      (or: python -m pytest test_lead_journal.py)
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from lead_store import LeadJournal
+
+COMPACT_EVERY = 5
+
+
+def open_journal(directory):
+    journal = LeadJournal(Path(directory) / "leads.json", fsync_interval=60, compact_every=COMPACT_EVERY)
+    return journal, journal.replay()
+
+
+def lead(index):
+    return {"id": f"lead_{index}", "subject": f"Email {index}"}
+
+
+def test_leftover_compaction_survives_restart_and_next_rotation():
+    with tempfile.TemporaryDirectory() as directory:
+        journal, leads = open_journal(directory)
+        for index in range(2):
+            journal.append(f"lead_{index}", lead(index))
+        # Crash right after the rotation, before the snapshot was written
+        journal.sync()
+        os.replace(journal.journal_path, journal.compacting_path)
+        journal.close()
+
+        journal, leads = open_journal(directory)
+        assert sorted(leads) == ["lead_0", "lead_1"]
+        for index in range(2, 2 + COMPACT_EVERY):
+            journal.append(f"lead_{index}", lead(index))
+        journal.compact()
+        journal.close()
+
+        journal, leads = open_journal(directory)
+        assert sorted(leads) == [f"lead_{index}" for index in range(2 + COMPACT_EVERY)]
+        assert not journal.compacting_path.exists()
+        journal.close()
+
+
+def test_failed_compaction_is_folded_before_the_next_rotation():
+    with tempfile.TemporaryDirectory() as directory:
+        journal, leads = open_journal(directory)
+        fold = journal._fold_compacting
+
+        def fail_once(start):
+            journal._fold_compacting = fold
+            raise OSError("disk full")
+
+        journal._fold_compacting = fail_once
+        for index in range(COMPACT_EVERY):
+            journal.append(f"lead_{index}", lead(index))
+        journal._compaction.join()
+        assert journal.compacting_path.exists()
+
+        for index in range(COMPACT_EVERY, 3 * COMPACT_EVERY):
+            journal.append(f"lead_{index}", lead(index))
+        journal.close(compact=True)
+        assert not journal.compacting_path.exists()
+
+        journal, leads = open_journal(directory)
+        assert sorted(leads) == sorted(f"lead_{index}" for index in range(3 * COMPACT_EVERY))
+        journal.close()
+
+
+if __name__ == "__main__":
+    test_leftover_compaction_survives_restart_and_next_rotation()
+    test_failed_compaction_is_folded_before_the_next_rotation()
+    print("✅ Leftover compactions are folded into the snapshot, not overwritten")
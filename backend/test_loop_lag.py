@@ -0,0 +1,111 @@
+"""
+Loop-lag check: SSE streams must keep flowing while a slow Gmail call is in flight.
+
+Starts fake_gmail_server.py with a large per-request latency, serves the backend with
+uvicorn, opens several /events streams and posts /notify-new-email while
+/gmail/unread-count is waiting on the slow Gmail endpoint.
+
+    python test_loop_lag.py      (or: python -m pytest test_loop_lag.py)
+"""
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from fake_gmail_server import start_fake_gmail_server
+import gmail_service
+import main
+
+GMAIL_LATENCY = 1.5      # seconds per fake Gmail round trip
+STREAMS = 3
+MAX_EVENT_DELAY = 0.5    # an event stalled behind the Gmail call would take ~GMAIL_LATENCY
+SESSION_ID = "loop-lag-test-session"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_backend(port):
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def _measure(base_url):
+    delays = []
+    sent_at = {}
+
+    async def read_stream(client, ready):
+        async with client.stream("GET", f"{base_url}/events", params={"session_id": SESSION_ID}) as response:
+            ready.set()
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and '"seq"' in line:
+                    seq = int(line.split('"seq": ')[1].split("}")[0])
+                    delays.append(time.perf_counter() - sent_at[seq])
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        ready_events = [asyncio.Event() for _ in range(STREAMS)]
+        readers = [asyncio.create_task(read_stream(client, ready)) for ready in ready_events]
+        await asyncio.gather(*(ready.wait() for ready in ready_events))
+
+        slow_call = asyncio.create_task(client.get(f"{base_url}/gmail/unread-count", params={"session_id": SESSION_ID}))
+        await asyncio.sleep(0.2)  # let the slow Gmail call start
+
+        seq = 0
+        while not slow_call.done():
+            seq += 1
+            sent_at[seq] = time.perf_counter()
+            await client.post(f"{base_url}/notify-new-email", json={"seq": seq})
+            await asyncio.sleep(0.1)
+
+        response = await slow_call
+        await asyncio.sleep(0.2)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+    return response, delays, seq
+
+
+def test_sse_streams_flow_during_slow_gmail_call():
+    gmail_server = start_fake_gmail_server(latency=GMAIL_LATENCY, message_count=10)
+    gmail_service.GMAIL_API_ENDPOINT = f"http://127.0.0.1:{gmail_server.server_port}/"
+    main.sessions[SESSION_ID] = {
+        "access_token": "fake-token",
+        "refresh_token": None,
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "client_id": "fake",
+        "client_secret": "fake",
+        "scopes": [],
+        "user_info": {"email": "me@example.com", "name": "Loop Lag"}
+    }
+
+    port = _free_port()
+    backend = _start_backend(port)
+    try:
+        response, delays, ticks = asyncio.run(_measure(f"http://127.0.0.1:{port}"))
+    finally:
+        backend.should_exit = True
+        gmail_server.shutdown()
+        main.sessions.pop(SESSION_ID, None)
+
+    print(f"Slow call status: {response.status_code}, ticks sent during it: {ticks}")
+    print(f"Event delivery delay: max {max(delays) * 1000:.0f}ms over {len(delays)} deliveries")
+
+    assert response.status_code == 200
+    assert ticks >= 5, "notifications could not be sent while the Gmail call was in flight"
+    assert len(delays) == ticks * STREAMS
+    assert max(delays) < MAX_EVENT_DELAY
+
+
+if __name__ == "__main__":
+    test_sse_streams_flow_during_slow_gmail_call()
+    print("✅ Event loop stayed responsive during slow Gmail call")
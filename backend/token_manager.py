@@ -0,0 +1,219 @@
+"""Proactive, single-flight OAuth access-token refresh for backend sessions."""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from google.oauth2.credentials import Credentials
+
+from gmail_service import gmail_executor
+
+# Refresh tokens this long before they expire, so requests never wait on Google
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+# How often the background loop looks for tokens entering the refresh margin
+TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+# How long a caller waits on an in-flight refresh before giving up
+TOKEN_REFRESH_TIMEOUT = float(os.getenv("TOKEN_REFRESH_TIMEOUT", "30"))
+# Background retries of a failing session back off exponentially from one interval up to this
+TOKEN_REFRESH_MAX_BACKOFF = float(os.getenv("TOKEN_REFRESH_MAX_BACKOFF", "3600"))
+
+
+class RefreshRevoked(Exception):
+    """Raised by the refresh function when Google rejects the refresh token (invalid_grant)"""
+
+
+def parse_expiry(value) -> Optional[datetime]:
+    """Session expiry is stored as a naive UTC ISO string (same as google-auth)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenManager:
+    """
+    Hands out credentials for a session and keeps their access tokens fresh.
+
+    - Tokens inside the refresh margin are returned as-is while a background refresh runs.
+    - Expired tokens block the caller, but concurrent callers share one in-flight refresh.
+    - A background loop refreshes tokens before they enter the margin at all.
+    - Failing sessions are retried with exponential backoff; a revoked grant is never retried.
+    """
+
+    def __init__(self, get_session: Callable, list_session_ids: Callable, refresh_func: Callable):
+        self._get_session = get_session
+        self._list_session_ids = list_session_ids
+        self._refresh_func = refresh_func  # blocking: session_id -> Credentials or None
+        self._lock = threading.Lock()
+        self._inflight = {}  # session_id -> Future
+        self._credentials = {}  # session_id -> Credentials
+        self._backoff = {}  # session_id -> (consecutive failures, no background retry before)
+        self._revoked = set()  # session_ids whose refresh token was rejected
+        self._task = None
+        self.refreshes = 0
+        self.background_refreshes = 0
+        self.coalesced_waits = 0
+        self.failures = 0
+        self.skipped_backoff = 0
+
+    def get_credentials(self, session_id: str) -> Optional[Credentials]:
+        """Return usable credentials for a session, refreshing only if the token already expired"""
+        session = self._get_session(session_id)
+        if not session:
+            return None
+
+        expiry = parse_expiry(session.get("expiry"))
+        if expiry is not None and session.get("refresh_token"):
+            remaining = (expiry - datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                print(f"🔄 Token expired, refreshing...")
+                return self.refresh(session_id)
+            if remaining < TOKEN_REFRESH_MARGIN:
+                self.refresh_in_background(session_id)
+
+        return self._credentials_for(session_id, session)
+
+    def refresh(self, session_id: str) -> Optional[Credentials]:
+        """Refresh now; concurrent callers for the same session wait on a single refresh"""
+        with self._lock:
+            if session_id in self._revoked:
+                return None  # only a new sign-in can fix a revoked grant
+            future = self._inflight.get(session_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[session_id] = future
+            else:
+                self.coalesced_waits += 1
+
+        if owner:
+            try:
+                credentials = self._refresh_func(session_id)
+                self.refreshes += 1
+                if credentials is None:
+                    self._record_failure(session_id)
+                else:
+                    with self._lock:
+                        self._credentials[session_id] = credentials
+                        self._backoff.pop(session_id, None)
+                        if credentials.expiry is None:
+                            # Unknown expiry: don't refresh again on every scan
+                            self._backoff[session_id] = (0, time.monotonic() + TOKEN_REFRESH_MAX_BACKOFF)
+                future.set_result(credentials)
+            except RefreshRevoked as e:
+                self.failures += 1
+                with self._lock:
+                    self._revoked.add(session_id)
+                    self._backoff.pop(session_id, None)
+                print(f"🚫 Refresh token revoked for session {session_id[:20]}... - not retrying ({e})")
+                future.set_result(None)
+            except Exception as e:
+                self._record_failure(session_id)
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(session_id, None)
+
+        return future.result(timeout=TOKEN_REFRESH_TIMEOUT)
+
+    def _record_failure(self, session_id: str):
+        self.failures += 1
+        with self._lock:
+            failures = self._backoff.get(session_id, (0, 0))[0] + 1
+            delay = min(TOKEN_REFRESH_INTERVAL * 2 ** (failures - 1), TOKEN_REFRESH_MAX_BACKOFF)
+            self._backoff[session_id] = (failures, time.monotonic() + delay)
+        print(f"⏳ Token refresh failed {failures}x for session {session_id[:20]}... - next background try in {delay:.0f}s")
+
+    def refresh_in_background(self, session_id: str):
+        """Start a refresh on the Gmail pool unless one is already running"""
+        with self._lock:
+            if session_id in self._inflight or session_id in self._revoked:
+                return
+            backoff = self._backoff.get(session_id)
+            if backoff and time.monotonic() < backoff[1]:
+                self.skipped_backoff += 1
+                return
+        self.background_refreshes += 1
+        gmail_executor.submit(self.refresh, session_id)
+
+    def forget(self, session_id: str):
+        """Drop cached credentials and refresh history (logout)"""
+        with self._lock:
+            self._credentials.pop(session_id, None)
+            self._backoff.pop(session_id, None)
+            self._revoked.discard(session_id)
+
+    def _credentials_for(self, session_id: str, session: dict) -> Credentials:
+        with self._lock:
+            credentials = self._credentials.get(session_id)
+            if credentials is not None and credentials.token == session["access_token"]:
+                return credentials
+
+        credentials = Credentials(
+            token=session["access_token"],
+            refresh_token=session["refresh_token"],
+            token_uri=session["token_uri"],
+            client_id=session["client_id"],
+            client_secret=session["client_secret"],
+            scopes=session["scopes"],
+            expiry=parse_expiry(session.get("expiry"))
+        )
+        with self._lock:
+            self._credentials[session_id] = credentials
+        return credentials
+
+    def due_sessions(self, horizon: float):
+        """
+        Sessions whose token expires within `horizon` seconds (or whose expiry is unknown),
+        minus revoked sessions and those still backing off after a failed refresh
+        """
+        deadline = datetime.utcnow() + timedelta(seconds=horizon)
+        now = time.monotonic()
+        for session_id in list(self._list_session_ids()):
+            with self._lock:
+                if session_id in self._revoked or self._backoff.get(session_id, (0, 0))[1] > now:
+                    continue
+            session = self._get_session(session_id)
+            if not session or not session.get("refresh_token"):
+                continue
+            expiry = parse_expiry(session.get("expiry"))
+            if expiry is None or expiry <= deadline:
+                yield session_id
+
+    async def _run(self):
+        while True:
+            # Look one interval ahead so no token slips into the margin between scans
+            for session_id in self.due_sessions(TOKEN_REFRESH_MARGIN + TOKEN_REFRESH_INTERVAL):
+                self.refresh_in_background(session_id)
+            await asyncio.sleep(TOKEN_REFRESH_INTERVAL)
+
+    def start(self):
+        """Start the background refresh loop (call from the app's startup hook)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "refreshes": self.refreshes,
+            "background_refreshes": self.background_refreshes,
+            "coalesced_waits": self.coalesced_waits,
+            "failures": self.failures,
+            "backing_off": sum(1 for _, retry_at in self._backoff.values() if retry_at > time.monotonic()),
+            "revoked": len(self._revoked),
+            "skipped_backoff": self.skipped_backoff,
+            "in_flight": len(self._inflight)
+        }
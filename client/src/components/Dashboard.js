@@ -7,6 +7,7 @@ function Dashboard({ userInfo, onLogout, showStatus, apiBaseUrl }) {
   const [isLoading, setIsLoading] = useState(false);
   const [lastUpdate, setLastUpdate] = useState(Date.now());
   const [newLead, setNewLead] = useState(null); // For push updates
+  const [streamingDrafts, setStreamingDrafts] = useState({}); // lead_id -> {subject, body} while the agent writes
   const [activeTab, setActiveTab] = useState('leads'); // 'leads' or 'agents'
 
   useEffect(() => {
@@ -43,13 +44,35 @@ function Dashboard({ userInfo, onLogout, showStatus, apiBaseUrl }) {
 
       if (data.type === 'new_lead') {
         showStatus('✨ New Lead Analyzed!', 'success');
-        // Push update instead of full refresh
+        // Push update instead of full refresh (replaces the card shown while drafting)
         setNewLead(data.data);
+        dropStreamingDraft(data.data.id);
+      } else if (data.type === 'lead_drafting') {
+        // Classified as a lead; the reply draft streams in via draft_delta
+        showStatus(`✍️ ${data.data.classification} lead - drafting reply...`, 'info');
+        setNewLead(data.data);
+      } else if (data.type === 'draft_delta') {
+        // Functional update so no delta is lost when several arrive between renders
+        setStreamingDrafts(prev => {
+          const current = prev[data.lead_id] || { subject: '', body: '' };
+          return {
+            ...prev,
+            [data.lead_id]: {
+              subject: data.subject || current.subject,
+              body: current.body + (data.delta || '')
+            }
+          };
+        });
+      } else if (data.type === 'draft_reset') {
+        // The agent discarded its first draft and is writing another
+        dropStreamingDraft(data.lead_id);
+      } else if (data.type === 'draft_failed') {
+        dropStreamingDraft(data.lead_id);
+        setNewLead({ id: data.lead_id, removed: true });
       } else if (data.type === 'new_email') {
-        // Fallback for raw emails if backend sends them
-        console.log('New email received, syncing...');
+        // The backend ingests new mail from the Gmail history API and pushes new_lead when done
+        console.log('New email received, backend is analyzing...');
         showStatus('📧 New email detected! Analyzing...', 'info');
-        syncWithGmail(true, 1); // This will trigger analysis for just the new one
       }
     };
 
@@ -59,6 +82,14 @@ function Dashboard({ userInfo, onLogout, showStatus, apiBaseUrl }) {
     };
   };
 
+  const dropStreamingDraft = (leadId) => {
+    setStreamingDrafts(prev => {
+      if (!(leadId in prev)) return prev;
+      const { [leadId]: _done, ...rest } = prev;
+      return rest;
+    });
+  };
+
   const syncWithGmail = async (silent = false, maxResults = 10) => {
     const sessionId = CookieManager.get('session_id');
     if (!sessionId) {
@@ -164,6 +195,7 @@ function Dashboard({ userInfo, onLogout, showStatus, apiBaseUrl }) {
             apiBaseUrl={apiBaseUrl}
             lastUpdate={lastUpdate}
             newLead={newLead}
+            streamingDrafts={streamingDrafts}
           />
         </>
       )}
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 
 function LeadCard({ lead, onSend, onUpdateDraft, onDismiss, showStatus }) {
     const [isExpanded, setIsExpanded] = useState(false);
@@ -6,6 +6,16 @@ function LeadCard({ lead, onSend, onUpdateDraft, onDismiss, showStatus }) {
     const [editedSubject, setEditedSubject] = useState(lead.draft?.subject || '');
     const [editedBody, setEditedBody] = useState(lead.draft?.body || '');
     const [isSending, setIsSending] = useState(false);
+    const isDrafting = lead.status === 'drafting';
+
+    // The card mounts while the draft is still streaming; pick up the finished draft for editing
+    useEffect(() => {
+        if (!isEditing) {
+            setEditedSubject(lead.draft?.subject || '');
+            setEditedBody(lead.draft?.body || '');
+        }
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [lead.draft?.subject, lead.draft?.body]);
 
     const classification = lead.classification?.toLowerCase() || 'unknown';
 
@@ -79,6 +89,9 @@ function LeadCard({ lead, onSend, onUpdateDraft, onDismiss, showStatus }) {
                     {lead.status === 'dismissed' && (
                         <span style={styles.dismissedBadge}>Dismissed</span>
                     )}
+                    {isDrafting && (
+                        <span style={styles.draftingBadge}>✍️ Drafting reply...</span>
+                    )}
                 </div>
                 <span style={styles.date}>{formatDate(lead.created_at)}</span>
             </div>
@@ -148,6 +161,19 @@ function LeadCard({ lead, onSend, onUpdateDraft, onDismiss, showStatus }) {
                 ) : null}
             </div>
 
+            {/* Live draft while the agent is still writing it */}
+            {isDrafting && (
+                <div style={styles.draftPreview}>
+                    <div style={styles.draftHeader}>
+                        <strong>Subject:</strong> {lead.draft?.subject || '…'}
+                    </div>
+                    <div
+                        style={styles.draftBody}
+                        dangerouslySetInnerHTML={{ __html: (lead.draft?.body || '') + ' ▍' }}
+                    />
+                </div>
+            )}
+
             {/* Expanded Draft Preview (for non-editing mode) */}
             {isExpanded && !isEditing && lead.draft && (
                 <div style={styles.draftPreview}>
@@ -274,6 +300,14 @@ const styles = {
         background: '#dcfce7',
         color: '#16a34a'
     },
+    draftingBadge: {
+        padding: '4px 10px',
+        borderRadius: '12px',
+        fontSize: '11px',
+        fontWeight: '600',
+        background: '#e0e7ff',
+        color: '#4338ca'
+    },
     dismissedBadge: {
         padding: '4px 10px',
         borderRadius: '12px',
@@ -1,11 +1,12 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import LeadCard from './LeadCard';
 import { CookieManager } from '../utils/cookieManager';
 
-function LeadsDashboard({ showStatus, apiBaseUrl, lastUpdate, newLead }) {
+function LeadsDashboard({ showStatus, apiBaseUrl, lastUpdate, newLead, streamingDrafts = {} }) {
     const [leads, setLeads] = useState([]);
     const [isLoading, setIsLoading] = useState(false);
     const [filter, setFilter] = useState('all'); // all, hot, warm, cold, pending, sent
+    const leadsEtag = useRef(null); // ETag of the last /leads response, for conditional GETs
 
     // Fetch leads when lastUpdate changes (manual sync or initial load)
     useEffect(() => {
@@ -17,9 +18,15 @@ function LeadsDashboard({ showStatus, apiBaseUrl, lastUpdate, newLead }) {
     useEffect(() => {
         if (newLead) {
             setLeads(prevLeads => {
-                // Prevent duplicates
+                // A draft that failed mid-stream: drop its placeholder card
+                if (newLead.removed) {
+                    return prevLeads.filter(l => l.id !== newLead.id || l.status !== 'drafting');
+                }
+                // The stored lead replaces the card shown while its draft was streaming
                 if (prevLeads.some(l => l.id === newLead.id)) {
-                    return prevLeads;
+                    return prevLeads.map(l =>
+                        l.id === newLead.id && l.status === 'drafting' ? newLead : l
+                    );
                 }
                 return [newLead, ...prevLeads];
             });
@@ -35,9 +42,15 @@ function LeadsDashboard({ showStatus, apiBaseUrl, lastUpdate, newLead }) {
 
         setIsLoading(true);
         try {
-            const response = await fetch(`${apiBaseUrl}/leads?session_id=${sessionId}`);
+            const headers = leadsEtag.current ? { 'If-None-Match': leadsEtag.current } : {};
+            const response = await fetch(`${apiBaseUrl}/leads?session_id=${sessionId}`, { headers });
+            if (response.status === 304) {
+                // Nothing changed since the last fetch - keep current leads
+                return;
+            }
             if (response.ok) {
                 const data = await response.json();
+                leadsEtag.current = response.headers.get('ETag');
                 setLeads(data.leads || []);
             } else {
                 showStatus('Failed to fetch leads', 'error');
@@ -221,7 +234,9 @@ function LeadsDashboard({ showStatus, apiBaseUrl, lastUpdate, newLead }) {
                     filteredLeads.map(lead => (
                         <LeadCard
                             key={lead.id}
-                            lead={lead}
+                            lead={lead.status === 'drafting' && streamingDrafts[lead.id]
+                                ? { ...lead, draft: { ...lead.draft, ...streamingDrafts[lead.id] } }
+                                : lead}
                             onSend={handleSend}
                             onUpdateDraft={handleUpdateDraft}
                             onDismiss={handleDismiss}
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import Counter
+from typing import Optional
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
+from pydantic import BaseModel, Field
+from ..llm import get_chain, get_llm, register_chain, stage_model
+from .strategist import STRATEGIST_PROMPT
+
+# Below this confidence the single-pass answer is discarded and the two-stage path runs instead
+COMBINED_MIN_CONFIDENCE = float(os.getenv("COMBINED_MIN_CONFIDENCE", "0.75"))
+
+_lock = threading.Lock()
+counters = Counter()
+
+
+class CombinedDraft(BaseModel):
+    action: str = Field(description="Always 'send_reply'")
+    subject: str = Field(description="Reply subject line, starting with 'Re:'")
+    body: str = Field(description="Complete HTML-formatted email body with greeting, content and signature")
+
+
+class CombinedOutput(BaseModel):
+    is_lead: bool = Field(description="Whether the email is a business lead or opportunity")
+    classification: str = Field(description="'Hot', 'Warm', 'Cold' or 'Spam'")
+    confidence_score: float = Field(description="Confidence score between 0.0 and 1.0")
+    strategy: dict = Field(description="Strategic advice on how to reply")
+    reasoning: str = Field(description="Brief explanation of the classification")
+    draft: Optional[CombinedDraft] = Field(description="The reply for Hot and Warm leads, otherwise null")
+
+
+# Strategist instructions plus the executor's reply guidelines, answered in one response
+COMBINED_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", STRATEGIST_PROMPT.messages[0].prompt.template + """
+        SINGLE PASS: classify the email AND write the reply in the same response.
+        After the fields above, add a "draft" field (always last):
+        {{"draft": {{"action": "send_reply", "subject": "Re: ...", "body": "<p>...</p>"}}}}
+        Set "draft" to null for Cold, Spam and non-leads - those are never drafted here.
+
+        HOT LEAD reply: urgent and professional, acknowledge their specific needs, propose a
+        concrete next step (call, meeting, demo) with availability, action-oriented.
+        WARM LEAD reply: helpful and welcoming, answer implied questions, share useful information
+        about your services, soft call-to-action (learn more, schedule a chat).
+        Both: proper HTML with <p> tags and a professional signature with contact info.
+        """),
+    ("user", """Analyze this email, then draft the reply if it is a Hot or Warm lead. Return JSON:
+
+        From: {sender}
+        Subject: {subject}
+        Body: {body}
+
+        Return ONLY valid JSON matching the required schema.""")
+])
+
+COMBINED_PARSER = JsonOutputParser(pydantic_object=CombinedOutput)
+
+
+def build_combined_chain():
+    model = stage_model("combined")
+    temperature = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+    print(f"🤖 Building single-pass chain: {model} (temperature {temperature})")
+    return COMBINED_PROMPT | get_llm(model, temperature) | COMBINED_PARSER
+
+
+register_chain("combined", build_combined_chain)
+
+
+def record(outcome: str):
+    with _lock:
+        counters[outcome] += 1
+
+
+async def combined_node(state: dict):
+    print("\n" + "="*60)
+    print("⚡ SINGLE-PASS AGENT - CLASSIFY + DRAFT")
+    print("="*60)
+
+    if not os.getenv("OPENAI_API_KEY"):
+        # Let the two-stage path report the missing key the usual way
+        record("fallback_error")
+        return {"combined_fallback": True}
+
+    try:
+        result = await get_chain("combined").ainvoke({
+            "sender": state.get("email_sender"),
+            "subject": state.get("email_subject"),
+            "body": state.get("email_body")
+        })
+    except Exception as e:
+        print(f"❌ SINGLE-PASS ERROR: {e} → falling back to strategist + executor")
+        record("fallback_error")
+        return {"combined_fallback": True}
+
+    classification = result.get("classification") or ""
+    confidence = result.get("confidence_score") or 0.0
+    draft = result.get("draft") or {}
+    needs_draft = result.get("is_lead") and classification.lower() in ("hot", "warm")
+
+    if confidence < COMBINED_MIN_CONFIDENCE or (needs_draft and not draft.get("body")):
+        print(f"↩️ {classification} at confidence {confidence:.2f} (min {COMBINED_MIN_CONFIDENCE}) → two-stage fallback")
+        record("fallback_low_confidence" if confidence < COMBINED_MIN_CONFIDENCE else "fallback_missing_draft")
+        return {"combined_fallback": True}
+
+    print(f"✓ {classification} (confidence {confidence:.2f}, is_lead {result.get('is_lead')})")
+    record("accepted")
+    output = {
+        "is_lead": result.get("is_lead", False),
+        "classification": result.get("classification"),
+        "confidence_score": confidence,
+        "strategy": result.get("strategy"),
+        "reasoning": result.get("reasoning"),
+        "combined_fallback": False
+    }
+    if needs_draft:
+        output.update({
+            "final_action": draft.get("action") or "send_reply",
+            "email_draft": {
+                "to": state.get("email_sender"),
+                "subject": draft.get("subject"),
+                "body": draft.get("body")
+            },
+            "draft_type": "hot_auto" if classification.lower() == "hot" else "warm_review"
+        })
+    return output
+
+
+def stats() -> dict:
+    with _lock:
+        runs = sum(counters.values())
+        return {
+            "min_confidence": COMBINED_MIN_CONFIDENCE,
+            **dict(counters),
+            "fallback_rate": round((runs - counters["accepted"]) / runs, 3) if runs else None
+        }
@@ -1,10 +1,10 @@
 import os
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from pathlib import Path
+from ..llm import get_chain, get_llm, register_chain, stage_model
 
 # Try to load .env from root or backend
 if os.path.exists(".env"):
@@ -52,64 +52,8 @@ class ExecutorOutput(BaseModel):
     body: str = Field(description="Complete HTML-formatted email body with proper greeting, content, and signature. Must not be empty.")
 
 
-def executor_node(state: dict):
-    print("\n" + "="*60)
-    print("✍️ EXECUTOR AGENT - DRAFTING PHASE")
-    print("="*60)
-    
-    classification = state.get("classification")
-    strategy = state.get("strategy")
-    
-    print(f"📊 Received Classification: {classification}")
-    print(f"📋 Strategy Guidance: {strategy}")
-    print(f"👤 Replying to: {state.get('email_sender')}")
-    print("="*60)
-    
-    # Handle COLD leads with template - no LLM call needed
-    if classification and classification.lower() == "cold":
-        print("\n🔵 COLD LEAD DETECTED - Using company profile template")
-        
-        subject = state.get("email_subject", "")
-        if not subject.startswith("Re:"):
-            subject = f"Re: {subject}"
-        
-        return {
-            "final_action": "send_reply",
-            "email_draft": {
-                "to": state.get("email_sender"),
-                "subject": subject,
-                "body": COLD_LEAD_TEMPLATE
-            },
-            "draft_type": "cold_template"  # Marker for frontend
-        }
-    
-    # For HOT and WARM leads, use LLM to generate personalized response
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("❌ FATAL ERROR: OPENAI_API_KEY not found.")
-        print("   Please add OPENAI_API_KEY to backend/.env file")
-        return {
-            "final_action": "ignore",
-            "reasoning": "Missing API Key. Please add OPENAI_API_KEY to your .env file."
-        }
-
-    # Initialize LLM
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-    
-    print(f"\n🤖 Initializing LLM for copywriting...")
-    print(f"   Model: {model}")
-    print(f"   Temperature: {temperature} (higher for creativity)")
-    
-    llm = ChatOpenAI(
-        model=model,
-        api_key=api_key,
-        temperature=temperature
-    )
-    
-    # Different prompts for HOT vs WARM
-    if classification and classification.lower() == "hot":
-        system_prompt = """You are a professional Email copywriter for a business.
+# Prompts and parser are immutable, so they are built once at import
+HOT_SYSTEM_PROMPT = """You are a professional Email copywriter for a business.
         
         This is a HOT LEAD - urgent, high-priority response required!
         
@@ -127,8 +71,8 @@ def executor_node(state: dict):
         - Use proper HTML formatting with <p> tags
         - Include a professional signature with contact info
         """
-    else:  # WARM leads
-        system_prompt = """You are a professional Email copywriter for a business.
+
+WARM_SYSTEM_PROMPT = """You are a professional Email copywriter for a business.
         
         This is a WARM LEAD - show interest and provide value.
         
@@ -146,7 +90,14 @@ def executor_node(state: dict):
         - Use proper HTML formatting with <p> tags
         - Include a professional signature
         """
-    
+
+EXECUTOR_PARSER = JsonOutputParser(pydantic_object=ExecutorOutput)
+
+
+def build_executor_chain(system_prompt: str, stage: str):
+    model = stage_model(stage)
+    temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+    print(f"🤖 Building executor chain: {model} (temperature {temperature})")
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt + "\n\nStrategy from analyst: {strategy}"),
         ("user", """Draft a reply to this email:
@@ -157,18 +108,65 @@ def executor_node(state: dict):
         
         Return ONLY valid JSON matching the required schema.""")
     ])
+    return prompt | get_llm(model, temperature) | EXECUTOR_PARSER
+
+
+register_chain("executor_hot", lambda: build_executor_chain(HOT_SYSTEM_PROMPT, "executor_hot"))
+register_chain("executor_warm", lambda: build_executor_chain(WARM_SYSTEM_PROMPT, "executor_warm"))
+
+
+async def executor_node(state: dict):
+    print("\n" + "="*60)
+    print("✍️ EXECUTOR AGENT - DRAFTING PHASE")
+    print("="*60)
+    
+    classification = state.get("classification")
+    strategy = state.get("strategy")
+    
+    print(f"📊 Received Classification: {classification}")
+    print(f"📋 Strategy Guidance: {strategy}")
+    print(f"👤 Replying to: {state.get('email_sender')}")
+    print("="*60)
+    
+    # Handle COLD leads with template - no LLM call needed
+    if classification and classification.lower() == "cold":
+        print("\n🔵 COLD LEAD DETECTED - Using company profile template")
+        
+        subject = state.get("email_subject", "")
+        if not subject.startswith("Re:"):
+            subject = f"Re: {subject}"
+        
+        return {
+            "final_action": "send_reply",
+            "email_draft": {
+                "to": state.get("email_sender"),
+                "subject": subject,
+                "body": COLD_LEAD_TEMPLATE
+            },
+            "draft_type": "cold_template"  # Marker for frontend
+        }
     
-    parser = JsonOutputParser(pydantic_object=ExecutorOutput)
-    chain = prompt | llm | parser
+    # For HOT and WARM leads, use LLM to generate personalized response
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("❌ FATAL ERROR: OPENAI_API_KEY not found.")
+        print("   Please add OPENAI_API_KEY to backend/.env file")
+        return {
+            "final_action": "ignore",
+            "reasoning": "Missing API Key. Please add OPENAI_API_KEY to your .env file."
+        }
+
+    # Shared client and chain for this lead temperature (compiled once per process)
+    chain = get_chain("executor_hot" if classification and classification.lower() == "hot" else "executor_warm")
     
     try:
         print("\n📝 Generating professional email draft...")
-        result = chain.invoke({
+        result = await chain.ainvoke({
             "strategy": strategy,
             "sender": state.get("email_sender"),
             "subject": state.get("email_subject"),
             "body": state.get("email_body")
-        })
+        }, config={"tags": ["executor_draft"]})  # lets /analyze/stream find the draft tokens from any node
         
         print("\n" + "="*60)
         print("📧 EMAIL DRAFT GENERATED")
@@ -0,0 +1,190 @@
+import os
+import re
+import threading
+from collections import Counter
+from html import unescape
+from html.parser import HTMLParser
+
+# Set to "false" to send bodies to the LLM exactly as received
+NORMALIZER_ENABLED = os.getenv("NORMALIZER_ENABLED", "true").lower() == "true"
+# Most body tokens handed to the LLM prompts after cleanup
+EMAIL_TOKEN_BUDGET = int(os.getenv("EMAIL_TOKEN_BUDGET", "1500"))
+
+_lock = threading.Lock()
+counters = Counter()
+_encoding = None
+_encoding_failed = False
+
+
+def encoding():
+    """tiktoken encoding for the configured model, or None (fall back to ~4 chars per token)"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL", "gpt-4o"))
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # not installed, or the BPE file can't be downloaded
+            _encoding_failed = True
+            print(f"⚠️ tiktoken unavailable ({type(e).__name__}) - estimating tokens as chars/4")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = encoding()
+    return len(enc.encode(text, disallowed_special=())) if enc else (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    enc = encoding()
+    if enc:
+        tokens = enc.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else enc.decode(tokens[:budget])
+    return text[:budget * 4]
+
+
+class _TextExtractor(HTMLParser):
+    """HTML → plain text: block tags become line breaks; scripts, styles and quoted replies are dropped"""
+
+    BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "section", "article"}
+    SKIP_TAGS = {"script", "style", "head", "title", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+        self.stack = []
+
+    def handle_starttag(self, tag, attrs):
+        classes = dict(attrs).get("class") or ""
+        # Gmail / Outlook wrap the quoted thread in these containers
+        skip = tag in self.SKIP_TAGS or "gmail_quote" in classes or "moz-cite-prefix" in classes
+        if tag not in ("br", "img", "hr", "meta", "link", "input"):
+            self.stack.append(skip)
+            if skip:
+                self.skip_depth += 1
+        if tag in self.BLOCK_TAGS and not self.skip_depth:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("br", "img", "hr", "meta", "link", "input") or not self.stack:
+            return
+        if self.stack.pop():
+            self.skip_depth -= 1
+        if tag in self.BLOCK_TAGS and not self.skip_depth:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        return unescape(re.sub(r"<[^>]+>", " ", html))
+    return "".join(parser.parts)
+
+
+LOOKS_LIKE_HTML = re.compile(r"<(html|body|div|p|br|table|span)\b", re.IGNORECASE)
+
+# Lines that start the quoted history of a reply; everything from here on is dropped
+QUOTE_HEADERS = [
+    re.compile(r"^\s*On .{0,200}wrote:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*-{2,}\s*Original Message\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^\s*_{10,}\s*$"),  # Outlook separator
+    re.compile(r"^\s*From:\s.+$", re.IGNORECASE),  # Outlook header block (only when followed by Sent:/Date:)
+]
+SIGNATURE_MARKERS = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^\s*Sent from my \w+", re.IGNORECASE),
+    re.compile(r"^\s*Get Outlook for \w+", re.IGNORECASE),
+]
+# Legal / marketing footers, dropped from their first line to the end when in the back half
+BOILERPLATE = re.compile(
+    r"^\s*(confidentiality notice|disclaimer|this (e-?mail|message)( and any attachments)? (is|are|contains?|may contain) "
+    r"(confidential|intended)|to unsubscribe|you are receiving this|please consider the environment)",
+    re.IGNORECASE
+)
+
+
+def strip_quoted(lines: list) -> list:
+    for index, line in enumerate(lines):
+        for pattern in QUOTE_HEADERS:
+            if not pattern.match(line):
+                continue
+            if pattern is QUOTE_HEADERS[3]:
+                following = " ".join(lines[index + 1:index + 4]).lower()
+                if "sent:" not in following and "date:" not in following:
+                    continue
+            return lines[:index]
+    return [line for line in lines if not line.lstrip().startswith(">")]
+
+
+def strip_signature(lines: list) -> list:
+    for index, line in enumerate(lines):
+        if index and any(pattern.match(line) for pattern in SIGNATURE_MARKERS):
+            return lines[:index]
+    return lines
+
+
+def strip_boilerplate(lines: list) -> list:
+    for index in range(len(lines) // 2, len(lines)):
+        if BOILERPLATE.match(lines[index]):
+            return lines[:index]
+    return lines
+
+
+def normalize_body(body: str, budget: int = EMAIL_TOKEN_BUDGET) -> tuple:
+    """Clean an email body for the LLM; returns (text, tokens before, tokens after, truncated)"""
+    raw = body or ""
+    before = count_tokens(raw)
+    text = html_to_text(raw) if LOOKS_LIKE_HTML.search(raw) else raw
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\xa0", " ")
+
+    lines = [line.rstrip() for line in text.split("\n")]
+    cleaned = strip_boilerplate(strip_signature(strip_quoted(lines)))
+    if not any(line.strip() for line in cleaned):
+        cleaned = lines  # nothing but quotes/signature: keep the text rather than send an empty body
+
+    text = re.sub(r"[ \t]+", " ", "\n".join(cleaned))
+    text = re.sub(r"\n\s*\n+", "\n\n", text).strip()
+
+    truncated = count_tokens(text) > budget
+    if truncated:
+        text = truncate_to_tokens(text, budget).rstrip() + "\n[... truncated]"
+    return text, before, count_tokens(text), truncated
+
+
+def normalizer_node(state: dict):
+    if not NORMALIZER_ENABLED:
+        return {}
+
+    text, before, after, truncated = normalize_body(state.get("email_body"))
+    with _lock:
+        counters["emails"] += 1
+        counters["tokens_in"] += before
+        counters["tokens_out"] += after
+        counters["truncated"] += int(truncated)
+
+    saved = before - after
+    print(f"✂️ Normalized body: {before} → {after} tokens ({saved} saved{', truncated' if truncated else ''})")
+    return {"email_body": text, "body_tokens_saved": saved}
+
+
+def stats() -> dict:
+    with _lock:
+        tokens_in = counters["tokens_in"]
+        return {
+            "enabled": NORMALIZER_ENABLED,
+            "token_budget": EMAIL_TOKEN_BUDGET,
+            "tokenizer": "tiktoken" if _encoding else "chars/4",
+            **dict(counters),
+            "tokens_saved": tokens_in - counters["tokens_out"],
+            "saved_ratio": round(1 - counters["tokens_out"] / tokens_in, 3) if tokens_in else None
+        }
@@ -0,0 +1,147 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Set to "false" to send every email to the strategist
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+# Non-lead probability at or above which the email skips the LLM entirely
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.9"))
+# "true" only counts what would have been skipped, without skipping (for tuning the threshold)
+PREFILTER_SHADOW = os.getenv("PREFILTER_SHADOW", "false").lower() == "true"
+
+# Header/sender rules: each hit is a non-lead probability on its own
+NO_REPLY_SENDER = re.compile(
+    r"(^|[._+-])(no-?reply|do-?not-?reply|donotreply|notifications?|alerts?|mailer|bounces?|newsletter)([._+-]|@)",
+    re.IGNORECASE
+)
+BOUNCE_SENDER = re.compile(r"^(mailer-daemon|postmaster)@", re.IGNORECASE)
+AUTO_REPLY_SUBJECT = re.compile(
+    r"^(automatic reply|auto(matic)?[- ]?reply|out of (the )?office|ooo\b|autoreply|auto:)",
+    re.IGNORECASE
+)
+BOUNCE_SUBJECT = re.compile(
+    r"(delivery status notification|undeliverable|mail delivery (failed|subsystem)|returned mail|delivery failure)",
+    re.IGNORECASE
+)
+
+# Tiny local classifier: log-odds that an email is NOT a lead, per token present
+TOKEN_WEIGHTS = {
+    "unsubscribe": 2.5, "newsletter": 2.0, "webinar": 1.2, "promo": 1.5, "promotion": 1.2, "discount": 1.2,
+    "sale": 0.8, "offer": 0.6, "receipt": 1.5, "invoice": 0.6, "order": 0.6, "shipped": 1.5, "tracking": 1.0,
+    "password": 1.5, "verify": 1.2, "verification": 1.5, "login": 1.0, "notification": 1.2, "digest": 1.5,
+    "preferences": 1.0, "privacy": 0.8, "browser": 0.8, "automated": 1.5, "do-not-reply": 2.0,
+    "quote": -2.0, "pricing": -1.5, "budget": -2.0, "proposal": -1.5, "project": -1.2, "hire": -1.5,
+    "interested": -1.2, "rates": -1.2, "contract": -1.5, "timeline": -1.2, "call": -0.8, "meeting": -0.8,
+    "services": -0.8, "partnership": -1.2, "referred": -1.5, "requirements": -1.0
+}
+TOKEN_BIAS = -1.5
+_token = re.compile(r"[a-z][a-z-]+")
+
+_lock = threading.Lock()
+counters = Counter()
+
+
+def header(headers: dict, name: str) -> str:
+    """Case-insensitive header lookup"""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
+def sender_address(sender: str) -> str:
+    match = re.search(r"<([^>]+)>", sender or "")
+    return (match.group(1) if match else sender or "").strip().lower()
+
+
+def rule_hits(state: dict) -> list:
+    """[(probability, reason)] for every header/sender rule the email trips"""
+    headers = state.get("email_headers") or {}
+    address = sender_address(state.get("email_sender"))
+    subject = state.get("email_subject") or ""
+    hits = []
+
+    auto_submitted = header(headers, "Auto-Submitted").strip().lower()
+    if auto_submitted and auto_submitted != "no":
+        hits.append((1.0, f"auto-submitted ({auto_submitted})"))
+    if BOUNCE_SENDER.search(address) or BOUNCE_SUBJECT.search(subject):
+        hits.append((1.0, "bounce"))
+    if header(headers, "X-Autoreply") or header(headers, "X-Autorespond") or AUTO_REPLY_SUBJECT.search(subject):
+        hits.append((0.95, "auto-reply"))
+    precedence = header(headers, "Precedence").strip().lower()
+    if precedence in ("bulk", "list", "junk"):
+        hits.append((0.9, f"precedence {precedence}"))
+    if header(headers, "List-Unsubscribe") or header(headers, "List-Id"):
+        hits.append((0.85, "mailing list"))
+    if NO_REPLY_SENDER.search(address):
+        hits.append((0.85, "no-reply sender"))
+    return hits
+
+
+def token_score(state: dict) -> float:
+    """Probability the text is a non-lead from token log-odds (each token counted once)"""
+    text = f"{state.get('email_subject') or ''} {(state.get('email_body') or '')[:5000]}".lower()
+    logit = TOKEN_BIAS + sum(TOKEN_WEIGHTS.get(token, 0.0) for token in set(_token.findall(text)))
+    return 1 / (1 + math.exp(-logit))
+
+
+def score(state: dict) -> tuple:
+    """Combined non-lead probability (noisy-OR of rules and classifier) and the reasons behind it"""
+    hits = rule_hits(state)
+    text_probability = token_score(state)
+    keep = 1.0 - text_probability
+    for probability, _ in hits:
+        keep *= 1.0 - probability
+    reasons = [reason for _, reason in hits] + [f"text {text_probability:.2f}"]
+    return 1.0 - keep, reasons
+
+
+def prefilter_node(state: dict):
+    if not PREFILTER_ENABLED:
+        return {"prefiltered": False}
+
+    probability, reasons = score(state)
+    skip = probability >= PREFILTER_THRESHOLD
+    with _lock:
+        counters["seen"] += 1
+        if skip and PREFILTER_SHADOW:
+            counters["would_skip"] += 1
+        elif skip:
+            counters["skipped"] += 1
+            for reason in reasons[:-1]:
+                counters[f"rule:{reason.split(' (')[0]}"] += 1
+        else:
+            counters["passed"] += 1
+
+    if not skip or PREFILTER_SHADOW:
+        if skip:
+            print(f"🔎 Prefilter (shadow): would skip {probability:.2f} - {', '.join(reasons)}")
+        return {"prefiltered": False}
+
+    print(f"🚫 Prefilter: not a lead ({probability:.2f} - {', '.join(reasons)}) → skipping LLM")
+    return {
+        "is_lead": False,
+        "classification": "Spam",
+        "confidence_score": round(probability, 3),
+        "strategy": {},
+        "reasoning": f"Prefilter: {', '.join(reasons)}",
+        "final_action": "ignore",
+        "prefiltered": True
+    }
+
+
+def stats() -> dict:
+    with _lock:
+        seen = counters["seen"]
+        return {
+            "enabled": PREFILTER_ENABLED,
+            "shadow": PREFILTER_SHADOW,
+            "threshold": PREFILTER_THRESHOLD,
+            **dict(counters),
+            # Each skipped email saves one strategist call
+            "llm_calls_avoided": counters["skipped"],
+            "skip_rate": round(counters["skipped"] / seen, 3) if seen else None
+        }
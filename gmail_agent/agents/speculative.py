@@ -0,0 +1,130 @@
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from langchain_core.callbacks import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from ..llm import get_chain
+from .normalizer import count_tokens
+from .strategist import classify_email
+
+# Opt-in: draft in parallel with the strategist for likely leads
+SPECULATIVE_DRAFTING = os.getenv("SPECULATIVE_DRAFTING", "false").lower() == "true"
+# Lead prior (0-1, sent by the backend as lead_prior) needed to start a speculative draft
+SPECULATIVE_MIN_PRIOR = float(os.getenv("SPECULATIVE_MIN_PRIOR", "0.7"))
+# Prior at or above which the draft uses the HOT prompt instead of the WARM one
+SPECULATIVE_HOT_PRIOR = float(os.getenv("SPECULATIVE_HOT_PRIOR", "0.9"))
+
+# Stands in for the strategist's guidance, which doesn't exist yet when speculating
+SPECULATIVE_STRATEGY = "Analysis is running in parallel - infer the tone, key points and urgency from the email itself."
+
+_lock = threading.Lock()
+counters = Counter()
+
+
+def should_speculate(state: dict) -> bool:
+    return SPECULATIVE_DRAFTING and (state.get("lead_prior") or 0.0) >= SPECULATIVE_MIN_PRIOR
+
+
+def record(**amounts):
+    with _lock:
+        for name, amount in amounts.items():
+            counters[name] += amount
+
+
+async def speculative_draft(state: dict, variant: str, progress: dict):
+    """Executor chain for the guessed variant, streamed so a cancelled draft's spend can be estimated"""
+    chain = get_chain(f"executor_{variant}")
+    inputs = {
+        "strategy": SPECULATIVE_STRATEGY,
+        "sender": state.get("email_sender"),
+        "subject": state.get("email_subject"),
+        "body": state.get("email_body")
+    }
+    progress["prompt_tokens"] = sum(count_tokens(m.content) for m in chain.first.format_messages(**inputs))
+    result = None
+    async for partial in chain.astream(inputs, config={"tags": ["speculative_draft"]}):
+        result = partial
+        progress["partial"] = partial
+    progress["finished_at"] = time.perf_counter()
+    return result or {}
+
+
+async def speculative_node(state: dict, config: RunnableConfig):
+    """
+    Runs the strategist and a draft concurrently. The draft is kept only if the strategist
+    confirms the class its prompt was written for; otherwise it is cancelled and the
+    executor drafts with the right prompt (or the Cold template) as usual.
+    """
+    variant = "hot" if (state.get("lead_prior") or 0.0) >= SPECULATIVE_HOT_PRIOR else "warm"
+    print(f"🏎️ Speculative drafting ({variant} prompt, lead prior {state.get('lead_prior')}) alongside the strategist")
+
+    progress = {"started_at": time.perf_counter()}
+    draft_task = asyncio.create_task(speculative_draft(state, variant, progress))
+    record(started=1)
+    try:
+        analysis = await classify_email(state, config=config)
+    except BaseException:
+        draft_task.cancel()
+        raise
+    analysis_done = time.perf_counter()
+
+    classification = (analysis.get("classification") or "").lower()
+    # A WARM-prompt draft must never be auto-sent as a Hot reply, nor a HOT one held for review
+    confirmed = bool(analysis.get("is_lead")) and classification == variant
+    # Lets /analyze/stream announce the lead now and forward the draft as it arrives
+    await adispatch_custom_event("lead_analysis", {**analysis, "speculative_draft_used": confirmed})
+
+    if not confirmed:
+        draft_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await draft_task
+        partial = progress.get("partial") or {}
+        wasted = progress.get("prompt_tokens", 0) + (count_tokens(json.dumps(partial)) if partial else 0)
+        mismatched = bool(analysis.get("is_lead")) and classification in ("hot", "warm")
+        record(cancelled=1, mismatched=int(mismatched), wasted_tokens=wasted)
+        print(f"🗑️ Speculative {variant} draft cancelled ({analysis.get('classification')}) - ~{wasted} tokens wasted")
+        return {**analysis, "speculative_outcome": "mismatched" if mismatched else "cancelled"}
+
+    try:
+        result = await draft_task
+    except Exception as e:
+        print(f"❌ Speculative draft failed: {e} → executor will draft")
+        record(failed=1)
+        return {**analysis, "speculative_outcome": "failed"}
+    if not result.get("body"):
+        record(failed=1)
+        return {**analysis, "speculative_outcome": "failed"}
+
+    # Time the draft ran while the strategist was still working, i.e. taken off the critical path
+    saved_ms = (min(progress["finished_at"], analysis_done) - progress["started_at"]) * 1000
+    record(used=1, latency_saved_ms=round(saved_ms))
+    print(f"✅ Speculative draft used for {analysis.get('classification')} lead - saved ~{saved_ms:.0f} ms")
+    return {
+        **analysis,
+        "speculative_outcome": "used",
+        "final_action": result.get("action", "send_reply"),
+        "email_draft": {
+            "to": state.get("email_sender"),
+            "subject": result.get("subject"),
+            "body": result.get("body")
+        },
+        "draft_type": "hot_auto" if variant == "hot" else "warm_review"
+    }
+
+
+def stats() -> dict:
+    with _lock:
+        started, used = counters["started"], counters["used"]
+        return {
+            "enabled": SPECULATIVE_DRAFTING,
+            "min_prior": SPECULATIVE_MIN_PRIOR,
+            "hot_prior": SPECULATIVE_HOT_PRIOR,
+            **dict(counters),
+            "hit_rate": round(used / started, 3) if started else None,
+            "avg_latency_saved_ms": round(counters["latency_saved_ms"] / used) if used else None,
+            "avg_wasted_tokens": round(counters["wasted_tokens"] / counters["cancelled"]) if counters["cancelled"] else None
+        }
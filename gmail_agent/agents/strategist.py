@@ -1,11 +1,30 @@
 import os
 import json
-from langchain_openai import ChatOpenAI
+import hashlib
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from langchain_core.callbacks import adispatch_custom_event
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 from pathlib import Path
+from langchain_core.runnables import RunnableConfig
+from ..llm import UsageTracker, get_chain, get_llm, register_chain, stage_model, with_usage
+from ..classification_cache import STRATEGIST_CACHE_ENABLED, cache_key, strategist_cache
+from .executor import executor_node
+
+# "true" streams the strategist's JSON and routes as soon as is_lead/classification are in:
+# non-leads stop generating, and Hot/Warm drafts start once the strategy is complete
+STRATEGIST_EARLY_ROUTING = os.getenv("STRATEGIST_EARLY_ROUTING", "false").lower() == "true"
+
+# "true" classifies with the small TRIAGE_MODEL first and only asks STRATEGIST_MODEL when
+# the triage answer is below CASCADE_MIN_CONFIDENCE or Hot (Hot leads are auto-replied)
+STRATEGIST_CASCADE = os.getenv("STRATEGIST_CASCADE", "false").lower() == "true"
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.8"))
 
 # Try to load .env from root or backend
 if os.path.exists(".env"):
@@ -23,43 +42,9 @@ class StrategistOutput(BaseModel):
     strategy: dict = Field(description="Strategic advice on how to reply")
     reasoning: str = Field(description="Brief explanation of the classification")
 
-def strategist_node(state: dict):
-    print("\n" + "="*60)
-    print("🧠 STRATEGIST AGENT - ANALYSIS PHASE")
-    print("="*60)
-    print(f"📧 From: {state.get('email_sender')}")
-    print(f"📋 Subject: {state.get('email_subject')}")
-    print(f"📝 Body Preview: {state.get('email_body', '')[:100]}...")
-    print("="*60)
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("❌ FATAL ERROR: OPENAI_API_KEY not found in environment variables.")
-        print("   Please add OPENAI_API_KEY to backend/.env file")
-        return {
-            "is_lead": False,
-            "classification": "Error",
-            "reasoning": "Missing API Key. Please add OPENAI_API_KEY to your .env file in root or backend/ folder.",
-            "final_action": "ignore"
-        }
-
-    # Initialize LLM with OpenAI
-    model = os.getenv("OPENAI_MODEL", "gpt-4o")
-    temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
-    
-    print(f"🤖 Initializing LLM...")
-    print(f"   Model: {model}")
-    print(f"   Temperature: {temperature}")
-    print(f"   Provider: OpenAI API")
-    
-    llm = ChatOpenAI(
-        model=model,
-        api_key=api_key,
-        temperature=temperature
-    )
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert Email Lead Analyzer for a business.
+# Prompt and parser are immutable, so they are built once at import
+STRATEGIST_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert Email Lead Analyzer for a business.
         
         Your task: Analyze emails and determine if they represent genuine business opportunities.
         
@@ -89,25 +74,257 @@ def strategist_node(state: dict):
         
         For spam/cold, set is_lead=false and minimal strategy.
         """),
-        ("user", """Analyze this email and return JSON:
+    ("user", """Analyze this email and return JSON:
         
         From: {sender}
         Subject: {subject}
         Body: {body}
         
         Return ONLY valid JSON matching the required schema.""")
-    ])
+])
+
+STRATEGIST_PARSER = JsonOutputParser(pydantic_object=StrategistOutput)
+
+
+def build_strategist_chain(stage: str = "strategist", default_model: str = None):
+    model = stage_model(stage, default_model)
+    temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
+    print(f"🤖 Building {stage} chain: {model} (temperature {temperature})")
+    return STRATEGIST_PROMPT | get_llm(model, temperature) | STRATEGIST_PARSER
+
+
+register_chain("strategist", build_strategist_chain)
+if STRATEGIST_CASCADE:
+    register_chain("triage", lambda: build_strategist_chain("triage", "gpt-4o-mini"))
+
+# Changes whenever the prompt text changes, so cached answers from an older prompt are never reused
+STRATEGIST_PROMPT_VERSION = hashlib.sha256(
+    "".join(message.prompt.template for message in STRATEGIST_PROMPT.messages).encode("utf-8")
+).hexdigest()[:12]
+
+
+def strategist_cache_key(state: dict) -> str:
+    model = stage_model("strategist")
+    if STRATEGIST_CASCADE:
+        model = f"{stage_model('triage', 'gpt-4o-mini')}>{model}"
+    namespace = f"{model}:{STRATEGIST_PROMPT_VERSION}"
+    return cache_key(state.get("email_sender"), state.get("email_subject"), state.get("email_body"), namespace)
+
+# Field order the prompt asks for; a field is complete once any later field has started
+# Fields the route depends on; early routing waits until both are complete
+ROUTING_FIELDS = ("is_lead", "classification")
+
+_early_lock = threading.Lock()
+early_counters = Counter()
+_cascade_lock = threading.Lock()
+cascade_counters = Counter()
+escalation_reasons = Counter()
+
+
+def field_complete(partial: dict, field: str) -> bool:
+    # Partial dicts keep the keys in the order the model wrote them: a field is done
+    # once another key has started after it, whatever order the model chose
+    keys = list(partial)
+    return field in partial and keys.index(field) < len(keys) - 1
+
+
+def routing_complete(partial: dict) -> bool:
+    return all(field_complete(partial, field) for field in ROUTING_FIELDS)
+
+
+def record_early(**amounts):
+    with _early_lock:
+        for name, amount in amounts.items():
+            early_counters[name] += amount
+
+
+def record_path(path: str, started: float, usage: UsageTracker):
+    """Count one classification by the way it was answered: direct, triage or escalated"""
+    with _cascade_lock:
+        cascade_counters[f"{path}_runs"] += 1
+        cascade_counters[f"{path}_ms"] += round((time.perf_counter() - started) * 1000)
+        cascade_counters[f"{path}_tokens"] += usage.prompt_tokens + usage.completion_tokens
+        cascade_counters[f"{path}_cost_usd"] += usage.cost
+
+
+def strategist_output(result: dict) -> dict:
+    return {
+        "is_lead": result.get("is_lead", False),
+        "classification": result.get("classification"),
+        "confidence_score": result.get("confidence_score"),
+        "strategy": result.get("strategy"),
+        "reasoning": result.get("reasoning")
+    }
+
+
+async def triage_email(state: dict, usage: UsageTracker, config: Optional[RunnableConfig] = None):
+    """Small-model first pass of the cascade; returns its answer, or None to escalate"""
+    try:
+        result = await get_chain("triage").ainvoke({
+            "sender": state.get("email_sender"),
+            "subject": state.get("email_subject"),
+            "body": state.get("email_body")
+        }, config=with_usage(usage, config))
+        # Small models drift from the schema ("high", "0.9", null); anything unusable escalates
+        confidence = float(result.get("confidence_score") or 0.0)
+        if not 0.0 <= confidence <= 1.0:
+            raise ValueError(f"confidence_score out of range: {confidence}")
+        classification = str(result.get("classification") or "")
+    except Exception as e:
+        print(f"⚠️ Triage failed: {e} → escalating")
+        reason = "error"
+    else:
+        result = {**result, "confidence_score": confidence, "classification": classification}
+        if classification.lower() == "hot":
+            reason = "hot"
+        elif confidence < CASCADE_MIN_CONFIDENCE:
+            reason = "low_confidence"
+        else:
+            print(f"🪶 Triage: {result.get('classification')} (confidence {confidence:.2f}) - no escalation")
+            return strategist_output(result)
+        print(f"⬆️ Triage: {result.get('classification')} (confidence {confidence:.2f}) → escalating ({reason})")
+    with _cascade_lock:
+        escalation_reasons[reason] += 1
+    return None
+
+
+async def classify_and_route(state: dict, chain, usage: UsageTracker, config: Optional[RunnableConfig] = None):
+    """
+    Early-routing strategist: streams the partial JSON and acts as soon as the fields it
+    needs are complete. Non-leads stop the generation right after classification; for Hot
+    and Warm leads the executor starts once the strategy is written while the reasoning
+    keeps streaming, and its draft is returned with the analysis.
+    """
+    start = time.perf_counter()
+    inputs = {
+        "sender": state.get("email_sender"),
+        "subject": state.get("email_subject"),
+        "body": state.get("email_body")
+    }
+    partial, decided, draft_task, stopped = {}, None, None, False
+    try:
+        async for partial in chain.astream(inputs, config=with_usage(usage, config)):
+            if decided is None and routing_complete(partial):
+                decided = time.perf_counter()
+                classification = (partial.get("classification") or "").lower()
+                if not partial.get("is_lead") or classification in ("spam", "none"):
+                    stopped = True
+                    break  # leaving the stream stops the generation
+                # Dashboards can show the lead now (same event the speculative path uses)
+                await adispatch_custom_event("lead_analysis", {
+                    **partial,
+                    "confidence_score": partial.get("confidence_score") if field_complete(partial, "confidence_score") else None
+                })
+            if (decided and draft_task is None and classification in ("hot", "warm")
+                    and field_complete(partial, "strategy")):
+                print(f"🏁 Strategy ready after {(time.perf_counter() - start) * 1000:.0f} ms → drafting while reasoning streams")
+                draft_task = asyncio.create_task(executor_node({**state, **partial}))
+    except BaseException:
+        if draft_task:
+            draft_task.cancel()
+        raise
+    
+    if decided is None:
+        # The routing fields came last (or never): decide from the finished answer instead
+        if not all(field in partial for field in ROUTING_FIELDS):
+            print("⚠️ Strategist stream ended without a classification → retrying without streaming")
+            partial = await chain.ainvoke(inputs, config=with_usage(usage, config))
+        decided = time.perf_counter()
+    
+    output = {
+        "is_lead": bool(partial.get("is_lead", False)),
+        "classification": partial.get("classification"),
+        "confidence_score": partial.get("confidence_score"),
+        "strategy": partial.get("strategy") or {},
+        "reasoning": partial.get("reasoning")
+    }
+    elapsed = (time.perf_counter() - start) * 1000
     
-    parser = JsonOutputParser(pydantic_object=StrategistOutput)
-    chain = prompt | llm | parser
+    if stopped:
+        output["reasoning"] = output["reasoning"] or "Not a lead (early exit - remaining analysis skipped)"
+        record_early(early_exits=1, decision_ms=round((decided - start) * 1000))
+        print(f"⏭️ Early exit after {(decided - start) * 1000:.0f} ms: {output['classification']} (not a lead)")
+        return output
+    
+    record_early(completed=1, decision_ms=round((decided - start) * 1000), complete_ms=round(elapsed))
+    if draft_task is None and (output["classification"] or "").lower() in ("hot", "warm"):
+        draft_task = asyncio.create_task(executor_node({**state, **output}))
+    if draft_task is not None:
+        record_early(early_drafts=1)
+        draft = await draft_task
+        return {**output, **draft}
+    return output
+
+
+async def strategist_node(state: dict, config: RunnableConfig):
+    return await classify_email(state, early_routing=STRATEGIST_EARLY_ROUTING, config=config)
+
+
+async def classify_email(state: dict, early_routing: bool = False, config: Optional[RunnableConfig] = None):
+    print("\n" + "="*60)
+    print("🧠 STRATEGIST AGENT - ANALYSIS PHASE")
+    print("="*60)
+    print(f"📧 From: {state.get('email_sender')}")
+    print(f"📋 Subject: {state.get('email_subject')}")
+    print(f"📝 Body Preview: {state.get('email_body', '')[:100]}...")
+    print("="*60)
+    
+    key = strategist_cache_key(state) if STRATEGIST_CACHE_ENABLED else None
+    if key and state.get("bypass_cache"):
+        strategist_cache.record_bypass()
+    elif key:
+        cached = strategist_cache.get(key)
+        if cached is not None:
+            print(f"♻️ Cache hit: {cached.get('classification')} (confidence {cached.get('confidence_score')}) - skipping LLM call")
+            return {**cached, "classification_cached": True}
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("❌ FATAL ERROR: OPENAI_API_KEY not found in environment variables.")
+        print("   Please add OPENAI_API_KEY to backend/.env file")
+        return {
+            "is_lead": False,
+            "classification": "Error",
+            "reasoning": "Missing API Key. Please add OPENAI_API_KEY to your .env file in root or backend/ folder.",
+            "final_action": "ignore"
+        }
+
+    # Shared client and chain (compiled once per process)
+    chain = get_chain("strategist")
+    started, usage = time.perf_counter(), UsageTracker()
+    path = "escalated" if STRATEGIST_CASCADE else "direct"
+    
+    if STRATEGIST_CASCADE:
+        output = await triage_email(state, usage, config)
+        if output is not None:
+            record_path("triage", started, usage)
+            if key:
+                strategist_cache.put(key, output)
+            return {**output, "classification_cached": False}
+    
+    if early_routing:
+        try:
+            output = await classify_and_route(state, chain, usage, config)
+        except Exception as e:
+            print(f"❌ STRATEGIST ERROR (streaming): {e}")
+            return {
+                "is_lead": False,
+                "classification": "Error",
+                "reasoning": f"Analysis failed: {str(e)}",
+                "final_action": "ignore"
+            }
+        record_path(path, started, usage)
+        if key:
+            strategist_cache.put(key, output)
+        return {**output, "classification_cached": False}
     
     try:
         print("\n🔍 Analyzing email content with LLM...")
-        result = chain.invoke({
+        result = await chain.ainvoke({
             "sender": state.get("email_sender"),
             "subject": state.get("email_subject"),
             "body": state.get("email_body")
-        })
+        }, config=with_usage(usage, config))
         
         print("\n" + "="*60)
         print("📊 ANALYSIS RESULTS")
@@ -125,13 +342,11 @@ def strategist_node(state: dict):
             print("⏭️  DECISION: Not a lead → Skipping reply")
         print("="*60 + "\n")
         
-        return {
-            "is_lead": result.get("is_lead", False),
-            "classification": result.get("classification"),
-            "confidence_score": result.get("confidence_score"),
-            "strategy": result.get("strategy"),
-            "reasoning": result.get("reasoning")
-        }
+        output = strategist_output(result)
+        record_path(path, started, usage)
+        if key:
+            strategist_cache.put(key, output)
+        return {**output, "classification_cached": False}
         
     except Exception as e:
         print("\n" + "="*60)
@@ -147,3 +362,39 @@ def strategist_node(state: dict):
             "reasoning": f"Analysis failed: {str(e)}",
             "final_action": "ignore"
         }
+
+
+def early_routing_stats() -> dict:
+    with _early_lock:
+        completed, exits = early_counters["completed"], early_counters["early_exits"]
+        return {
+            "enabled": STRATEGIST_EARLY_ROUTING,
+            **dict(early_counters),
+            "avg_decision_ms": round(early_counters["decision_ms"] / (completed + exits)) if completed + exits else None,
+            "avg_complete_ms": round(early_counters["complete_ms"] / completed) if completed else None
+        }
+
+
+def cascade_stats() -> dict:
+    with _cascade_lock:
+        counters, reasons = dict(cascade_counters), dict(escalation_reasons)
+    paths = {}
+    for path in ("direct", "triage", "escalated"):
+        runs = counters.get(f"{path}_runs", 0)
+        if runs:
+            paths[path] = {
+                "runs": runs,
+                "avg_ms": round(counters[f"{path}_ms"] / runs),
+                "avg_tokens": round(counters[f"{path}_tokens"] / runs),
+                "avg_cost_usd": round(counters[f"{path}_cost_usd"] / runs, 6)
+            }
+    cascaded = counters.get("triage_runs", 0) + counters.get("escalated_runs", 0)
+    return {
+        "enabled": STRATEGIST_CASCADE,
+        "triage_model": stage_model("triage", "gpt-4o-mini") if STRATEGIST_CASCADE else None,
+        "strategist_model": stage_model("strategist"),
+        "min_confidence": CASCADE_MIN_CONFIDENCE,
+        "escalation_rate": round(counters.get("escalated_runs", 0) / cascaded, 3) if cascaded else None,
+        "escalation_reasons": reasons,
+        "paths": paths
+    }
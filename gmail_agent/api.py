@@ -1,10 +1,23 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from .graph import agent_graph
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from .graph import pipeline, run_pipeline
+from .streaming import pipeline_events
+from . import llm
+from .classification_cache import strategist_cache
+from .agents import combined, normalizer, prefilter, speculative, strategist
 import uvicorn
+import asyncio
+import json
 import os
 
+# Emails analyzed at once by /analyze/batch (each one is an LLM pipeline)
+AGENT_BATCH_MAX_CONCURRENCY = int(os.getenv("AGENT_BATCH_MAX_CONCURRENCY", "4"))
+# Largest batch accepted in one request
+AGENT_BATCH_MAX_ITEMS = int(os.getenv("AGENT_BATCH_MAX_ITEMS", "100"))
+
 
 app = FastAPI(title="Gmail Agent Service")
 
@@ -27,11 +40,93 @@ class EmailRequest(BaseModel):
     email_body: str
     email_id: str
     thread_id: str
+    email_headers: Optional[Dict[str, str]] = None  # Used by the prefilter to spot bulk/automated mail
+    bypass_cache: bool = False  # Force a fresh strategist classification
+    mode: Optional[Literal["two_stage", "single_pass"]] = None  # Default: AGENT_GRAPH_MODE
+    lead_prior: Optional[float] = Field(default=None, ge=0, le=1)  # Likely leads may be drafted speculatively
+
+class BatchEmailRequest(BaseModel):
+    emails: List[EmailRequest] = Field(max_length=AGENT_BATCH_MAX_ITEMS)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+def initial_state(request: EmailRequest) -> dict:
+    return {
+        "email_sender": request.email_sender,
+        "email_subject": request.email_subject,
+        "email_body": request.email_body,
+        "email_id": request.email_id,
+        "thread_id": request.thread_id,
+        "email_headers": request.email_headers or {},
+        "bypass_cache": request.bypass_cache,
+        "mode": request.mode,
+        "lead_prior": request.lead_prior
+    }
+
+
+def build_response(result: dict) -> dict:
+    """Shape a finished graph state into the /analyze response"""
+    return {
+        "success": True,
+        "action": result.get("final_action"),
+        "draft": result.get("email_draft"),
+        "draft_type": result.get("draft_type", "unknown"),  # hot_auto, warm_review, cold_template
+        "final_action": result.get("final_action"),  # Alias for backend compatibility
+        "pipeline": pipeline_used(result),
+        "analysis": {
+            "is_lead": result.get("is_lead"),
+            "classification": result.get("classification"),
+            "confidence": result.get("confidence_score"),
+            "reasoning": result.get("reasoning"),
+            "cached": bool(result.get("classification_cached")),
+            "prefiltered": bool(result.get("prefiltered")),
+            "speculative": result.get("speculative_outcome")
+        }
+    }
+
+
+def pipeline_used(result: dict) -> str:
+    if result.get("combined_fallback") is None:
+        return "two_stage"
+    return "single_pass_fallback" if result["combined_fallback"] else "single_pass"
+
+
+def batch_item(request: EmailRequest, result) -> dict:
+    """Per-email entry of a batch response; a failed email does not fail the batch"""
+    if isinstance(result, Exception):
+        return {"email_id": request.email_id, "success": False, "error": str(result)}
+    return {"email_id": request.email_id, **build_response(result)}
+
+
+def batch_config(batch: BatchEmailRequest) -> dict:
+    return {"max_concurrency": min(batch.max_concurrency or AGENT_BATCH_MAX_CONCURRENCY, AGENT_BATCH_MAX_CONCURRENCY)}
+
+@app.on_event("startup")
+async def warm_up_llm():
+    # Build LLM clients and chains off the event loop so the first email doesn't pay for it
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, llm.warm_up)
+    loop.run_in_executor(None, normalizer.encoding)  # tiktoken may download its BPE file
+
+@app.on_event("shutdown")
+def close_caches():
+    strategist_cache.close()
 
 @app.get("/")
 def read_root():
     return {"status": "Agent Service Running"}
 
+@app.get("/ready")
+def readiness():
+    """503 until the LLM warm-up has finished, so load balancers hold traffic until then"""
+    if not llm.ready.is_set():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready", "llm": llm.stats()}
+
+@app.get("/stats")
+def service_stats():
+    return {"llm": llm.stats(), "prefilter": prefilter.stats(), "normalizer": normalizer.stats(), "single_pass": combined.stats(), "speculative": speculative.stats(), "strategist_early_routing": strategist.early_routing_stats(), "strategist_cascade": strategist.cascade_stats(), "strategist_cache": strategist_cache.stats()}
+
 @app.post("/analyze")
 async def analyze_email(request: EmailRequest):
     try:
@@ -45,32 +140,11 @@ async def analyze_email(request: EmailRequest):
         print(f"🧵 Thread ID: {request.thread_id}")
         print("#"*60 + "\n")
         
-        # Initial State
-        initial_state = {
-            "email_sender": request.email_sender,
-            "email_subject": request.email_subject,
-            "email_body": request.email_body,
-            "email_id": request.email_id,
-            "thread_id": request.thread_id
-        }
-        
         print("🔄 Starting LangGraph agent pipeline...\n")
         # Run Graph
-        result = agent_graph.invoke(initial_state)
+        result = await run_pipeline(initial_state(request))
         
-        response_data = {
-            "success": True,
-            "action": result.get("final_action"),
-            "draft": result.get("email_draft"),
-            "draft_type": result.get("draft_type", "unknown"),  # hot_auto, warm_review, cold_template
-            "final_action": result.get("final_action"),  # Alias for backend compatibility
-            "analysis": {
-                "is_lead": result.get("is_lead"),
-                "classification": result.get("classification"),
-                "confidence": result.get("confidence_score"),
-                "reasoning": result.get("reasoning")
-            }
-        }
+        response_data = build_response(result)
         
         print("\n" + "#"*60)
         print("✅ PIPELINE COMPLETE - FINAL SUMMARY")
@@ -92,6 +166,56 @@ async def analyze_email(request: EmailRequest):
         print("#"*60 + "\n")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/stream")
+async def analyze_email_stream(request: EmailRequest):
+    """Like /analyze, but streams NDJSON: the classification, draft_delta pieces as the executor writes, then the result"""
+    print(f"📡 Streaming analysis: {request.email_subject} ({request.email_id})")
+    
+    async def events():
+        try:
+            async for event in pipeline_events(initial_state(request)):
+                if event["event"] == "result":
+                    event = {"event": "result", **build_response(event["state"])}
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            print(f"❌ Streaming pipeline failed: {e}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+async def analyze_batch(batch: BatchEmailRequest):
+    """Analyze many emails in one request, running up to max_concurrency pipelines at once (within AGENT_MAX_CONCURRENCY)"""
+    config = batch_config(batch)
+    print(f"📦 Batch analysis: {len(batch.emails)} emails, max_concurrency={config['max_concurrency']}")
+    
+    results = await pipeline.abatch(
+        [initial_state(email) for email in batch.emails],
+        config=config,
+        return_exceptions=True
+    )
+    items = [batch_item(email, result) for email, result in zip(batch.emails, results)]
+    
+    print(f"✅ Batch complete: {sum(1 for item in items if item['success'])}/{len(items)} succeeded")
+    return {"success": True, "count": len(items), "results": items}
+
+@app.post("/analyze/batch/stream")
+async def analyze_batch_stream(batch: BatchEmailRequest):
+    """Like /analyze/batch, but streams one NDJSON line per email as soon as it finishes"""
+    config = batch_config(batch)
+    print(f"📦 Streaming batch analysis: {len(batch.emails)} emails, max_concurrency={config['max_concurrency']}")
+    
+    async def results():
+        async for index, result in pipeline.abatch_as_completed(
+            [initial_state(email) for email in batch.emails],
+            config=config,
+            return_exceptions=True
+        ):
+            item = {"index": index, **batch_item(batch.emails[index], result)}
+            yield json.dumps(item, default=str) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8001))
     uvicorn.run(app, host="0.0.0.0", port=port)
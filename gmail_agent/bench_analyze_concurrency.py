@@ -0,0 +1,92 @@
+"""
+Load test: /analyze throughput vs. client concurrency against fake_llm_server.py.
+
+With the async pipeline one agent worker overlaps many emails' LLM calls, so throughput
+should grow with concurrency until AGENT_MAX_CONCURRENCY (or the fake LLM) caps it.
+
+    python -m gmail_agent.bench_analyze_concurrency --latency 0.2 --levels 1 2 4 8 16 32
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from .fake_llm_server import start_fake_llm_server
+
+EMAIL = {
+    "email_sender": "Dana <dana@example.com>",
+    "email_subject": "Pricing for a 3-month project",
+    "email_body": "Hi, we're interested in your services and would like a quote for a 3-month project.",
+    "email_id": "msg_1",
+    "thread_id": "thread_1"
+}
+
+
+def start_agent_server():
+    from .api import app  # imported after OPENAI_* env vars point at the fake LLM
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def load(url: str, concurrency: int, requests: int):
+    timings = []
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        queue = asyncio.Queue()
+        for index in range(requests):
+            queue.put_nowait(index)
+
+        async def user():
+            while not queue.empty():
+                index = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/analyze", json={**EMAIL, "email_id": f"msg_{index}"})
+                response.raise_for_status()
+                timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds per call")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests-per-user", type=int, default=4)
+    args = parser.parse_args()
+
+    llm = start_fake_llm_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+    server, url = start_agent_server()
+
+    out = sys.stdout
+    print(f"🧪 Fake LLM latency {args.latency}s per call (a Warm lead makes 2 calls)\n", file=out)
+    print(f"{'concurrency':>11}  {'emails/s':>9}  {'mean latency':>12}", file=out)
+    for level in args.levels:
+        with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+            throughput, mean = asyncio.run(load(url, level, level * args.requests_per_user))
+        print(f"{level:>11}  {throughput:>9.1f}  {mean * 1000:>9.0f} ms", file=out)
+
+    server.should_exit = True
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
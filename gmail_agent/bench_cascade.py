@@ -0,0 +1,80 @@
+"""
+Benchmark: strategist on one large model vs. the triage cascade (small model first, large
+model on Hot or low-confidence answers). Reports classification latency, tokens and cost
+per email. Runs against fake_llm_server.py, where "mini" models answer SMALL_MODEL_SPEEDUP
+times faster; the prefilter is off so every email reaches the strategist.
+
+    python -m gmail_agent.bench_cascade --latency 0.3 --token-latency 0.01 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+
+from .fake_llm_server import start_fake_llm_server
+
+EMAILS = {
+    "spam": ("This week's deals", "Our newsletter: 50% off everything. Click to unsubscribe."),
+    "hot": ("Budget approved", "Our budget is approved and we want to sign the contract this month."),
+    "warm": ("Pricing question", "We're interested in your services - could you share a quote?"),
+    "cold": ("Hello team", "Hi there, we offer outsourcing at great rates. Let us know."),
+}
+
+
+async def run(cascade: bool, rounds: int):
+    from .agents import strategist
+
+    strategist.STRATEGIST_CASCADE = cascade
+    counters = strategist.cascade_counters
+    results = {}
+    for kind, (subject, body) in EMAILS.items():
+        timings, paths = [], set()
+        cost = sum(counters[f"{path}_cost_usd"] for path in ("direct", "triage", "escalated"))
+        for index in range(rounds):
+            state = {"email_sender": f"Dana <dana{index}@example.com>", "email_subject": subject, "email_body": body,
+                     "email_id": f"{kind}_{index}", "thread_id": f"{kind}_{index}", "bypass_cache": True}
+            runs = dict(counters)
+            start = asyncio.get_running_loop().time()
+            with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+                result = await strategist.classify_email(state)
+            timings.append((asyncio.get_running_loop().time() - start) * 1000)
+            paths.update(path for path in ("direct", "triage", "escalated")
+                         if counters[f"{path}_runs"] != runs.get(f"{path}_runs", 0))
+        spent = sum(counters[f"{path}_cost_usd"] for path in ("direct", "triage", "escalated")) - cost
+        results[kind] = (statistics.median(timings), spent / rounds, "/".join(sorted(paths)), result.get("classification"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="fake LLM seconds per 8-char chunk")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["STRATEGIST_CASCADE"] = "true"  # read at import: registers the triage chain
+    from .agents import strategist
+
+    async def compare():
+        # One event loop for both runs: the shared LLM clients' pools are bound to it
+        return await run(False, args.rounds), await run(True, args.rounds)
+
+    direct, cascade = asyncio.run(compare())
+
+    print(f"🧪 Fake LLM {args.latency}s to first token + {args.token_latency}s per chunk, p50 of {args.rounds}\n")
+    print(f"{'lead':<6} {'large model only':>22} {'cascade':>22}  path   (cost in USD per 1k emails)")
+    for kind in EMAILS:
+        (direct_ms, direct_cost, _, _), (cascade_ms, cascade_cost, path, label) = direct[kind], cascade[kind]
+        print(f"{kind:<6} {direct_ms:>6.0f} ms ${direct_cost * 1000:>7.4f}/1k "
+              f"{cascade_ms:>6.0f} ms ${cascade_cost * 1000:>7.4f}/1k  {path} ({label})")
+    print(f"\n{strategist.cascade_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: when does the user first see a draft? /analyze (whole result at the end) vs.
+/analyze/stream (first draft_delta) against fake_llm_server.py with per-chunk token latency.
+
+    python -m gmail_agent.bench_draft_streaming --latency 0.3 --token-latency 0.02 --emails 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+from .bench_analyze_concurrency import start_agent_server
+from .fake_llm_server import start_fake_llm_server
+
+EMAIL = {
+    "email_sender": "Dana <dana@example.com>",
+    "email_subject": "Budget approved for the Q3 contract",
+    "email_body": "Hi, our budget is approved and we'd like to sign the contract this month. Can we talk timeline?",
+    "thread_id": "thread_1",
+    "bypass_cache": True
+}
+
+
+async def blocking(client: httpx.AsyncClient, index: int) -> float:
+    start = time.perf_counter()
+    response = await client.post("/analyze", json={**EMAIL, "email_id": f"msg_{index}"})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def streamed(client: httpx.AsyncClient, index: int) -> tuple:
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/analyze/stream", json={**EMAIL, "email_id": f"msg_{index}"}) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "draft_delta" and first_token is None:
+                first_token = (time.perf_counter() - start) * 1000
+            elif event["event"] == "result":
+                return first_token, (time.perf_counter() - start) * 1000
+    raise RuntimeError("stream ended without a result")
+
+
+async def run(url: str, emails: int):
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        whole = [await blocking(client, index) for index in range(emails)]
+        streams = [await streamed(client, index) for index in range(emails)]
+    return whole, [first for first, _ in streams], [full for _, full in streams]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="fake LLM seconds per streamed chunk")
+    parser.add_argument("--emails", type=int, default=10)
+    args = parser.parse_args()
+
+    llm = start_fake_llm_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+    server, url = start_agent_server()
+
+    out = sys.stdout
+    with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+        whole, first, full = asyncio.run(run(url, args.emails))
+
+    print(f"🧪 Hot lead, fake LLM {args.latency}s to first token + {args.token_latency}s per chunk, "
+          f"{args.emails} emails each\n", file=out)
+    print(f"/analyze         draft visible after {statistics.median(whole):7.0f} ms (p50)", file=out)
+    print(f"/analyze/stream  first draft token  {statistics.median(first):7.0f} ms (p50)", file=out)
+    print(f"/analyze/stream  full draft         {statistics.median(full):7.0f} ms (p50)", file=out)
+    print(f"\nfirst visible token {statistics.median(whole) - statistics.median(first):.0f} ms sooner", file=out)
+
+    server.should_exit = True
+    llm.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: strategist with and without early routing. Spam should finish as soon as the
+classification is streamed, and Hot/Warm drafts should start before the reasoning is done.
+Runs against fake_llm_server.py with the prefilter off so spam reaches the strategist.
+
+    python -m gmail_agent.bench_early_routing --latency 0.3 --token-latency 0.01 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+
+from .fake_llm_server import start_fake_llm_server
+
+EMAILS = {
+    "spam": ("This week's deals", "Our newsletter: 50% off everything. Click to unsubscribe."),
+    "hot": ("Budget approved", "Our budget is approved and we want to sign the contract this month."),
+    "warm": ("Pricing question", "We're interested in your services - could you share a quote?"),
+    "cold": ("Hello team", "Hi there, we offer outsourcing at great rates. Let us know."),
+}
+
+
+async def run(early_routing: bool, rounds: int, server):
+    from .agents import strategist
+    from .graph import run_pipeline
+
+    strategist.STRATEGIST_EARLY_ROUTING = early_routing
+    results = {}
+    for kind, (subject, body) in EMAILS.items():
+        timings = []
+        completion_tokens = server.completion_tokens
+        for index in range(rounds):
+            state = {"email_sender": f"Dana <dana{index}@example.com>", "email_subject": subject, "email_body": body,
+                     "email_id": f"{kind}_{index}", "thread_id": f"{kind}_{index}", "bypass_cache": True}
+            start = asyncio.get_running_loop().time()
+            with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+                result = await run_pipeline(state)
+            timings.append((asyncio.get_running_loop().time() - start) * 1000)
+        results[kind] = (statistics.median(timings), (server.completion_tokens - completion_tokens) / rounds,
+                         result.get("classification"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="fake LLM seconds per 8-char chunk")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["PREFILTER_ENABLED"] = "false"  # read at import
+    from .agents import strategist
+
+    async def compare():
+        # One event loop for both runs: the shared LLM clients' pools are bound to it
+        return await run(False, args.rounds, server), await run(True, args.rounds, server)
+
+    buffered, early = asyncio.run(compare())
+
+    print(f"🧪 Fake LLM {args.latency}s to first token + {args.token_latency}s per chunk, p50 of {args.rounds}\n")
+    print(f"{'lead':<6} {'full response':>18} {'early routing':>18}  result")
+    for kind in EMAILS:
+        (base_ms, base_tokens, _), (early_ms, early_tokens, label) = buffered[kind], early[kind]
+        print(f"{kind:<6} {base_ms:>6.0f} ms {base_tokens:>5.0f} tok {early_ms:>6.0f} ms {early_tokens:>5.0f} tok  {label}")
+    print(f"\n{strategist.early_routing_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: per-email cost of building ChatOpenAI clients, prompts and parsers (old behaviour,
+emulated with llm.areset() before every email) vs. the shared registry in llm.py,
+against fake_llm_server.py with zero model latency so only our overhead is measured.
+
+    python -m gmail_agent.bench_llm_registry --emails 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from .fake_llm_server import start_fake_llm_server
+
+STATE = {
+    "email_sender": "Dana <dana@example.com>",
+    "email_subject": "Pricing for a 3-month project",
+    "email_body": "Hi, we're interested in your services and would like a quote for a 3-month project.",
+    "email_id": "msg_1",
+    "thread_id": "thread_1"
+}
+
+
+async def run(label: str, emails: int, rebuild: bool):
+    from . import llm
+    from .graph import run_pipeline
+
+    timings = []
+    for _ in range(emails):
+        if rebuild:
+            await llm.areset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+            await run_pipeline(dict(STATE))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{label:<10} mean {statistics.mean(timings):7.2f} ms   p50 {timings[len(timings) // 2]:7.2f} ms   "
+          f"max {timings[-1]:7.2f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=50)
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(latency=0.0)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+
+    print(f"🧪 {args.emails} Warm-lead emails through the pipeline (2 LLM calls each), fake LLM latency 0\n")
+
+    async def compare():
+        # One event loop for every phase: the shared clients' connection pools are bound to it
+        await run("warm-up", 3, rebuild=False)
+        return await run("per-email", args.emails, rebuild=True), await run("shared", args.emails, rebuild=False)
+
+    cold, warm = asyncio.run(compare())
+    print(f"\nshared registry saves {cold - warm:.1f} ms per email")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
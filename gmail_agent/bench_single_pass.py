@@ -0,0 +1,75 @@
+"""
+Benchmark: two-stage (strategist → executor) vs. single-pass (one call classifies and drafts)
+end-to-end latency and LLM token usage, against fake_llm_server.py.
+
+The fake model answers Cold leads at 0.6 confidence, below COMBINED_MIN_CONFIDENCE, so
+those exercise the single-pass fallback.
+
+    python -m gmail_agent.bench_single_pass --latency 0.3 --token-latency 0.01 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+
+from .fake_llm_server import start_fake_llm_server
+
+EMAILS = {
+    "hot": ("Budget approved", "Our budget is approved and we want to sign the contract this month."),
+    "warm": ("Pricing question", "We're interested in your services - could you share a quote?"),
+    "cold": ("Hello team", "Hi there, we offer outsourcing at great rates. Let us know."),
+}
+
+
+async def run_mode(mode: str, rounds: int, server):
+    from .graph import run_pipeline
+
+    results = {}
+    for kind, (subject, body) in EMAILS.items():
+        timings = []
+        requests, prompt_tokens, completion_tokens = server.requests, server.prompt_tokens, server.completion_tokens
+        for index in range(rounds):
+            state = {"email_sender": f"Dana <dana{index}@example.com>", "email_subject": subject, "email_body": body,
+                     "email_id": f"{kind}_{index}", "thread_id": f"{kind}_{index}", "bypass_cache": True, "mode": mode}
+            start = asyncio.get_running_loop().time()
+            with contextlib.redirect_stdout(io.StringIO()):  # the agent logs every email
+                await run_pipeline(state)
+            timings.append((asyncio.get_running_loop().time() - start) * 1000)
+        results[kind] = {
+            "latency": statistics.median(timings),
+            "calls": (server.requests - requests) / rounds,
+            "tokens": (server.prompt_tokens - prompt_tokens + server.completion_tokens - completion_tokens) / rounds
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="fake LLM seconds per 8-char chunk")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(latency=args.latency, token_latency=args.token_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "fake"
+
+    async def compare():
+        # One event loop for both modes: the shared LLM clients' pools are bound to it
+        return await run_mode("two_stage", args.rounds, server), await run_mode("single_pass", args.rounds, server)
+
+    two_stage, single_pass = asyncio.run(compare())
+
+    print(f"🧪 Fake LLM {args.latency}s to first token + {args.token_latency}s per chunk, p50 of {args.rounds}\n")
+    print(f"{'lead':<6} {'mode':<12} {'latency':>9} {'LLM calls':>10} {'tokens':>8}")
+    for kind in EMAILS:
+        for label, results in (("two_stage", two_stage), ("single_pass", single_pass)):
+            row = results[kind]
+            print(f"{kind:<6} {label:<12} {row['latency']:>6.0f} ms {row['calls']:>10.1f} {row['tokens']:>8.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
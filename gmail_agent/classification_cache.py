@@ -0,0 +1,165 @@
+"""Content-addressed cache of strategist classifications, so identical or re-delivered emails skip the LLM."""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Set to "false" to always call the LLM
+STRATEGIST_CACHE_ENABLED = os.getenv("STRATEGIST_CACHE_ENABLED", "true").lower() == "true"
+# Classifications kept in memory (least recently used are evicted first)
+STRATEGIST_CACHE_MAX_ENTRIES = int(os.getenv("STRATEGIST_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a classification stays valid
+STRATEGIST_CACHE_TTL = float(os.getenv("STRATEGIST_CACHE_TTL", "86400"))
+# SQLite file for a second tier that survives restarts; empty keeps the cache in memory only
+STRATEGIST_CACHE_PATH = os.getenv("STRATEGIST_CACHE_PATH", "")
+
+# StrategistOutput fields stored per entry
+CACHED_FIELDS = ("is_lead", "classification", "confidence_score", "strategy", "reasoning")
+
+_whitespace = re.compile(r"\s+")
+_address = re.compile(r"<([^>]+)>")
+
+
+def normalize_sender(sender: str) -> str:
+    """'Dana <Dana@Example.com>' -> 'dana@example.com'"""
+    match = _address.search(sender or "")
+    return (match.group(1) if match else sender or "").strip().lower()
+
+
+def normalize_text(text: str) -> str:
+    return _whitespace.sub(" ", text or "").strip().lower()
+
+
+def cache_key(sender: str, subject: str, body: str, namespace: str = "") -> str:
+    """Hash of the normalized email; namespace (model + prompt version) keeps stale answers out"""
+    digest = hashlib.sha256()
+    for part in (namespace, normalize_sender(sender), normalize_text(subject), normalize_text(body)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ClassificationCache:
+    """
+    LRU + TTL cache in memory, optionally backed by a SQLite table. A memory miss falls
+    through to disk and a disk hit is promoted back into memory. Expired entries are
+    dropped on read; the disk tier is swept every few hundred writes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS classifications (
+            key TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_classifications_expires_at ON classifications (expires_at);
+    """
+    SWEEP_EVERY = 500
+
+    def __init__(self, max_entries: int = STRATEGIST_CACHE_MAX_ENTRIES, ttl: float = STRATEGIST_CACHE_TTL,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "bypassed": 0}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(self.SCHEMA)
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return dict(value)
+                del self._entries[key]
+                self.counters["expired"] += 1
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT data, expires_at FROM classifications WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.counters["disk_hits"] += 1
+                    return dict(value)
+                if row:
+                    self.conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                    self.counters["expired"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: dict):
+        value = {field: result.get(field) for field in CACHED_FIELDS}
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters["stores"] += 1
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO classifications (key, data, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                self._writes += 1
+                if self._writes % self.SWEEP_EVERY == 0:
+                    self.conn.execute("DELETE FROM classifications WHERE expires_at <= ?", (time.time(),))
+
+    def _remember(self, key: str, expires_at: float, value: dict):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM classifications")
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            disk_entries = None
+            if self.conn is not None:
+                disk_entries = self.conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+            return {
+                "enabled": STRATEGIST_CACHE_ENABLED,
+                **self.counters,
+                "hit_rate": round((self.counters["hits"] + self.counters["disk_hits"]) / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_path": self.path,
+                "disk_entries": disk_entries
+            }
+
+
+strategist_cache = ClassificationCache(path=STRATEGIST_CACHE_PATH or None)
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the OpenAI chat completions API, used for offline load tests and benchmarks.
+
+Answers POST /v1/chat/completions (streaming and non-streaming) with deterministic JSON
+for the strategist and executor prompts, after --latency seconds. Small models (any name
+containing "mini") answer the same but SMALL_MODEL_SPEEDUP times the latency. Point the agent at it:
+
+    python -m gmail_agent.fake_llm_server --port 8899 --latency 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8899/v1 OPENAI_API_KEY=fake python -m gmail_agent.api
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+# Latency multiplier for small models such as gpt-4o-mini (cascade benchmarks)
+SMALL_MODEL_SPEEDUP = 0.4
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def classify(text: str) -> dict:
+    """Keyword classifier standing in for the strategist model"""
+    lowered = text.lower()
+    if "unsubscribe" in lowered or "newsletter" in lowered:
+        return {"is_lead": False, "classification": "Spam", "confidence_score": 0.95,
+                "strategy": {}, "reasoning": "Bulk marketing content"}
+    if "budget" in lowered or "urgent" in lowered or "contract" in lowered:
+        return {"is_lead": True, "classification": "Hot", "confidence_score": 0.9,
+                "strategy": {"tone": "Professional & Urgent", "key_points": ["confirm timeline"], "urgency": "high"},
+                "reasoning": "Explicit budget and timeline"}
+    if "quote" in lowered or "pricing" in lowered or "interested" in lowered:
+        return {"is_lead": True, "classification": "Warm", "confidence_score": 0.8,
+                "strategy": {"tone": "Helpful", "key_points": ["share pricing"], "urgency": "medium"},
+                "reasoning": "Genuine interest in services"}
+    return {"is_lead": True, "classification": "Cold", "confidence_score": 0.6,
+            "strategy": {"tone": "Polite", "key_points": [], "urgency": "low"},
+            "reasoning": "Generic outreach"}
+
+
+def draft(text: str) -> dict:
+    """Canned reply standing in for the executor model"""
+    subject = "Re: your inquiry"
+    for line in text.splitlines():
+        if line.strip().lower().startswith("subject:"):
+            subject = "Re: " + line.split(":", 1)[1].strip()
+            break
+    body = ("<p>Hi,</p><p>Thanks for getting in touch - we'd be glad to help. "
+            "Could we set up a short call this week to go over the details?</p>"
+            "<p>Best regards,<br><strong>The Team</strong></p>")
+    return {"action": "send_reply", "subject": subject, "body": body}
+
+
+def completion_for(messages: list) -> str:
+    """Pick a response from the shape of the prompt"""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    user = " ".join(m.get("content", "") for m in messages if m.get("role") != "system")
+    if "single pass" in system.lower():
+        result = classify(user)
+        result["draft"] = draft(user) if result["classification"] in ("Hot", "Warm") else None
+        return json.dumps(result)
+    if "copywriter" in system.lower():
+        return json.dumps(draft(user))
+    return json.dumps(classify(user))
+
+
+def chunk_text(text: str, size: int = 8):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "FakeLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"No fake route for {self.path}"}})
+            return
+
+        content = completion_for(body.get("messages", []))
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.prompt_tokens += usage["prompt_tokens"]
+            if not body.get("stream"):
+                self.server.completion_tokens += usage["completion_tokens"]
+
+        speed = SMALL_MODEL_SPEEDUP if "mini" in model else 1.0
+        token_latency = self.server.token_latency * speed
+        time.sleep(self.server.latency * speed)  # time to first token
+        if body.get("stream"):
+            try:
+                self._stream(completion_id, model, content, usage, body.get("stream_options") or {}, token_latency)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client cancelled mid-stream
+            return
+        if token_latency:
+            time.sleep(token_latency * len(chunk_text(content)))  # same generation time as streaming
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: dict, stream_options: dict,
+                token_latency: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices, **extra):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": choices, **extra}
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        sent = 0
+        try:
+            for piece in chunk_text(content):
+                if token_latency:
+                    time.sleep(token_latency)
+                event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                sent += len(piece)
+        finally:
+            # Like a real API, a stream the client abandons is billed only for what was generated
+            with self.server.lock:
+                self.server.completion_tokens += sent // 4
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if stream_options.get("include_usage"):
+            event([], usage=usage)
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")
+
+    def _write_chunk(self, text: str):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_llm_server(port: int = 0, latency: float = 0.0, token_latency: float = 0.0):
+    """Start the fake server on a daemon thread; returns the server (server.server_port has the port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_latency = token_latency
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.prompt_tokens = 0
+    server.completion_tokens = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    server = start_fake_llm_server(args.port, args.latency, args.token_latency)
+    print(f"🧪 Fake LLM on http://127.0.0.1:{server.server_port}/v1 (latency {args.latency}s)")
+    print(f"   Set OPENAI_BASE_URL=http://127.0.0.1:{server.server_port}/v1 and OPENAI_API_KEY=fake")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
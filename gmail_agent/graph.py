@@ -1,27 +1,112 @@
+import asyncio
+import os
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, END
 from .state import AgentState
+from .agents.prefilter import prefilter_node
+from .agents.normalizer import normalizer_node
 from .agents.strategist import strategist_node
 from .agents.executor import executor_node
+from .agents.combined import combined_node
+from .agents.speculative import should_speculate, speculative_node
+
+# "two_stage" (strategist, then executor) or "single_pass" (one call classifies and drafts);
+# requests can override it with "mode"
+AGENT_GRAPH_MODE = os.getenv("AGENT_GRAPH_MODE", "two_stage")
 
 def define_graph():
     # Initialize Graph
     workflow = StateGraph(AgentState)
     
     # Add Nodes
+    workflow.add_node("prefilter", prefilter_node)
+    workflow.add_node("normalizer", normalizer_node)
     workflow.add_node("strategist", strategist_node)
+    workflow.add_node("combined", combined_node)
+    workflow.add_node("speculative", speculative_node)
     workflow.add_node("executor", executor_node)
     
     # Define Entry Point
-    workflow.set_entry_point("strategist")
+    workflow.set_entry_point("prefilter")
     
     # Conditional Edge Logic
+    def route_after_prefilter(state):
+        # Obvious non-leads (bulk mail, auto-replies, bounces) never reach the LLM
+        if state.get("prefiltered"):
+            return END
+        return "normalizer"
+    
+    def route_after_normalizer(state):
+        if (state.get("mode") or AGENT_GRAPH_MODE) == "single_pass":
+            return "combined"
+        # Likely leads (known senders) draft while the strategist is still classifying
+        if should_speculate(state):
+            return "speculative"
+        return "strategist"
+    
+    def route_after_combined(state):
+        # Low confidence (or a failed call): redo it properly with strategist + executor
+        if state.get("combined_fallback"):
+            return "strategist"
+        # Cold leads get the template reply, which only the executor produces
+        if state.get("is_lead") and (state.get("classification") or "").lower() == "cold":
+            return "executor"
+        return END
+    
+    def route_after_speculative(state):
+        if state.get("email_draft"):
+            return END
+        return route_after_strategist(state)
+    
     def route_after_strategist(state):
+        # Early routing may already have drafted the reply alongside the strategist
+        if state.get("email_draft"):
+            return END
         if state.get("is_lead"):
             return "executor"
         else:
             return END
             
     # Add Edges
+    workflow.add_conditional_edges(
+        "prefilter",
+        route_after_prefilter,
+        {
+            "normalizer": "normalizer",
+            END: END
+        }
+    )
+    
+    # Quotes, signatures and footers are stripped before any LLM sees the body
+    workflow.add_conditional_edges(
+        "normalizer",
+        route_after_normalizer,
+        {
+            "strategist": "strategist",
+            "combined": "combined",
+            "speculative": "speculative"
+        }
+    )
+    
+    workflow.add_conditional_edges(
+        "speculative",
+        route_after_speculative,
+        {
+            "executor": "executor",
+            END: END
+        }
+    )
+    
+    workflow.add_conditional_edges(
+        "combined",
+        route_after_combined,
+        {
+            "strategist": "strategist",
+            "executor": "executor",
+            END: END
+        }
+    )
+    
     workflow.add_conditional_edges(
         "strategist",
         route_after_strategist,
@@ -39,3 +124,24 @@ def define_graph():
 
 # Expose the runnable graph
 agent_graph = define_graph()
+
+# Email pipelines allowed to run at once across all requests (each holds LLM calls)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "16"))
+pipeline_slots = asyncio.Semaphore(AGENT_MAX_CONCURRENCY)
+
+
+async def run_pipeline(state: dict, config: RunnableConfig = None) -> dict:
+    """Run the graph asynchronously once a pipeline slot is free"""
+    async with pipeline_slots:
+        return await agent_graph.ainvoke(state, config)
+
+
+async def stream_pipeline(state: dict, config: RunnableConfig = None):
+    """Like run_pipeline, but yields LangGraph (v2) events while the graph runs"""
+    async with pipeline_slots:
+        async for event in agent_graph.astream_events(state, config, version="v2"):
+            yield event
+
+
+# Same pipeline as a Runnable, for abatch / abatch_as_completed under the shared cap
+pipeline = RunnableLambda(run_pipeline)
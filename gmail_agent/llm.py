@@ -0,0 +1,160 @@
+"""Shared LLM clients and compiled prompt chains, built once per process instead of once per email."""
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config, merge_configs
+from langchain_openai import ChatOpenAI
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, float], ChatOpenAI] = {}  # (model, temperature) -> client
+_chains: Dict[str, object] = {}  # chain name -> runnable
+_chain_factories: Dict[str, Callable] = {}  # chain name -> factory building the runnable
+
+# USD per million (input, output) tokens; LLM_PRICES overrides/extends as "model=in/out,model=in/out"
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+for _entry in filter(None, os.getenv("LLM_PRICES", "").split(",")):
+    _name, _prices = _entry.split("=")
+    MODEL_PRICES[_name.strip()] = tuple(float(price) for price in _prices.split("/"))
+
+# Set once warm_up() has built every registered chain
+ready = threading.Event()
+warm_up_error: Optional[str] = None
+
+
+def get_llm(model: Optional[str] = None, temperature: float = 0.1) -> ChatOpenAI:
+    """Shared ChatOpenAI for (model, temperature); its HTTP connection pool is reused across calls"""
+    model = model or os.getenv("OPENAI_MODEL", "gpt-4o")
+    key = (model, float(temperature))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # stream_usage: streamed calls report token usage too (UsageTracker)
+                client = ChatOpenAI(model=model, api_key=os.getenv("OPENAI_API_KEY"), temperature=temperature,
+                                    stream_usage=True)
+                _clients[key] = client
+    return client
+
+
+def stage_model(stage: str, default: Optional[str] = None) -> str:
+    """Model for one pipeline stage: <STAGE>_MODEL (e.g. STRATEGIST_MODEL), else OPENAI_MODEL"""
+    return os.getenv(f"{stage.upper()}_MODEL") or default or os.getenv("OPENAI_MODEL", "gpt-4o")
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Price of one call; dated snapshots (gpt-4o-2024-08-06) use their base model's price"""
+    matches = [name for name in MODEL_PRICES if model == name or model.startswith(name + "-")]
+    if not matches:
+        return None
+    prompt_price, completion_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class UsageTracker(BaseCallbackHandler):
+    """Adds up the token usage and cost of the LLM calls it is passed to (config={"callbacks": [tracker]})"""
+
+    run_inline = True
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.unpriced = False
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                self.calls += 1
+                self.prompt_tokens += usage.get("input_tokens", 0)
+                self.completion_tokens += usage.get("output_tokens", 0)
+                cost = cost_usd(message.response_metadata.get("model_name", ""),
+                                usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+                if cost is None:
+                    self.unpriced = True
+                else:
+                    self.cost += cost
+
+
+def with_usage(usage: UsageTracker, config: Optional[RunnableConfig] = None) -> RunnableConfig:
+    """
+    The node's config with the tracker added to its callbacks. Passing {"callbacks": [usage]}
+    alone would replace the graph's callback manager and detach the LLM run from the trace.
+    """
+    return merge_configs(ensure_config(config), {"callbacks": [usage]})
+
+
+def register_chain(name: str, factory: Callable):
+    """Declare how to build a chain; it is compiled on first use (or during warm-up)"""
+    _chain_factories[name] = factory
+
+
+def get_chain(name: str):
+    chain = _chains.get(name)
+    if chain is None:
+        with _lock:
+            chain = _chains.get(name)
+        if chain is None:
+            chain = _chain_factories[name]()
+            with _lock:
+                chain = _chains.setdefault(name, chain)
+    return chain
+
+
+def warm_up():
+    """Build every registered chain (and its LLM client) ahead of the first email"""
+    global warm_up_error
+    try:
+        if os.getenv("OPENAI_API_KEY"):
+            for name in list(_chain_factories):
+                get_chain(name)
+            print(f"🔥 LLM warm-up done: {len(_chains)} chain(s), {len(_clients)} client(s)")
+        else:
+            print("⚠️ OPENAI_API_KEY not set - skipping LLM warm-up")
+    except Exception as e:
+        warm_up_error = str(e)
+        print(f"❌ LLM warm-up failed: {e}")
+    finally:
+        ready.set()
+
+
+def _drop_all():
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _chains.clear()
+    return clients
+
+
+def reset():
+    """
+    Drop every client and compiled chain (tests and benchmarks). Only the sync HTTP pools
+    can be closed here; from async code use areset(), or a dropped client's async pool is
+    left for the garbage collector to close on the loop while other requests are in flight.
+    """
+    for client in _drop_all():
+        client.root_client.close()
+
+
+async def areset():
+    """reset() for async code: closes the dropped clients' sync and async connection pools"""
+    for client in _drop_all():
+        client.root_client.close()
+        await client.root_async_client.close()
+
+
+def stats() -> dict:
+    return {
+        "ready": ready.is_set(),
+        "warm_up_error": warm_up_error,
+        "clients": [f"{model}@{temperature}" for model, temperature in _clients],
+        "chains": sorted(_chains)
+    }
@@ -7,15 +7,27 @@ class AgentState(TypedDict):
     email_body: str
     email_id: str
     thread_id: str
+    email_headers: Optional[Dict[str, str]]  # Selected raw headers (List-Unsubscribe, Auto-Submitted, ...)
+    bypass_cache: bool  # Skip the strategist cache lookup (the fresh result is still stored)
+    mode: Optional[str]  # "two_stage" or "single_pass"; None uses AGENT_GRAPH_MODE
+    lead_prior: Optional[float]  # Backend's prior that this sender/thread is a lead (speculative drafting)
+    
+    # Prefilter Output (True when header/keyword rules settled it without the LLM)
+    prefiltered: bool
+    body_tokens_saved: int  # Tokens the normalizer removed from email_body before the LLM calls
     
     # Internal Analysis (Strategist Output)
     is_lead: bool
     classification: Optional[str]  # "Hot", "Warm", "Cold"
     confidence_score: Optional[float]
     strategy: Optional[Dict[str, Any]]
+    classification_cached: bool  # True when the strategist answer came from the cache
+    combined_fallback: bool  # Single-pass answer rejected (low confidence) - two-stage path ran
+    speculative_outcome: Optional[str]  # Speculative draft outcome: "used", "mismatched", "cancelled" or "failed"
     
     # Execution (Executor Output)
     email_draft: Optional[Dict[str, str]]  # {to, subject, body}
+    draft_type: Optional[str]  # "hot_auto", "warm_review", "cold_template"
     
     # Final Output
     final_action: str  # "send_reply", "mark_read", "ignore"
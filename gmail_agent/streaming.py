@@ -0,0 +1,120 @@
+"""Turns LangGraph events into the /analyze/stream protocol: the classification first, then the draft as it is written."""
+from langchain_core.utils.json import parse_partial_json
+
+from .agents.combined import COMBINED_MIN_CONFIDENCE
+from .graph import stream_pipeline
+
+
+class DraftAccumulator:
+    """
+    Re-parses a node's partial JSON output and returns only the new part of the draft body.
+    draft_key is where the {subject, body} object sits ("draft" for the single-pass node,
+    None when they are top-level fields as in the executor's output).
+    """
+
+    def __init__(self, draft_key: str = None):
+        self.draft_key = draft_key
+        self.raw = ""
+        self.body = ""
+        self.subject = None
+
+    def feed(self, text: str):
+        """Add streamed text; returns the partial JSON object so far (or None)"""
+        self.raw += text
+        try:
+            partial = parse_partial_json(self.raw)
+        except Exception:
+            return None
+        return partial if isinstance(partial, dict) else None
+
+    def delta(self, partial: dict):
+        draft = partial.get(self.draft_key) if self.draft_key else partial
+        if not isinstance(draft, dict):
+            return None
+        body = draft.get("body") or ""
+        subject = draft.get("subject")
+        if len(body) <= len(self.body) and subject == self.subject:
+            return None
+        delta = body[len(self.body):] if body.startswith(self.body) else body
+        self.body, self.subject = body, subject
+        return {"event": "draft_delta", "subject": subject, "delta": delta}
+
+
+def analysis_event(output: dict) -> dict:
+    return {
+        "event": "analysis",
+        "analysis": {
+            "is_lead": output.get("is_lead"),
+            "classification": output.get("classification"),
+            "confidence": output.get("confidence_score"),
+            "reasoning": output.get("reasoning"),
+            "cached": bool(output.get("classification_cached")),
+            "prefiltered": bool(output.get("prefiltered"))
+        }
+    }
+
+
+async def pipeline_events(state: dict):
+    """
+    Yields {"event": "analysis"} once the lead is classified, {"event": "draft_delta"} for
+    every piece of draft body streamed by the executor (or the single-pass node), and finally
+    {"event": "result", "state": ...} with the same final graph state /analyze would have
+    returned. If a single-pass draft was already streaming when the node fell back to the
+    two-stage path, {"event": "draft_reset"} tells the client to discard it. Speculative
+    drafts are only forwarded once the strategist has confirmed the lead. With early
+    routing the analysis arrives mid-strategist and the draft streams from inside it.
+    """
+    executor_draft = DraftAccumulator()
+    combined_draft = DraftAccumulator("draft")
+    combined_announced = False
+    speculative_draft = DraftAccumulator()
+    speculative_partial = None
+    speculative_confirmed = False
+    analysis_sent = False
+
+    async for event in stream_pipeline(state):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and (node == "executor" or "executor_draft" in event.get("tags", [])):
+            partial = executor_draft.feed(event["data"]["chunk"].content or "")
+            delta = partial and executor_draft.delta(partial)
+            if delta:
+                yield delta
+        elif kind == "on_chat_model_stream" and node == "combined":
+            partial = combined_draft.feed(event["data"]["chunk"].content or "")
+            if not partial:
+                continue
+            # "draft" comes last, so once it is an object the classification fields are complete
+            if (not combined_announced and isinstance(partial.get("draft"), dict)
+                    and (partial.get("confidence_score") or 0) >= COMBINED_MIN_CONFIDENCE):
+                combined_announced = True
+                yield analysis_event(partial)
+            delta = combined_announced and combined_draft.delta(partial)
+            if delta:
+                yield delta
+        elif kind == "on_chat_model_stream" and "speculative_draft" in event.get("tags", []):
+            # Held back until the strategist confirms the lead, then forwarded as it arrives
+            speculative_partial = speculative_draft.feed(event["data"]["chunk"].content or "") or speculative_partial
+            delta = speculative_confirmed and speculative_partial and speculative_draft.delta(speculative_partial)
+            if delta:
+                yield delta
+        elif kind == "on_custom_event" and event.get("name") == "lead_analysis":
+            # Sent mid-node by the speculative and early-routing strategists
+            analysis_sent = True
+            yield analysis_event(event["data"])
+            speculative_confirmed = event["data"].get("speculative_draft_used", False)
+            delta = speculative_confirmed and speculative_partial and speculative_draft.delta(speculative_partial)
+            if delta:
+                yield delta
+        elif kind == "on_chain_end" and event.get("name") == node:
+            output = event["data"].get("output") or {}
+            if node == "combined" and output.get("combined_fallback"):
+                if combined_announced:
+                    yield {"event": "draft_reset"}
+            elif node == "combined" and not combined_announced:
+                yield analysis_event(output)
+            elif (node == "strategist" and not analysis_sent) or (node == "prefilter" and output.get("prefiltered")):
+                yield analysis_event(output)
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            yield {"event": "result", "state": event["data"].get("output") or {}}
@@ -26,5 +26,35 @@ def test_analyze():
     except Exception as e:
         print(f"❌ Test failed: {e}")
 
+def test_analyze_batch():
+    url = "http://localhost:8001/analyze/batch/stream"
+    
+    payload = {
+        "emails": [
+            {
+                "email_sender": f"client{i}@example.com",
+                "email_subject": f"Inquiry #{i}",
+                "email_body": "Hi, we'd like a quote for a 3-month project. What are your rates?",
+                "email_id": f"msg_{i}",
+                "thread_id": f"thread_{i}"
+            }
+            for i in range(3)
+        ],
+        "max_concurrency": 3
+    }
+    
+    try:
+        print(f"📡 Sending batch of {len(payload['emails'])} to {url}...")
+        with requests.post(url, json=payload, stream=True, timeout=120) as response:
+            print(f"Response Status: {response.status_code}")
+            for line in response.iter_lines():
+                if line:
+                    item = json.loads(line)
+                    print(f"  #{item['index']} {item['email_id']}: {item.get('analysis', {}).get('classification')}")
+            
+    except Exception as e:
+        print(f"❌ Batch test failed: {e}")
+
 if __name__ == "__main__":
     test_analyze()
+    test_analyze_batch()